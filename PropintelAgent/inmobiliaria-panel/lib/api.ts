@@ -58,10 +58,16 @@ async function req<T>(path: string, init?: RequestInit): Promise<T> {
   }
 }
 
+// Agrega el cursor de paginación (next_cursor de la respuesta anterior) a la URL
+function withCursor(path: string, cursor?: string | null): string {
+  if (!cursor) return path;
+  return `${path}${path.includes("?") ? "&" : "?"}cursor=${encodeURIComponent(cursor)}`;
+}
+
 export const Admin = {
   // Leads
-  leadsByStatus: (status: "NUEVO" | "CALIFICANDO" | "CALIFICADO" | "AGENDANDO_VISITA" | "PROCESO_COMPLETADO" | "BUSCANDO_PROPIEDAD"): Promise<ApiResponse<Lead>> =>
-    req(`/admin/leads?status=${status}`),
+  leadsByStatus: (status: "NUEVO" | "CALIFICANDO" | "CALIFICADO" | "AGENDANDO_VISITA" | "PROCESO_COMPLETADO" | "BUSCANDO_PROPIEDAD", cursor?: string | null): Promise<ApiResponse<Lead>> =>
+    req(withCursor(`/admin/leads?status=${status}`, cursor)),
     
   getAllLeads: (): Promise<ApiResponse<Lead>> =>
     req(`/admin/leads`),
@@ -89,15 +95,15 @@ export const Admin = {
     }),
     
   // Messages
-  messages: (lead_id: string, limit: number = 50): Promise<ApiResponse<Message>> =>
-    req(`/admin/messages?lead_id=${encodeURIComponent(lead_id)}&limit=${limit}`),
+  messages: (lead_id: string, limit: number = 50, cursor?: string | null): Promise<ApiResponse<Message>> =>
+    req(withCursor(`/admin/messages?lead_id=${encodeURIComponent(lead_id)}&limit=${limit}`, cursor)),
     
   // Properties
-  properties: (neighborhood?: string): Promise<ApiResponse<Property>> =>
-    req(`/admin/properties${neighborhood ? `?neighborhood=${encodeURIComponent(neighborhood)}` : ""}`),
+  properties: (neighborhood?: string, cursor?: string | null): Promise<ApiResponse<Property>> =>
+    req(withCursor(`/admin/properties${neighborhood ? `?neighborhood=${encodeURIComponent(neighborhood)}` : ""}`, cursor)),
     
-  getAllProperties: (): Promise<ApiResponse<Property>> =>
-    req(`/admin/properties`),
+  getAllProperties: (cursor?: string | null): Promise<ApiResponse<Property>> =>
+    req(withCursor(`/admin/properties`, cursor)),
     
   createProperty: (item: CreatePropertyData): Promise<{ ok: boolean; id: string }> =>
     req(`/admin/properties`, {
@@ -114,15 +120,15 @@ export const Admin = {
     }),
     
   // Visits
-  visitsByLead: (lead_id: string): Promise<ApiResponse<Visit>> =>
-    req(`/admin/visits?lead_id=${encodeURIComponent(lead_id)}`),
+  visitsByLead: (lead_id: string, cursor?: string | null): Promise<ApiResponse<Visit>> =>
+    req(withCursor(`/admin/visits?lead_id=${encodeURIComponent(lead_id)}`, cursor)),
     
-  visitsByProperty: (property_id: string): Promise<ApiResponse<Visit>> =>
-    req(`/admin/visits?property_id=${encodeURIComponent(property_id)}`),
+  visitsByProperty: (property_id: string, cursor?: string | null): Promise<ApiResponse<Visit>> =>
+    req(withCursor(`/admin/visits?property_id=${encodeURIComponent(property_id)}`, cursor)),
     
-  getAllVisits: (): Promise<ApiResponse<Visit>> => {
+  getAllVisits: (cursor?: string | null): Promise<ApiResponse<Visit>> => {
     console.log('🔍 Llamando a getAllVisits...');
-    return req(`/admin/visits`);
+    return req(withCursor(`/admin/visits`, cursor));
   },
     
   createVisit: (visitData: {
@@ -57,6 +57,7 @@ export interface Visit {
 export interface ApiResponse<T> {
   items: T[];
   count?: number;
+  next_cursor?: string | null; // pasar como `cursor` para pedir la página siguiente
 }
 
 export interface CreatePropertyData {
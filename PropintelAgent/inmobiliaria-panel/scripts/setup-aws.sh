@@ -38,6 +38,31 @@ generate_credentials() {
     echo ""
 }
 
+# Función para agregar un GSI a una tabla existente (uno por vez, esperando a que quede ACTIVE)
+# Uso: ensure_gsi <tabla> <índice> "<attribute-definitions>" '<key-schema JSON>'
+ensure_gsi() {
+    local table=$1 index=$2 attributes=$3 key_schema=$4
+    local status
+    status=$(aws dynamodb describe-table --table-name $table \
+        --query "Table.GlobalSecondaryIndexes[?IndexName=='$index'].IndexStatus | [0]" --output text 2>/dev/null || echo "None")
+    if [ "$status" != "None" ] && [ -n "$status" ]; then
+        echo "  ✓ Índice '$index' ya existe en '$table' ($status)"
+        return
+    fi
+    echo "  → Creando índice '$index' en '$table'..."
+    aws dynamodb update-table \
+        --table-name $table \
+        --attribute-definitions $attributes \
+        --global-secondary-index-updates \
+            "[{\"Create\":{\"IndexName\":\"$index\",\"KeySchema\":$key_schema,\"Projection\":{\"ProjectionType\":\"ALL\"}}}]" \
+        --region $AWS_REGION > /dev/null
+    echo "  → Esperando a que '$index' quede ACTIVE (DynamoDB lo completa con los items existentes)..."
+    until [ "$(aws dynamodb describe-table --table-name $table \
+        --query "Table.GlobalSecondaryIndexes[?IndexName=='$index'].IndexStatus | [0]" --output text)" == "ACTIVE" ]; do
+        sleep 10
+    done
+}
+
 # Función para crear tablas DynamoDB
 create_dynamodb_tables() {
     echo "📊 Creando tablas DynamoDB..."
@@ -82,14 +107,32 @@ create_dynamodb_tables() {
             --attribute-definitions \
                 AttributeName=PropertyId,AttributeType=S \
                 AttributeName=Neighborhood,AttributeType=S \
+                AttributeName=Status,AttributeType=S \
+                AttributeName=StatusNeighborhood,AttributeType=S \
+                AttributeName=PriceKey,AttributeType=N \
+                AttributeName=UrlKey,AttributeType=S \
             --key-schema \
                 AttributeName=PropertyId,KeyType=HASH \
             --global-secondary-indexes \
-                IndexName=GSI_Neighborhood,KeySchema=[{AttributeName=Neighborhood,KeyType=HASH}],Projection={ProjectionType=ALL} \
+                "IndexName=GSI_Neighborhood,KeySchema=[{AttributeName=Neighborhood,KeyType=HASH}],Projection={ProjectionType=ALL}" \
+                "IndexName=GSI_StatusNeighborhood,KeySchema=[{AttributeName=StatusNeighborhood,KeyType=HASH},{AttributeName=PriceKey,KeyType=RANGE}],Projection={ProjectionType=ALL}" \
+                "IndexName=GSI_StatusPrice,KeySchema=[{AttributeName=Status,KeyType=HASH},{AttributeName=PriceKey,KeyType=RANGE}],Projection={ProjectionType=ALL}" \
+                "IndexName=GSI_UrlKey,KeySchema=[{AttributeName=UrlKey,KeyType=HASH}],Projection={ProjectionType=ALL}" \
             --billing-mode PAY_PER_REQUEST \
             --region $AWS_REGION > /dev/null
     else
         echo "  ✓ Tabla 'properties' ya existe"
+        # Tablas creadas antes de los índices del query planner (services/query_planner.py)
+        # y del resolvedor de links pegados (services/catalog.py)
+        ensure_gsi properties GSI_StatusNeighborhood \
+            "AttributeName=StatusNeighborhood,AttributeType=S AttributeName=PriceKey,AttributeType=N" \
+            '[{"AttributeName":"StatusNeighborhood","KeyType":"HASH"},{"AttributeName":"PriceKey","KeyType":"RANGE"}]'
+        ensure_gsi properties GSI_StatusPrice \
+            "AttributeName=Status,AttributeType=S AttributeName=PriceKey,AttributeType=N" \
+            '[{"AttributeName":"Status","KeyType":"HASH"},{"AttributeName":"PriceKey","KeyType":"RANGE"}]'
+        ensure_gsi properties GSI_UrlKey \
+            "AttributeName=UrlKey,AttributeType=S" \
+            '[{"AttributeName":"UrlKey","KeyType":"HASH"}]'
     fi
     
     # Tabla visits
@@ -11,4 +11,12 @@ app.include_router(admin_router)
 def health():
     return {"status": "ok"}
 
-handler = Mangum(app)
+_mangum = Mangum(app)
+
+def handler(event, context):
+    # Invocación asíncrona de la misma función para actualizar el resumen (services.summary)
+    if event.get("action") == "update_summary":
+        from services.summary import run_summary_update
+        run_summary_update(event["lead_id"], event.get("reason", ""))
+        return {"statusCode": 200}
+    return _mangum(event, context)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Backfill único de los atributos que alimentan los GSI de la tabla Properties.
+
+Las altas y ediciones del panel ya escriben StatusNeighborhood y PriceKey
+(services.query_planner.index_attributes) y UrlKey (utils.urls); este script
+los completa en las propiedades cargadas antes, para que aparezcan en
+GSI_StatusNeighborhood, GSI_StatusPrice y GSI_UrlKey. Correrlo después de
+crear los índices (setup-aws.sh) y antes de activar PROPERTY_SEARCH_BACKEND=dynamo.
+Es idempotente: solo escribe los items cuyos atributos derivados faltan o
+quedaron desactualizados.
+
+Uso: python backfill_property_indexes.py [--dry-run]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.dynamo import t_props
+from services.scan import parallel_scan
+from services.query_planner import index_attributes
+from utils.urls import normalize_property_url
+
+
+def derived_attributes(item: dict) -> dict:
+    """Atributos derivados que el item debería tener y todavía no tiene (o difieren)"""
+    expected = index_attributes(item)
+    url_key = normalize_property_url(item.get("URL") or "")
+    if url_key:
+        expected["UrlKey"] = url_key
+    return {k: v for k, v in expected.items() if item.get(k) != v}
+
+
+def backfill(dry_run: bool = False) -> dict:
+    stats = {"scanned": 0, "updated": 0, "errors": 0}
+    for item in parallel_scan(t_props):
+        stats["scanned"] += 1
+        missing = derived_attributes(item)
+        if not missing:
+            continue
+        if dry_run:
+            print(f"   {item.get('PropertyId')}: {missing}")
+            stats["updated"] += 1
+            continue
+        names, values, sets = {}, {}, []
+        for i, (key, value) in enumerate(missing.items(), 1):
+            names[f"#F{i}"] = key
+            values[f":v{i}"] = value
+            sets.append(f"#F{i} = :v{i}")
+        try:
+            t_props.update_item(
+                Key={"PropertyId": item["PropertyId"]},
+                UpdateExpression="SET " + ", ".join(sets),
+                ConditionExpression="attribute_exists(PropertyId)",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+            )
+            stats["updated"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"❌ [BACKFILL] {item.get('PropertyId')}: {e}")
+    return stats
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    print(f"🔧 Backfill de índices de Properties{' (dry run)' if dry_run else ''}")
+    print("=" * 60)
+    stats = backfill(dry_run=dry_run)
+    print("=" * 60)
+    verb = "a actualizar" if dry_run else "actualizadas"
+    print(f"✅ {stats['scanned']} propiedades leídas, {stats['updated']} {verb}, {stats['errors']} errores")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark de find_matches sobre un catálogo sintético (no usa DynamoDB).
+Compara el motor vectorizado con la implementación previa en Python puro
+y verifica que ambos devuelvan exactamente las mismas propiedades.
+
+Uso: python bench_matching.py [cantidad_de_propiedades]
+"""
+
+import sys
+import os
+import random
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import catalog as catalog_module
+from services.catalog import CatalogSnapshot
+from services.matching import find_matches
+
+BARRIOS = ["Palermo", "Belgrano", "Núñez", "Recoleta", "Caballito", "Villa Crespo", "Olivos", "Tigre"]
+
+class _StaticCatalog:
+    """Catálogo con un snapshot fijo para medir sin red"""
+    def __init__(self, snapshot):
+        self._snap = snapshot
+
+    def snapshot(self):
+        return self._snap
+
+def build_items(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    items = []
+    for i in range(n):
+        item = {
+            "PropertyId": f"prop_{i:06d}",
+            "Title": f"Propiedad {i}",
+            "Neighborhood": rnd.choice(BARRIOS),
+            "Rooms": rnd.randint(1, 6),
+            "Price": rnd.randint(40, 1500) * 1000,
+            "Status": "ACTIVE",
+        }
+        # Algunos datos faltantes, como en la tabla real
+        if i % 50 == 0:
+            item.pop("Rooms")
+        if i % 70 == 0:
+            item.pop("Price")
+        items.append(item)
+    return items
+
+def reference_find_matches(items, lead, limit=3):
+    """Implementación previa: filtra y ordena todo en Python"""
+    neighborhood = lead.get("Neighborhood")
+    rooms = lead.get("Rooms")
+    budget = lead.get("Budget")
+
+    def ok(p):
+        if neighborhood and p.get("Neighborhood") != neighborhood:
+            return False
+        if isinstance(rooms, int) and isinstance(p.get("Rooms"), (int, float)) and p["Rooms"] < rooms:
+            return False
+        if isinstance(budget, (int, float)) and isinstance(p.get("Price"), (int, float)) and p["Price"] > budget:
+            return False
+        return True
+
+    matched = [p for p in items if ok(p)]
+    if isinstance(budget, (int, float)):
+        matched.sort(key=lambda x: abs(x.get("Price", 10**9) - budget))
+    else:
+        matched.sort(key=lambda x: (-x.get("Rooms", 0), x.get("Price", 10**9)))
+    return matched[:limit]
+
+def timed(fn, repeat: int) -> float:
+    """Mejor tiempo en milisegundos"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"🚀 Benchmark find_matches con {n:,} propiedades")
+    print("=" * 60)
+
+    items = build_items(n)
+    snapshot = CatalogSnapshot(1, items, time.time())
+    catalog_module._catalog = _StaticCatalog(snapshot)
+
+    start = time.perf_counter()
+    snapshot.columns
+    print(f"🧱 Columnas NumPy construidas en {(time.perf_counter() - start) * 1000:.1f} ms (una vez por snapshot)")
+
+    leads = [
+        ("barrio + presupuesto", {"Neighborhood": "Palermo", "Budget": 350000}),
+        ("barrio + ambientes", {"Neighborhood": "Belgrano", "Rooms": 3}),
+        ("solo presupuesto", {"Budget": 800000}),
+        ("sin criterios", {}),
+        ("barrio inexistente", {"Neighborhood": "Marte"}),
+    ]
+
+    failures = 0
+    for name, lead in leads:
+        expected = reference_find_matches(snapshot.items, lead)
+        got = find_matches(lead)
+        same = [p["PropertyId"] for p in got] == [p["PropertyId"] for p in expected]
+        failures += 0 if same else 1
+
+        py_ms = timed(lambda: reference_find_matches(snapshot.items, lead), 3)
+        np_ms = timed(lambda: find_matches(lead), 20)
+        print(f"📋 {name:<22} python {py_ms:8.2f} ms | numpy {np_ms:6.3f} ms | x{py_ms / np_ms:6.0f} | {'✅' if same else '❌ resultados distintos'}")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} escenarios con resultados distintos")
+        return 1
+    print("✅ Mismos resultados que la implementación previa")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
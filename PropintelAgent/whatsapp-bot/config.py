@@ -10,7 +10,71 @@ VISITS_TABLE = os.getenv("VISITS_TABLE", "Visits")
 # OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Endpoint alternativo compatible con OpenAI (ej. openai_stub.py para benchmarks sin red)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+# Modelo para las extracciones JSON chicas (slots, calificación, fecha): el más barato/rápido
+OPENAI_EXTRACTION_MODEL = os.getenv("OPENAI_EXTRACTION_MODEL", "gpt-4.1-nano")
+# Ajustes a la tabla de rutas de services.model_routing, en JSON:
+# '{"reply:FINALIZADO": {"max_tokens": 80}, "slots": {"model": "gpt-4o-mini"}}'
+MODEL_ROUTES = os.getenv("MODEL_ROUTES")
 
 # Admin API Key
 ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
+# Catálogo de propiedades en memoria (segundos hasta recargar el snapshot)
+PROPERTY_CATALOG_TTL_SECONDS = int(os.getenv("PROPERTY_CATALOG_TTL_SECONDS", "300"))
+
+# Segmentos paralelos para scans completos de DynamoDB
+SCAN_SEGMENTS = int(os.getenv("SCAN_SEGMENTS", "4"))
+
+# Backend para búsquedas de propiedades por criterios: "catalog" (memoria) o "dynamo" (GSI + query planner)
+PROPERTY_SEARCH_BACKEND = os.getenv("PROPERTY_SEARCH_BACKEND", "catalog")
+
+# Firma HMAC de los cursores de paginación del panel (si no se define, se usa ADMIN_API_KEY).
+# Sin ninguno de los dos los listados paginados del panel responden 503 al necesitar un cursor
+CURSOR_SECRET = os.getenv("CURSOR_SECRET") or ADMIN_API_KEY
+
+# Análisis de turno: "single" = una sola llamada estructurada a OpenAI por mensaje
+# (datos, calificación, fecha de visita y respuesta); "multi" = llamadas separadas
+TURN_ANALYSIS_MODE = os.getenv("TURN_ANALYSIS_MODE", "single")
+
+# Caché de resultados de OpenAI (extract_slots / analyze_qualification_ai)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TABLE = os.getenv("LLM_CACHE_TABLE")  # opcional: PK CacheKey, TTL en ExpiresAt
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Confianza mínima de una regla de extract_slots para no pedir refinamiento a OpenAI
+SLOT_CONFIDENCE_THRESHOLD = float(os.getenv("SLOT_CONFIDENCE_THRESHOLD", "0.7"))
+
+# Pasos independientes del turno (lead, URL, historial) en paralelo: "parallel" o "sequential"
+TURN_EXECUTION_MODE = os.getenv("TURN_EXECUTION_MODE", "parallel")
+TURN_FANOUT_WORKERS = int(os.getenv("TURN_FANOUT_WORKERS", "4"))
+
+# Historial para el prompt: se leen hasta CONTEXT_FETCH_LIMIT mensajes y entran los que
+# caben en el presupuesto de tokens de la etapa; cada mensaje se recorta a CONTEXT_MAX_MESSAGE_TOKENS
+CONTEXT_FETCH_LIMIT = int(os.getenv("CONTEXT_FETCH_LIMIT", "20"))
+CONTEXT_MAX_MESSAGE_TOKENS = int(os.getenv("CONTEXT_MAX_MESSAGE_TOKENS", "300"))
+# Últimos mensajes copiados en el lead (RecentMessages) para armar el contexto con un solo GetItem;
+# la tabla Messages sigue siendo el historial completo. Cada texto se guarda hasta RECENT_MESSAGE_MAX_CHARS
+RECENT_MESSAGES_MAX = int(os.getenv("RECENT_MESSAGES_MAX", "20"))
+RECENT_MESSAGE_MAX_CHARS = int(os.getenv("RECENT_MESSAGE_MAX_CHARS", "1000"))
+
+# Resumen incremental de la conversación guardado en el lead (ConversationSummary):
+# se actualiza cada SUMMARY_EVERY_N_TURNS turnos o cuando el historial sin resumir
+# supera el presupuesto de la etapa; quedan fuera del resumen los últimos SUMMARY_KEEP_RECENT mensajes
+SUMMARY_EVERY_N_TURNS = int(os.getenv("SUMMARY_EVERY_N_TURNS", "6"))
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "4"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "200"))
+# La actualización del resumen corre fuera de la respuesta: en Lambda invocando esta
+# función en forma asíncrona (necesita lambda:InvokeFunction sobre sí misma); vacío = hilo local
+SUMMARY_ASYNC_FUNCTION = os.getenv("SUMMARY_ASYNC_FUNCTION", os.getenv("AWS_LAMBDA_FUNCTION_NAME", ""))
+
+# Llamadas a OpenAI: deadline por propósito (segundos), hedging opcional al p95 y circuit breaker
+LLM_TIMEOUT_EXTRACTION = float(os.getenv("LLM_TIMEOUT_EXTRACTION", "4"))
+LLM_TIMEOUT_REPLY = float(os.getenv("LLM_TIMEOUT_REPLY", "12"))
+LLM_TIMEOUT_SUMMARY = float(os.getenv("LLM_TIMEOUT_SUMMARY", "10"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
@@ -0,0 +1,76 @@
+# models/deserializer.py
+"""
+Deserialización rápida de items crudos de DynamoDB (formato del cliente de bajo nivel).
+Los números se convierten directo a int/float (sin pasar por Decimal ni por
+dec_to_native) y los tipos comunes (S, N, BOOL, NULL, M, L) evitan el dispatch
+genérico de TypeDeserializer.
+"""
+
+from decimal import Decimal
+from typing import Dict, Any
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+# Atributos numéricos conocidos: siempre enteros salvo que traigan decimales
+NUMERIC_ATTRIBUTES = {"Price", "Rooms", "Budget", "Version"}
+
+
+def _number(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        number = float(value)
+        return int(number) if number.is_integer() else number
+
+
+class FastDeserializer(TypeDeserializer):
+    """TypeDeserializer con atajos para los tipos frecuentes y números nativos"""
+
+    def deserialize(self, value: Dict[str, Any]):
+        if "S" in value:
+            return value["S"]
+        if "N" in value:
+            return _number(value["N"])
+        if "BOOL" in value:
+            return value["BOOL"]
+        if "NULL" in value:
+            return None
+        if "M" in value:
+            return {k: self.deserialize(v) for k, v in value["M"].items()}
+        if "L" in value:
+            return [self.deserialize(v) for v in value["L"]]
+        return super().deserialize(value)
+
+    def _deserialize_n(self, value):
+        return _number(value)
+
+    def _deserialize_ns(self, value):
+        return set(_number(v) for v in value)
+
+
+class FastSerializer(TypeSerializer):
+    """TypeSerializer que acepta float (los convierte a Decimal)"""
+
+    def serialize(self, value):
+        if isinstance(value, float):
+            value = Decimal(str(value))
+        return super().serialize(value)
+
+
+_deserializer = FastDeserializer()
+_serializer = FastSerializer()
+
+
+def deserialize_item(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte un item crudo ({"Price": {"N": "1000"}, ...}) a tipos nativos"""
+    item = {}
+    for key, value in raw.items():
+        if key in NUMERIC_ATTRIBUTES and "N" in value:
+            item[key] = _number(value["N"])
+        else:
+            item[key] = _deserializer.deserialize(value)
+    return item
+
+
+def serialize_value(value: Any) -> Dict[str, Any]:
+    return _serializer.serialize(value)
@@ -124,24 +124,23 @@ def should_transition_to_qualification(messages_history: list, property_confirme
         return True
     
     # Si ha mencionado una propiedad específica varias veces
+    from services.keywords import scan
+
     property_mentions = 0
     for msg in messages_history[-5:]:  # Últimos 5 mensajes
-        if msg.get("role") == "user":
-            content = msg.get("content", "").lower()
-            property_keywords = ["propiedad", "casa", "depto", "departamento", "ph", "visita"]
-            if any(keyword in content for keyword in property_keywords):
-                property_mentions += 1
+        if msg.get("role") == "user" and scan(msg.get("content", "")).has("property"):
+            property_mentions += 1
     
     return property_mentions >= 2
 
-def get_stage_context_limit(stage: LeadStage) -> int:
+def get_stage_token_budget(stage: LeadStage) -> int:
     """
-    Retorna el límite de mensajes de contexto según la etapa
+    Retorna el presupuesto de tokens del historial según la etapa
     """
-    context_limits = {
-        LeadStage.PRECALIFICACION: 10,      # Más contexto para entender qué busca
-        LeadStage.CALIFICACION: 6,          # Contexto medio para preguntas específicas  
-        LeadStage.POST_CALIFICACION: 4,     # Poco contexto, solo para agendar
-        LeadStage.FINALIZADO: 2             # Mínimo contexto
+    token_budgets = {
+        LeadStage.PRECALIFICACION: 1200,    # Más contexto para entender qué busca
+        LeadStage.CALIFICACION: 800,        # Contexto medio para preguntas específicas
+        LeadStage.POST_CALIFICACION: 500,   # Poco contexto, solo para agendar
+        LeadStage.FINALIZADO: 250           # Mínimo contexto
     }
-    return context_limits.get(stage, 6)
\ No newline at end of file
+    return token_budgets.get(stage, 800)
\ No newline at end of file
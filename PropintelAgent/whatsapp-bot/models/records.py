@@ -0,0 +1,203 @@
+# models/records.py
+"""
+Registros compactos (__slots__) para las entidades de DynamoDB.
+Los atributos conocidos de cada tabla van en slots; cualquier otro atributo
+del item se conserva en `extra` para no perder datos al devolverlo.
+
+Los registros se leen como un dict (`get`, `[]`, `in`), así que el código que
+recibía items de DynamoDB funciona igual, y se serializan a JSON una sola vez
+(`to_json` queda cacheado hasta la próxima modificación).
+"""
+
+import copy
+import json
+from typing import Dict, Any, Iterable, List, Tuple
+
+from models.deserializer import deserialize_item, NUMERIC_ATTRIBUTES, _number, _deserializer
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, Record):
+        return value.to_dict()
+    return str(value)
+
+
+class Record:
+    __slots__ = ("extra", "_json")
+    FIELDS: Tuple[str, ...] = ()
+    _FIELD_SET: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, fields.pop(name, None))
+        self.extra = fields or None
+        self._json = None
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "Record":
+        """Construye el registro desde un item ya deserializado"""
+        return cls(**item)
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any]) -> "Record":
+        """Construye el registro directo desde un item crudo del cliente de bajo nivel"""
+        record = cls.__new__(cls)
+        for name in cls.FIELDS:
+            value = raw.get(name)
+            if value is None:
+                setattr(record, name, None)
+            elif name in NUMERIC_ATTRIBUTES and "N" in value:
+                setattr(record, name, _number(value["N"]))
+            else:
+                setattr(record, name, _deserializer.deserialize(value))
+        rest = {k: v for k, v in raw.items() if k not in cls._FIELD_SET}
+        record.extra = deserialize_item(rest) if rest else None
+        record._json = None
+        return record
+
+    @classmethod
+    def coerce(cls, value) -> "Record":
+        """Retorna el mismo registro si ya lo es; si es un dict, lo convierte"""
+        if isinstance(value, cls):
+            return value
+        return cls.from_item(dict(value))
+
+    # Acceso tipo dict (un atributo ausente equivale a None, como en DynamoDB)
+    def get(self, key: str, default=None):
+        if key in self._FIELD_SET:
+            value = getattr(self, key)
+        elif self.extra:
+            value = self.extra.get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, key: str):
+        value = self.get(key)
+        if value is None and key not in self._FIELD_SET:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+        self._json = None
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> List[str]:
+        return list(self.to_dict())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def copy(self) -> "Record":
+        """Copia independiente (los registros del catálogo se comparten y no se modifican)"""
+        return type(self).from_item(copy.deepcopy(self.to_dict()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict con los atributos presentes (los None se omiten, igual que en DynamoDB)"""
+        data = {}
+        for name in self.FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_json(self) -> str:
+        """JSON del registro, generado una sola vez"""
+        if self._json is None:
+            self._json = json.dumps(self.to_dict(), ensure_ascii=False, default=_json_default)
+        return self._json
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def render_items(records: Iterable[Record], **meta) -> str:
+    """Cuerpo JSON {"items": [...], **meta} reutilizando el JSON cacheado de cada registro"""
+    body = '{"items": [' + ", ".join(r.to_json() for r in records) + "]"
+    for key, value in meta.items():
+        body += f", {json.dumps(key)}: {json.dumps(value, ensure_ascii=False, default=_json_default)}"
+    return body + "}"
+
+
+class Property(Record):
+    FIELDS = ("PropertyId", "Title", "Neighborhood", "Rooms", "Price", "Status", "URL", "UrlKey")
+    __slots__ = FIELDS + ("_prompt",)
+
+    # Textos a mostrar cuando falta el dato
+    PLACEHOLDERS = {"Title": "Propiedad sin título", "Neighborhood": "Zona no especificada", "URL": ""}
+
+    def __init__(self, **fields):
+        super().__init__(**fields)
+        self._prompt = None
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any]) -> "Property":
+        record = super().from_raw(raw)
+        record._prompt = None
+        return record
+
+    def display(self, field: str) -> str:
+        return self.get(field, self.PLACEHOLDERS.get(field, ""))
+
+    def summary(self) -> Dict[str, Any]:
+        """Campos que ve la IA y el usuario (sin atributos internos como UrlKey o índices)"""
+        return {
+            "PropertyId": self.PropertyId,
+            "Title": self.Title,
+            "Neighborhood": self.Neighborhood,
+            "Rooms": self.Rooms,
+            "Price": self.Price,
+            "URL": self.URL,
+        }
+
+    def prompt_json(self) -> str:
+        """JSON compacto para el prompt, generado una sola vez"""
+        if self._prompt is None:
+            self._prompt = json.dumps(self.summary(), ensure_ascii=False)
+        return self._prompt
+
+    def __setitem__(self, key: str, value):
+        super().__setitem__(key, value)
+        self._prompt = None
+
+
+class Lead(Record):
+    FIELDS = ("LeadId", "Status", "Stage", "Intent", "Rooms", "Budget", "Neighborhood",
+              "PropertyId", "QualificationData", "ConversationSummary", "SummarizedUntil",
+              "RecentMessages", "CreatedAt", "UpdatedAt", "Version")
+    __slots__ = FIELDS
+
+
+class Message(Record):
+    FIELDS = ("LeadId", "Timestamp", "Direction", "Text")
+    __slots__ = FIELDS
+
+
+class Visit(Record):
+    FIELDS = ("LeadId", "VisitAt", "PropertyId", "Confirmed", "CreatedAt", "Notes")
+    __slots__ = FIELDS
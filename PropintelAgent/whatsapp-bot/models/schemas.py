@@ -105,28 +105,14 @@ def choose_property_from_reply(lead: dict, body: str) -> str | None:
     Detecta si el usuario está eligiendo una propiedad de las sugerencias.
     Acepta números (1-3), IDs de propiedades, o frases como "la primera", "el segundo", etc.
     """
+    from services.fuzzy import pick_ordinal
+    
     body = (body or "").strip().lower()
     
-    # Números directos 1-3
-    if body in ("1", "2", "3"):
-        idx = int(body) - 1
-        props = lead.get("LastSuggestions") or []
-        if 0 <= idx < len(props):
-            return props[idx]
-    
-    # Frases comunes para elegir opciones
-    choice_phrases = {
-        "la primera": 0, "el primero": 0, "primera": 0, "primero": 0,
-        "la segunda": 1, "el segundo": 1, "segunda": 1, "segundo": 1,
-        "la tercera": 2, "el tercero": 2, "tercera": 2, "tercero": 2,
-        "la ultima": 2, "el ultimo": 2, "ultima": 2, "ultimo": 2
-    }
-    
-    for phrase, idx in choice_phrases.items():
-        if phrase in body:
-            props = lead.get("LastSuggestions") or []
-            if 0 <= idx < len(props):
-                return props[idx]
+    # Números directos o frases ordinales ("la segunda", "opción 3", "la última")
+    chosen = pick_ordinal(lead.get("LastSuggestions") or [], body)
+    if chosen:
+        return chosen
     
     # ID explícito de propiedad (prop_001)
     if body.startswith("prop_"):
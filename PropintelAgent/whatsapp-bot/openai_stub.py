@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatible con la API de chat.completions de OpenAI, para correr
+benchmarks y pruebas de carga del webhook / processor sin red y sin gastar tokens.
+
+Modos:
+- replay (por defecto): responde desde el archivo de fixtures. Si un request no
+  está grabado devuelve una respuesta sintética ("{}" en modo JSON) o, con
+  --strict, un 404.
+- record: reenvía cada request a OpenAI (--upstream, con OPENAI_API_KEY), guarda
+  la respuesta en el archivo de fixtures y la devuelve.
+
+La clave de cada fixture es el hash del request (modelo, mensajes,
+response_format, temperature, max_tokens), así el mismo turno siempre obtiene la
+misma respuesta. Las partes de los mensajes que cambian en cada corrida (la
+"Fecha y hora actual" que se agrega a los prompts de fechas y visitas) se
+normalizan antes del hash: una fixture grabada hoy sigue matcheando mañana
+(la respuesta grabada conserva las fechas absolutas de cuando se grabó).
+
+En replay la latencia simulada sale de una distribución con semilla fija
+(--latency), para que las corridas sean reproducibles; en record la latencia es
+la real de OpenAI y es la que se loguea.
+
+Uso:
+    python openai_stub.py --fixtures fixtures/openai.jsonl --latency lognormal:0.8,0.4
+    python openai_stub.py --mode record --fixtures fixtures/openai.jsonl
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=stub python bench_...
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.tokens import count_message_tokens, count_tokens
+
+# Campos del request que definen la respuesta (el resto, como timeout o user, no)
+KEY_FIELDS = ("model", "messages", "response_format", "temperature", "max_tokens")
+
+# Texto de los mensajes que cambia entre corridas sin cambiar el request (→ reemplazo estable)
+VOLATILE_PATTERNS = [
+    (re.compile(r"Fecha y hora actual en Argentina: [^\n]*"), "Fecha y hora actual en Argentina: <ahora>"),
+]
+
+
+def _stable_content(content):
+    if not isinstance(content, str):
+        return content
+    for pattern, replacement in VOLATILE_PATTERNS:
+        content = pattern.sub(replacement, content)
+    return content
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Hash estable del request para buscar la fixture (sin las partes volátiles de los mensajes)"""
+    relevant = {field: body.get(field) for field in KEY_FIELDS}
+    relevant["messages"] = [
+        {**m, "content": _stable_content(m.get("content"))} if isinstance(m, dict) else m
+        for m in (relevant["messages"] or [])
+    ]
+    raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """
+    Latencia simulada por request (segundos):
+        none | fixed:S | uniform:MIN,MAX | normal:MEDIA,DESVIO | lognormal:MEDIANA,SIGMA
+    """
+
+    def __init__(self, spec: str = "none", seed: int = 42):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Distribución de latencia inválida: {spec}")
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._rnd.uniform(*self.params)
+            if self.kind == "normal":
+                return max(0.0, self._rnd.gauss(*self.params))
+            if self.kind == "lognormal":
+                median, sigma = self.params
+                return self._rnd.lognormvariate(math.log(median), sigma)
+            return 0.0
+
+
+class FixtureStore:
+    """Fixtures en JSONL: {"key", "request", "response"} por línea"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        self._items[item["key"]] = item["response"]
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._items.get(key)
+
+    def save(self, key: str, request: Dict[str, Any], response: Dict[str, Any]):
+        with self._lock:
+            self._items[key] = response
+            if not self.path:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "request": request, "response": response}, ensure_ascii=False) + "\n")
+
+
+def synthetic_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Respuesta para requests sin fixture: JSON vacío si se pidió JSON, texto fijo si no"""
+    wants_json = (body.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+    content = "{}" if wants_json else "Dale, lo reviso y te confirmo."
+    messages = body.get("messages") or []
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": count_message_tokens(messages),
+            "completion_tokens": count_tokens(content),
+            "total_tokens": count_message_tokens(messages) + count_tokens(content),
+        },
+    }
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mode: str, store: FixtureStore, latency: LatencyModel,
+                 strict: bool = False, upstream: str = "https://api.openai.com/v1", api_key: Optional[str] = None):
+        super().__init__(address, StubHandler)
+        self.mode = mode
+        self.store = store
+        self.latency = latency
+        self.strict = strict
+        self.upstream = upstream.rstrip("/")
+        self.api_key = api_key
+        self.counters = {"requests": 0, "hits": 0, "misses": 0, "recorded": 0, "errors": 0}
+        self._counters_lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def forward(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Reenvía el request a OpenAI (modo record)"""
+        req = urllib.request.Request(
+            f"{self.upstream}/chat/completions",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def log_message(self, format, *args):
+        pass  # cada request se loguea en do_POST con el resultado
+
+    def _send_json(self, status: int, payload: Dict[str, Any], cache: str = ""):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if cache:
+            self.send_header("X-Stub-Cache", cache)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status: int, message: str, error_type: str = "invalid_request_error"):
+        self._send_json(status, {"error": {"message": message, "type": error_type}})
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path in ("", "/health"):
+            self._send_json(200, {"status": "ok", "mode": self.server.mode,
+                                  "fixtures": len(self.server.store), **self.server.counters})
+        elif path in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]})
+        else:
+            self._error(404, f"Ruta desconocida: {self.path}")
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            return self._error(404, f"Ruta desconocida: {self.path}")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._error(400, f"JSON inválido: {e}")
+        if not isinstance(body.get("messages"), list):
+            return self._error(400, "Falta 'messages'")
+        if body.get("stream"):
+            return self._error(400, "El stub no soporta stream=true")
+
+        server = self.server
+        server.count("requests")
+        key = request_key(body)
+
+        if server.mode == "record":
+            # Latencia real de OpenAI (el modelo de latencia es solo para replay)
+            started = time.monotonic()
+            try:
+                response = server.forward(body)
+            except urllib.error.HTTPError as e:
+                server.count("errors")
+                return self._send_json(e.code, json.loads(e.read().decode("utf-8") or "{}"))
+            except Exception as e:
+                server.count("errors")
+                return self._error(502, f"Upstream: {e}", "api_error")
+            server.store.save(key, body, response)
+            server.count("recorded")
+            cache = "record"
+            delay = time.monotonic() - started
+        else:
+            delay = server.latency.sample()
+            response = server.store.get(key)
+            if response is not None:
+                server.count("hits")
+                cache = "hit"
+            elif server.strict:
+                server.count("misses")
+                return self._error(404, f"Sin fixture para el request {key[:12]}")
+            else:
+                server.count("misses")
+                response = synthetic_completion(body)
+                cache = "miss"
+            response = {**response, "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}", "created": int(time.time())}
+            time.sleep(delay)
+
+        print(f"🤖 [STUB] {cache:<6} {key[:12]} {body.get('model', '?')} {delay * 1000:.0f}ms")
+        self._send_json(200, response, cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatible con OpenAI chat.completions")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", choices=["replay", "record"], default="replay")
+    parser.add_argument("--fixtures", default="fixtures/openai.jsonl", help="archivo JSONL de fixtures")
+    parser.add_argument("--latency", default="none",
+                        help="none | fixed:S | uniform:MIN,MAX | normal:MEDIA,DESVIO | lognormal:MEDIANA,SIGMA")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--strict", action="store_true", help="404 para requests sin fixture (modo replay)")
+    parser.add_argument("--upstream", default="https://api.openai.com/v1")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if args.mode == "record" and not api_key:
+        print("❌ [STUB] El modo record necesita OPENAI_API_KEY")
+        return 1
+
+    server = StubServer(
+        (args.host, args.port), args.mode, FixtureStore(args.fixtures),
+        LatencyModel(args.latency, args.seed), strict=args.strict, upstream=args.upstream, api_key=api_key,
+    )
+    print(f"🚀 [STUB] {args.mode} en http://{args.host}:{args.port}/v1 "
+          f"({len(server.store)} fixtures, latencia {args.latency})")
+    print(f"   OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 [STUB] {server.counters}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
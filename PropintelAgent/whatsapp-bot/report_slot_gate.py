@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Reporte del gate de refinamiento de extract_slots sobre un corpus de mensajes.
+Cuenta cuántas llamadas a OpenAI se hacían antes (una por mensaje entrante) y
+cuántas hace el gate por confianza, con el desglose por motivo. No usa OpenAI.
+
+El corpus es un JSONL con un mensaje por línea, por ejemplo un export de la
+tabla de mensajes: {"LeadId": "...", "Direction": "in", "Text": "..."}.
+Sin archivo se usa un corpus de ejemplo.
+
+Uso: python report_slot_gate.py [corpus.jsonl]
+"""
+
+import sys
+import os
+import json
+from collections import Counter
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.slot_rules import extract_slots_by_rules, refinement_reason, REQUIRED_SLOTS
+
+SAMPLE_CORPUS = [
+    ("lead_1", "Hola! vi la publicación"),
+    ("lead_1", "Busco alquilar un 2 ambientes en Palermo"),
+    ("lead_1", "hasta 150k"),
+    ("lead_1", "dale"),
+    ("lead_1", "si, para mi"),
+    ("lead_2", "Quiero comprar un depto de 3 amb en Belgrano, presupuesto 200.000 dólares"),
+    ("lead_2", "Perfecto"),
+    ("lead_2", "El sábado a la tarde puedo ir a verlo"),
+    ("lead_3", "Hola"),
+    ("lead_3", "Estoy buscando algo en Saavedra"),
+    ("lead_3", "unos 120 mil dolares"),
+    ("lead_3", "monoambiente o 2 amb"),
+    ("lead_4", "Vendo mi depto para alquilar otro en Núñez"),
+    ("lead_4", "gracias!"),
+    ("lead_5", "https://www.zonaprop.com.ar/propiedades/depto-palermo-123.html"),
+    ("lead_5", "tengo preaprobado el crédito"),
+    ("lead_5", "👍"),
+]
+
+
+def load_corpus(path: str) -> list:
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if str(row.get("Direction", "in")).lower() not in ("in", "inbound"):
+                continue
+            text = row.get("Text") or row.get("text")
+            if text:
+                messages.append((row.get("LeadId") or row.get("lead_id") or "", text))
+    return messages
+
+
+def main():
+    if len(sys.argv) > 1:
+        messages = load_corpus(sys.argv[1])
+        source = sys.argv[1]
+    else:
+        messages = SAMPLE_CORPUS
+        source = "corpus de ejemplo"
+
+    print(f"📊 Gate de refinamiento de extract_slots — {len(messages):,} mensajes ({source})")
+    print("=" * 60)
+
+    reasons = Counter()
+    calls = 0
+    known_by_lead = {}
+    for lead_id, text in messages:
+        known = known_by_lead.setdefault(lead_id, {})
+        slots, confidence = extract_slots_by_rules(text)
+        should_call, reason = refinement_reason(text, slots, confidence, known=known)
+        reasons[reason.split(":")[0]] += 1
+        reasons[reason] += 0 if ":" not in reason else 1
+        calls += 1 if should_call else 0
+        # Igual que el webhook: lo encontrado queda guardado en el lead
+        for key in REQUIRED_SLOTS:
+            if slots.get(key) is not None:
+                known[key] = slots[key]
+
+    baseline = len(messages)
+    for reason, count in sorted(reasons.items(), key=lambda kv: (kv[0].split(":")[0], kv[0])):
+        indent = "    " if ":" in reason else ""
+        print(f"{indent}{reason:<32} {count:6,}")
+    print("=" * 60)
+    print(f"🤖 Llamadas antes del gate : {baseline:,}")
+    print(f"🤖 Llamadas con el gate    : {calls:,}")
+    if baseline:
+        print(f"✅ Ahorro                   : {baseline - calls:,} ({(baseline - calls) / baseline:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,57 @@ import hmac
 from datetime import datetime, timedelta
 from typing import Dict, Any
 from fastapi import APIRouter, Body
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi import Depends, Header, HTTPException
 from pydantic import BaseModel
 
 from boto3.dynamodb.conditions import Key, Attr
-from services.dynamo import t_leads, t_msgs, t_props, t_visits
-from models.schemas import dec_to_native
+from services.dynamo import t_leads, t_msgs, t_props, t_visits, fast_leads, fast_msgs, fast_props, fast_visits
+from services.catalog import get_catalog
+from services.query_planner import plan_property_listing, index_attributes
+from services.scan import fetch_page
+from models.records import Lead, Message, Property, Visit, render_items
+from utils.urls import normalize_property_url
+from utils.cursor import encode_cursor, decode_cursor, CursorSecretMissing
 
 router = APIRouter(prefix="/admin")
 
+# Lecturas del panel: cliente de bajo nivel decodificando directo a registros
+leads_reader = fast_leads.with_record(Lead)
+msgs_reader = fast_msgs.with_record(Message)
+props_reader = fast_props.with_record(Property)
+visits_reader = fast_visits.with_record(Visit)
+
+MAX_PAGE_SIZE = 500
+
+def _items_response(records, next_cursor: str | None = None) -> Response:
+    # JSON armado desde cada registro (sin pasar por jsonable_encoder)
+    return Response(render_items(records, next_cursor=next_cursor), media_type="application/json")
+
+def _paged_response(operation, scope: str, limit: int, cursor: str | None, **kwargs) -> Response:
+    """
+    Una página del listado `scope`. El cursor firmado envuelve el LastEvaluatedKey
+    de DynamoDB; se devuelve como next_cursor (null en la última página).
+    Sin secreto configurado, una página que necesita cursor responde 503.
+    """
+    try:
+        start_key = decode_cursor(cursor, scope)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CursorSecretMissing as e:
+        raise _cursor_unavailable(e)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    items, last_key = fetch_page(operation, limit, start_key, **kwargs)
+    try:
+        next_cursor = encode_cursor(last_key, scope)
+    except CursorSecretMissing as e:
+        raise _cursor_unavailable(e)
+    return _items_response(items, next_cursor)
+
+def _cursor_unavailable(error: Exception) -> HTTPException:
+    print(f"❌ [ADMIN] {error}")
+    return HTTPException(status_code=503, detail=str(error))
+
 # Modelos para autenticación
 class LoginRequest(BaseModel):
     username: str
@@ -130,25 +171,24 @@ def validate_user(request: ValidateRequest):
 
 
 @router.get("/leads")
-def list_leads(status: str | None = None, limit: int = 50, _: bool = Depends(verify_api_key)):
+def list_leads(status: str | None = None, limit: int = 50, cursor: str | None = None, _: bool = Depends(verify_api_key)):
     if status:
         # requiere GSI_Status (Status + UpdatedAt)
-        resp = t_leads.query(
+        return _paged_response(
+            leads_reader.query, f"leads:{status}", limit, cursor,
             IndexName="GSI_Status",
             KeyConditionExpression=Key("Status").eq(status),
             ScanIndexForward=False,
-            Limit=limit
         )
-        items = resp.get("Items", [])
-    else:
-        # sin filtro → NO hay scan aquí para no romper costos; pedí siempre por status
-        items = []
-    return {"items": dec_to_native(items)}
+    # sin filtro → NO hay scan aquí para no romper costos; pedí siempre por status
+    return _items_response([])
 
 @router.get("/lead")
 def get_lead(lead_id: str, _: bool = Depends(verify_api_key)):
-    resp = t_leads.get_item(Key={"LeadId": lead_id})
-    return JSONResponse(dec_to_native(resp.get("Item", {})))
+    resp = leads_reader.get_item(Key={"LeadId": lead_id})
+    if "Item" not in resp:
+        return JSONResponse({})
+    return Response(resp["Item"].to_json(), media_type="application/json")
 
 @router.post("/leads")
 def create_lead(item: dict = Body(...), _: bool = Depends(verify_api_key)):
@@ -157,35 +197,43 @@ def create_lead(item: dict = Body(...), _: bool = Depends(verify_api_key)):
     return {"ok": True, "id": item.get("LeadId")}
 
 @router.get("/messages")
-def get_messages(lead_id: str, limit: int = 50, _: bool = Depends(verify_api_key)):
-    resp = t_msgs.query(
+def get_messages(lead_id: str, limit: int = 50, cursor: str | None = None, _: bool = Depends(verify_api_key)):
+    return _paged_response(
+        msgs_reader.query, f"messages:{lead_id}", limit, cursor,
         KeyConditionExpression=Key("LeadId").eq(lead_id),
         ScanIndexForward=False,
-        Limit=limit
     )
-    return {"items": dec_to_native(resp.get("Items", []))}
 
 @router.get("/properties")
-def get_properties(neighborhood: str | None = None, limit: int = 100, _: bool = Depends(verify_api_key)):
-    if neighborhood:
-        resp = t_props.scan(
-            FilterExpression=Attr("Status").eq("ACTIVE") & Attr("Neighborhood").eq(neighborhood)
-        )
-    else:
-        resp = t_props.scan(
-            FilterExpression=Attr("Status").eq("ACTIVE")
-        )
-    items = resp.get("Items", [])
-    return {"items": dec_to_native(items[:limit])}
+def get_properties(neighborhood: str | None = None, limit: int = 100, cursor: str | None = None, _: bool = Depends(verify_api_key)):
+    # Con PROPERTY_SEARCH_BACKEND=dynamo: GSI_StatusNeighborhood con barrio, GSI_StatusPrice sin
+    # barrio (ambos ordenados por precio); si no, scan filtrado. El scope separa los cursores de cada uno
+    plan = plan_property_listing(neighborhood=neighborhood)
+    operation = props_reader.query if plan.operation == "query" else props_reader.scan
+    return _paged_response(operation, f"properties:{plan.operation}:{neighborhood or ''}", limit, cursor, **plan.kwargs)
 
 @router.post("/properties")
 def create_property(item: dict = Body(...), _: bool = Depends(verify_api_key)):
     # Espera: {PropertyId, Title, Neighborhood, Rooms, Price, Status, URL}
+    # UrlKey alimenta GSI_UrlKey para resolver links pegados con una lectura por clave
+    url_key = normalize_property_url(item.get("URL") or "")
+    if url_key:
+        item["UrlKey"] = url_key
+    item.update(index_attributes(item))
     t_props.put_item(Item=item)
+    get_catalog().invalidate()
     return {"ok": True, "id": item.get("PropertyId")}
 
 @router.put("/properties/{property_id}")
 def update_property(property_id: str, fields: dict = Body(...), _: bool = Depends(verify_api_key)):
+    if fields.get("URL"):
+        url_key = normalize_property_url(fields["URL"])
+        if url_key:
+            fields["UrlKey"] = url_key
+    if "Status" in fields or "Neighborhood" in fields or "Price" in fields:
+        # Las claves de los GSI combinan estos campos: completar con el valor actual
+        current = t_props.get_item(Key={"PropertyId": property_id}).get("Item", {})
+        fields.update(index_attributes({**current, **fields}))
     # build update expression dinámico
     expr_names, expr_values, sets = {}, {}, []
     i = 0
@@ -201,28 +249,27 @@ def update_property(property_id: str, fields: dict = Body(...), _: bool = Depend
         ExpressionAttributeNames=expr_names,
         ExpressionAttributeValues=expr_values,
     )
+    get_catalog().invalidate()
     return {"ok": True}
 
 @router.get("/visits")
-def list_visits(lead_id: str | None = None, property_id: str | None = None, limit: int = 50, _: bool = Depends(verify_api_key)):
+def list_visits(lead_id: str | None = None, property_id: str | None = None, limit: int = 50,
+                cursor: str | None = None, _: bool = Depends(verify_api_key)):
     if lead_id:
-        resp = t_visits.query(
+        return _paged_response(
+            visits_reader.query, f"visits:lead:{lead_id}", limit, cursor,
             KeyConditionExpression=Key("LeadId").eq(lead_id),
             ScanIndexForward=False,
-            Limit=limit
         )
-        return {"items": dec_to_native(resp.get("Items", []))}
     if property_id:
-        resp = t_visits.query(
+        return _paged_response(
+            visits_reader.query, f"visits:property:{property_id}", limit, cursor,
             IndexName="GSI_Property",
             KeyConditionExpression=Key("PropertyId").eq(property_id),
             ScanIndexForward=False,
-            Limit=limit
         )
-        return {"items": dec_to_native(resp.get("Items", []))}
     # Si no se especifica filtro, listar todas las visitas
-    resp = t_visits.scan(Limit=limit)
-    return {"items": dec_to_native(resp.get("Items", []))}
+    return _paged_response(visits_reader.scan, "visits:all", limit, cursor)
 
 @router.put("/visits/confirm")
 def confirm_visit(lead_id: str, visit_at: str, confirmed: bool = True, _: bool = Depends(verify_api_key)):
@@ -239,6 +286,25 @@ def create_visit(item: dict = Body(...), _: bool = Depends(verify_api_key)):
     t_visits.put_item(Item=item)
     return {"ok": True, "id": f"{item.get('LeadId')}-{item.get('VisitAt')}"}
 
+@router.get("/llm-cache/stats")
+def llm_cache_stats(_: bool = Depends(verify_api_key)):
+    """Hits/misses de la caché de extracciones de OpenAI en este contenedor"""
+    from services.llm_cache import get_llm_cache
+    return get_llm_cache().stats()
+
+@router.get("/lead-sessions/stats")
+def lead_session_stats(_: bool = Depends(verify_api_key)):
+    """Escrituras agrupadas por turno, conflictos de versión y fallos de escritura del lead en este contenedor"""
+    from services.lead_session import session_stats
+    return session_stats()
+
+@router.get("/llm/routes")
+def llm_routes(_: bool = Depends(verify_api_key)):
+    """Rutas de modelos vigentes, histogramas de latencia/tokens por ruta y estado del circuito de OpenAI"""
+    from services.model_routing import routes_report
+    from services.llm import get_llm
+    return {**routes_report(), "llm": get_llm().stats()}
+
 @router.get("/pending-messages")
 def get_pending_messages(lead_id: str, _: bool = Depends(verify_api_key)):
     """
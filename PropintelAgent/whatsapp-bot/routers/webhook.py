@@ -12,6 +12,11 @@ from services.ai import (
     generate_stage_based_response, get_property_by_url
 )
 from services.matching import find_matches, format_props_sms, props_ids
+from services.turn_analysis import analyze_turn
+from services.turn_tasks import TurnGraph
+from services.summary import schedule_summary_update
+from services.lead_session import lead_session, current_session
+from config import TURN_ANALYSIS_MODE
 from models.schemas import (
     merge_profile, qualifies, next_question, dec_to_native,
     set_last_suggestions, choose_property_from_reply,
@@ -75,28 +80,48 @@ async def webhook(request: Request, From: str = Form(...), Body: str = Form(...)
 def process_lead_message(lead_id: str, message_text: str) -> str:
     """
     Procesa un mensaje de lead (usado por el Lambda Processor).
+    Las escrituras al lead del turno se juntan en un solo update_item antes de
+    enviar la respuesta; el resumen de la conversación se actualiza aparte, fuera
+    de la respuesta (services.summary.schedule_summary_update).
     """
+    with lead_session(lead_id):
+        return _process_turn(lead_id, message_text)
+
+def _process_turn(lead_id: str, message_text: str) -> str:
     try:
-        # 1. Obtener/crear lead
-        lead = get_lead(lead_id)
+        # En modo "single" la IA se consulta una sola vez por turno (analyze_turn);
+        # acá solo corren las reglas
+        single_call = TURN_ANALYSIS_MODE == "single"
+        
+        # 1-3. Pasos independientes del turno según sus dependencias:
+        #   lead ──► slots ──► persist_slots
+        #     └────► context
+        #   url (no depende de nada)
+        graph = TurnGraph()
+        graph.add("lead", get_lead, lead_id)
+        graph.add("url", get_property_by_url, message_text)
+        graph.add("slots", lambda lead: extract_slots(message_text, use_ai=not single_call, known=_known_slots(lead)),
+                  after=["lead"])
+        graph.add("context", lambda lead: get_stage_appropriate_context(
+                      lead_id, lead.get("Stage", "PRECALIFICACION"), since=lead.get("SummarizedUntil"), lead=lead),
+                  after=["lead"])
+        graph.add("persist_slots", lambda lead, slots: _persist_slots(lead_id, slots), after=["lead", "slots"])
+        steps = graph.run()
+        
+        lead = steps["lead"]
+        slots = steps["slots"]
+        conversation_history = steps["context"]
         print(f"📊 Lead: {lead.get('Stage', 'N/A')} - {lead.get('Status', 'N/A')}")
         
-        # 2. Extraer datos básicos del mensaje
-        slots = extract_slots(message_text)
-        if any(slots.values()):
-            update_data = {}
-            for key in ["intent", "rooms", "budget", "neighborhood"]:
-                if slots.get(key) is not None:
-                    update_data[key.capitalize()] = slots[key]
-            
-            if update_data:
-                update_lead(lead_id, update_data)
-                for k, v in update_data.items():
-                    lead[k] = v
-                print(f"📝 Datos actualizados: {update_data}")
+        # 2. Datos básicos del mensaje (ya guardados en persist_slots)
+        update_data = steps["persist_slots"]
+        if update_data:
+            for k, v in update_data.items():
+                lead[k] = v
+            print(f"📝 Datos actualizados: {update_data}")
         
         # 3. FLUJO ESPECIAL: URL de propiedad detectada (mantener para compatibilidad)
-        property_from_url = get_property_by_url(message_text)
+        property_from_url = steps["url"]
         if property_from_url and not lead.get("PropertyId") and lead.get("Stage") != "PRECALIFICACION":
             property_id = property_from_url.get("PropertyId")
             print(f"🔗 Propiedad por URL (flujo legacy): {property_id}")
@@ -104,14 +129,28 @@ def process_lead_message(lead_id: str, message_text: str) -> str:
             update_lead(lead_id, {"PropertyId": property_id})
             prop_title = property_from_url.get("Title", "Sin título")
             reply_text = f"Perfecto! Vi que te interesa: {prop_title}. Es esta la propiedad por la que consultas?"
-            put_message(lead_id, reply_text, direction="out")
-            send_whatsapp_message(lead_id, reply_text)
+            _deliver(lead_id, reply_text)
             return reply_text
         
+        # Agendando visita: si el parser local entiende la fecha, el turno no necesita IA
+        scheduling = lead.get("Stage") == "POST_CALIFICACION" and lead.get("Status") == "AGENDANDO_VISITA"
+        visit_iso = parse_visit_datetime(message_text, use_ai=False).get("iso") if scheduling else None
+        
+        # 3b. Análisis de turno: datos, calificación, fecha de visita y respuesta en una llamada
+        turn = None
+        if single_call and not visit_iso and _needs_turn_analysis(lead, slots, message_text):
+            turn = analyze_turn(lead, conversation_history, message_text)
+            ai_updates = turn.slot_updates(known=slots, confidence=slots.get("confidence")) if turn else {}
+            if ai_updates:
+                update_lead(lead_id, ai_updates)
+                lead.update(ai_updates)
+                print(f"📝 Datos actualizados (IA): {ai_updates}")
+        
         # 4. FLUJO ESPECIAL: Agendamiento de visita
-        if lead.get("Stage") == "POST_CALIFICACION" and lead.get("Status") == "AGENDANDO_VISITA":
-            date_data = parse_visit_datetime(message_text)
-            visit_iso = date_data.get("iso")
+        if scheduling:
+            # La fecha del análisis de turno solo si las reglas no la resolvieron
+            if not visit_iso:
+                visit_iso = turn.visit_iso if turn else parse_visit_datetime(message_text).get("iso")
             
             if visit_iso:
                 property_id = lead.get("PropertyId")
@@ -122,29 +161,28 @@ def process_lead_message(lead_id: str, message_text: str) -> str:
                     
                 fecha_str = format_datetime_for_user(visit_iso)
                 reply_text = f"¡Listo! Visita agendada para {fecha_str}. Te confirmaremos los detalles a la brevedad. ¡Gracias!"
-                put_message(lead_id, reply_text, direction="out")
-                send_whatsapp_message(lead_id, reply_text)
+                _deliver(lead_id, reply_text)
                 return reply_text
             else:
                 reply_text = "Disculpá, no pude entender la fecha u hora. Por favor indicame un día y horario (ej: viernes 15hs o mañana 10:00)."
-                put_message(lead_id, reply_text, direction="out")
-                send_whatsapp_message(lead_id, reply_text)
+                _deliver(lead_id, reply_text)
                 return reply_text
         
         # 5. FLUJO PRINCIPAL: Generar respuesta usando sistema de etapas
-        conversation_history = get_stage_appropriate_context(lead_id, lead.get("Stage", "PRECALIFICACION"))
-        
         print(f"💬 Contexto: {len(conversation_history)} mensajes para etapa {lead.get('Stage', 'PRECALIFICACION')}")
         
-        response = generate_stage_based_response(lead, conversation_history, message_text)
+        response = generate_stage_based_response(lead, conversation_history, message_text, turn=turn)
         
         if response is None:
             response = "Disculpá, tuve un inconveniente técnico. Por favor intentá nuevamente en unos minutos."
         
-        put_message(lead_id, response, direction="out")
-        send_whatsapp_message(lead_id, response)
+        _deliver(lead_id, response)
         print(f"✅ Respuesta: {response[:100]}...")
         
+        # Ya respondido: plegar el historial viejo en el resumen del lead si creció,
+        # fuera de la respuesta (la llamada a la IA no cuenta en el tiempo del turno)
+        schedule_summary_update(lead_id, lead, conversation_history)
+        
         return response
         
     except Exception as e:
@@ -153,6 +191,52 @@ def process_lead_message(lead_id: str, message_text: str) -> str:
         print(f"❌ TRACE: {traceback.format_exc()}")
         return "Disculpá, tuve un problema técnico. Por favor intentá nuevamente."
 
+def _known_slots(lead) -> dict:
+    """Datos que el lead ya tiene, con las claves de extract_slots"""
+    return {key: lead.get(key.capitalize()) for key in ["intent", "rooms", "budget", "neighborhood"]}
+
+def _needs_turn_analysis(lead, slots: dict, message_text: str) -> bool:
+    """
+    En etapas donde el análisis de turno solo extrae datos (PRECALIFICACION) se
+    llama a OpenAI con el mismo criterio que extract_slots con IA: solo si una
+    regla quedó ambigua o falta un dato que el mensaje parece mencionar.
+    """
+    from services.turn_analysis import stage_has_reply
+    from services.slot_rules import refinement_reason
+
+    if stage_has_reply(lead.get("Stage", "PRECALIFICACION")):
+        return True
+    should_call, reason = refinement_reason(message_text, slots, slots.get("confidence") or {},
+                                            known=_known_slots(lead))
+    slots["refinement"] = reason
+    if not should_call:
+        print(f"[SLOTS] Sin análisis de turno ({reason})")
+    return should_call
+
+def _persist_slots(lead_id: str, slots: dict) -> dict:
+    """Guarda en el lead los datos detectados por las reglas; retorna lo que se actualizó"""
+    update_data = {}
+    for key in ["intent", "rooms", "budget", "neighborhood"]:
+        if slots.get(key) is not None:
+            update_data[key.capitalize()] = slots[key]
+    if update_data:
+        update_lead(lead_id, update_data)
+    return update_data
+
+def _deliver(lead_id: str, reply_text: str):
+    """
+    Escribe los cambios del turno, después guarda la respuesta y recién ahí la
+    envía: el lead no recibe una respuesta cuyo estado (etapa, datos, propiedad)
+    no quedó guardado. Si la escritura del lead falla (LeadConflict o error de
+    DynamoDB), el error sigue al except del turno sin registrar la respuesta en
+    Messages/RecentMessages, así el historial coincide con lo que vio el lead.
+    """
+    session = current_session(lead_id)
+    if session is not None:
+        session.flush()
+    put_message(lead_id, reply_text, direction="out")
+    send_whatsapp_message(lead_id, reply_text)
+
 def send_whatsapp_message(lead_id: str, message: str):
     """
     Envía mensaje a WhatsApp usando Twilio (implementar según tu setup).
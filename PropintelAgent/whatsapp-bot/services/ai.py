@@ -1,7 +1,10 @@
 import json
 from typing import Dict, Any
 from datetime import datetime
-from config import OPENAI_API_KEY, OPENAI_MODEL
+from config import OPENAI_API_KEY, OPENAI_BASE_URL
+from models.records import Property
+from services.llm import llm_available, LLMUnavailable
+from services.model_routing import routed_completion, get_route
 
 # Debug directo de variables de entorno
 import os
@@ -16,8 +19,8 @@ if OPENAI_API_KEY:
     print(f"🔍 [DEBUG] API Key (primeros 10 chars): {OPENAI_API_KEY[:10]}...")
     try:
         from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        print("✅ [DEBUG] Cliente OpenAI inicializado correctamente")
+        client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        print(f"✅ [DEBUG] Cliente OpenAI inicializado correctamente{f' ({OPENAI_BASE_URL})' if OPENAI_BASE_URL else ''}")
     except Exception as e:
         print(f"❌ [DEBUG] Error inicializando OpenAI: {e}")
         client = None
@@ -168,167 +171,110 @@ Gonzalo: "Si, soy un asistente virtual de la inmobiliaria. Si preferis hablar co
 Respondé siempre como una persona de inmobiliaria con experiencia. NUNCA como asistente virtual.
 """
 
-def extract_slots(text: str) -> Dict[str, Any]:
+SLOTS_EXTRACTION_PROMPT = """Extraé información básica de este mensaje inmobiliario en JSON:
+- intent: "alquiler", "venta", o "consulta" (null si no está claro)
+- rooms: número de ambientes como entero (null si no se menciona)
+- budget: presupuesto en pesos como entero (null si no se menciona)
+- neighborhood: barrio mencionado (null si no se menciona)
+- visit_intent: true si quiere ver/visitar propiedades
+
+Convertí montos: 150k=150000, 1.5M=1500000. Solo JSON:"""
+
+def extract_slots(text: str, use_ai: bool = True, known: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     Extrae información estructurada del mensaje usando reglas y OpenAI cuando esté disponible.
+    Con use_ai=False solo aplica las reglas (el refinamiento lo hace el análisis de turno).
+    OpenAI se consulta solo si falta un dato requerido que el mensaje parece mencionar
+    o si una regla es ambigua; el motivo queda en result["refinement"].
+    `known` son los datos que el lead ya tiene (intent, rooms, budget, neighborhood).
     """
-    text_lower = text.lower()
-    result = {
-        "intent": None, 
-        "rooms": None, 
-        "budget": None,
-        "neighborhood": None, 
-        "visit_intent": False, 
-        "missing": []
-    }
+    from services.slot_rules import extract_slots_by_rules, refinement_reason
+    from config import SLOT_CONFIDENCE_THRESHOLD
     
     # EXTRACCIÓN CON REGLAS (siempre funciona)
+    result, confidence = extract_slots_by_rules(text)
+    result["confidence"] = confidence
     
-    # 1. Intent (alquiler/venta)
-    if any(word in text_lower for word in ["alquil", "rent", "arrendar"]):
-        result["intent"] = "alquiler"
-    elif any(word in text_lower for word in ["compr", "venta", "vend"]):
-        result["intent"] = "venta"
-    
-    # 2. Ambientes/Rooms
-    import re
-    room_patterns = [
-        r"(\d+)\s*amb",
-        r"(\d+)\s*habitac",
-        r"(\d+)\s*dormitor",
-        r"(\d+)\s*cuarto",
-        r"monoambiente",
-        r"mono"
-    ]
-    
-    for pattern in room_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            if pattern in ["monoambiente", "mono"]:
-                result["rooms"] = 1
-            else:
-                try:
-                    result["rooms"] = int(match.group(1))
-                except:
-                    pass
-            break
-    
-    # 3. Budget
-    budget_patterns = [
-        r"(\d+)k",  # 150k
-        r"(\d+\.?\d*)\s*m",  # 1.5M
-        r"\$\s*(\d{1,3}(?:[.,]\d{3})*)",  # $150,000
-        r"(\d{1,3}(?:[.,]\d{3})*)\s*peso",  # 150,000 pesos
-        r"presupuesto.*?(\d{1,3}(?:[.,]\d{3})*)"  # presupuesto 150000
-    ]
-    
-    for pattern in budget_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            try:
-                amount_str = match.group(1).replace(",", "").replace(".", "")
-                if "k" in pattern:
-                    result["budget"] = int(float(amount_str) * 1000)
-                elif "m" in pattern:
-                    result["budget"] = int(float(amount_str) * 1000000)
-                else:
-                    result["budget"] = int(amount_str)
-                break
-            except:
-                pass
-    
-    # 4. Neighborhood
-    barrios = {
-        "nuñez": "Núñez", "palermo": "Palermo", "belgrano": "Belgrano",
-        "recoleta": "Recoleta", "san telmo": "San Telmo", "puerto madero": "Puerto Madero",
-        "villa crespo": "Villa Crespo", "caballito": "Caballito", "flores": "Flores",
-        "barracas": "Barracas", "boca": "La Boca", "tigre": "Tigre",
-        "vicente lopez": "Vicente López", "olivos": "Olivos", "martinez": "Martínez"
-    }
+    if not use_ai or not llm_available():
+        result["refinement"] = "ai_disabled"
+        return result
     
-    for barrio_key, barrio_nombre in barrios.items():
-        if barrio_key in text_lower:
-            result["neighborhood"] = barrio_nombre
-            break
+    should_call, reason = refinement_reason(text, result, confidence, known=known)
+    result["refinement"] = reason
+    if not should_call:
+        print(f"[SLOTS] Sin refinamiento IA ({reason})")
+        return result
     
-    # 5. Visit intent
-    visit_keywords = ["visita", "ver", "conocer", "mostrar", "coordinar", "agendar"]
-    result["visit_intent"] = any(keyword in text_lower for keyword in visit_keywords)
+    print(f"[SLOTS] Refinando con IA ({reason})")
+    from services.llm_cache import cached_completion
     
-    # Si OpenAI está disponible, usar para refinar
-    if client:
+    def _complete():
         try:
-            extraction_prompt = """Extraé información básica de este mensaje inmobiliario en JSON:
-- intent: "alquiler", "venta", o "consulta" (null si no está claro)
-- rooms: número de ambientes como entero (null si no se menciona)
-- budget: presupuesto en pesos como entero (null si no se menciona)
-- neighborhood: barrio mencionado (null si no se menciona)
-- visit_intent: true si quiere ver/visitar propiedades
-
-Convertí montos: 150k=150000, 1.5M=1500000. Solo JSON:"""
-
             messages = [
-                {"role": "system", "content": extraction_prompt},
+                {"role": "system", "content": SLOTS_EXTRACTION_PROMPT},
                 {"role": "user", "content": f"Texto: {text}"}
             ]
-            resp = client.chat.completions.create(
-                model=OPENAI_MODEL,
+            resp = routed_completion(
+                "slots",
                 messages=messages,
                 response_format={"type": "json_object"},
             )
-            ai_result = json.loads(resp.choices[0].message.content)
-            
-            # Combinar resultados: AI override si detecta algo que reglas no detectaron
-            for key in ["intent", "rooms", "budget", "neighborhood", "visit_intent"]:
-                if ai_result.get(key) and not result.get(key):
-                    result[key] = ai_result[key]
-                    
+            data = json.loads(resp.choices[0].message.content)
+            return data if isinstance(data, dict) else None
         except Exception as e:
             print(f"[AI][ERROR] {e}")
+            return None
+    
+    # Cacheado por texto normalizado (mensajes cortos se repiten entre leads)
+    ai_result = cached_completion("slots", SLOTS_EXTRACTION_PROMPT, get_route("slots").model, text, _complete) or {}
+    
+    # Combinar resultados: la IA completa lo que las reglas no detectaron
+    # y reemplaza lo que detectaron con baja confianza
+    for key in ["intent", "rooms", "budget", "neighborhood", "visit_intent"]:
+        if ai_result.get(key) and (not result.get(key) or confidence.get(key, 0.0) < SLOT_CONFIDENCE_THRESHOLD):
+            result[key] = ai_result[key]
+    result["missing"] = [key for key in result["missing"] if result.get(key) is None]
     
     return result
 
+QUALIFICATION_PROMPT = (
+    "Analizá el siguiente mensaje de un lead inmobiliario y devolvé JSON con estas claves booleanas: "
+    "buyer_confirmed, motive_confirmed, financing_confirmed, timeline_confirmed, ready_to_close, "
+    "needs_to_sell, has_preapproval, decision_maker. Si no hay evidencia, usar false. Solo JSON."
+)
+
 def analyze_qualification_ai(message_text: str, conversation_history: list) -> dict:
     """
     Extrae señales de calificación usando OpenAI (multilenguaje y robusto).
     Devuelve dict con keys de QualificationData.
+    Solo depende del mensaje, así que el resultado se cachea por texto normalizado.
     """
-    try:
-        import json
-        global client
-        if client is None:
-            return {}
-        prompt = (
-            "Analizá el siguiente mensaje de un lead inmobiliario y devolvé JSON con estas claves booleanas: "
-            "buyer_confirmed, motive_confirmed, financing_confirmed, timeline_confirmed, ready_to_close, "
-            "needs_to_sell, has_preapproval, decision_maker. Si no hay evidencia, usar false. Solo JSON."
-        )
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Mensaje: {message_text}"},
-        ]
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=messages,
-            response_format={"type": "json_object"},
-        )
-        data = json.loads(resp.choices[0].message.content or "{}")
-        return data if isinstance(data, dict) else {}
-    except Exception as e:
-        print(f"[AI][analyze_qualification_ai][ERROR] {e}")
+    if not llm_available():
         return {}
+    
+    def _complete():
+        try:
+            messages = [
+                {"role": "system", "content": QUALIFICATION_PROMPT},
+                {"role": "user", "content": f"Mensaje: {message_text}"},
+            ]
+            resp = routed_completion(
+                "qualification",
+                messages=messages,
+                response_format={"type": "json_object"},
+            )
+            data = json.loads(resp.choices[0].message.content or "{}")
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"[AI][analyze_qualification_ai][ERROR] {e}")
+            return None
+    
+    from services.llm_cache import cached_completion
+    return cached_completion("qualification", QUALIFICATION_PROMPT, get_route("qualification").model, message_text, _complete) or {}
 
 
 
-def parse_visit_datetime(text: str) -> dict:
-    """
-    Devuelve {"iso": "<ISO8601>"} o {"iso": null}
-    Confía en OpenAI si hay API key; si no, vuelve null.
-    """
-    if not client:
-        return {"iso": None}
-    try:
-        system_prompt = """Sos un parser de fechas/horarios en español argentino para agendar visitas inmobiliarias.
+VISIT_DATE_PROMPT = """Sos un parser de fechas/horarios en español argentino para agendar visitas inmobiliarias.
 
 OBJETIVO: Convertir expresiones de fecha/hora en español a formato ISO8601 con zona horaria de Argentina (UTC-3).
 
@@ -349,23 +295,45 @@ REGLAS:
 - Si hay ambigüedad o no se puede parsear, devolver {"iso": null}
 
 EJEMPLOS:
-"viernes a las 15" → {"iso": "2024-01-12T15:00:00-03:00"} (asumiendo viernes próximo)
+(con fecha actual lunes 2024-01-08)
+"viernes a las 15" → {"iso": "2024-01-12T15:00:00-03:00"} (viernes próximo)
 "mañana 18hs" → {"iso": "2024-01-09T18:00:00-03:00"} (día siguiente)
 "lunes por la mañana" → {"iso": "2024-01-15T10:00:00-03:00"} (lunes próximo a las 10)
 "no puedo" → {"iso": null}
 
 Devolvé SOLO el JSON."""
 
+
+def parse_visit_datetime(text: str, use_ai: bool = True, now: datetime = None) -> dict:
+    """
+    Devuelve {"iso": "<ISO8601>"} o {"iso": null}
+    Primero usa el parser local (utils.dates); OpenAI solo se consulta si el texto
+    menciona una fecha que las reglas no pueden resolver con certeza, y recibe la
+    fecha actual como referencia.
+    """
+    from utils.dates import parse_visit_text, ARGENTINA_TZ, WEEKDAYS
+    
+    now = now or datetime.now(ARGENTINA_TZ)
+    parsed = parse_visit_text(text, now)
+    if parsed["iso"] or not parsed["ambiguous"]:
+        print(f"[DATE] Parser local: '{text}' → {parsed['iso']}")
+        return {"iso": parsed["iso"]}
+    
+    if not use_ai or not llm_available():
+        return {"iso": None}
+    print(f"[DATE] Fecha ambigua, consultando IA: '{text}'")
+    try:
+        local_now = now.astimezone(ARGENTINA_TZ)
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": VISIT_DATE_PROMPT},
+            {"role": "system", "content": f"Fecha y hora actual en Argentina: {WEEKDAYS[local_now.weekday()]} {local_now.strftime('%Y-%m-%d %H:%M')} (-03:00)."},
             {"role": "user", "content": text}
         ]
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
+        resp = routed_completion(
+            "visit_date",
             messages=messages,
             response_format={"type": "json_object"},
         )
-        import json
         data = json.loads(resp.choices[0].message.content)
         iso = data.get("iso")
         # Sanitizar: string no vacía
@@ -407,58 +375,32 @@ def format_datetime_for_user(iso_string: str) -> str:
         return "fecha no válida"
 
 
-def get_property_by_url(message_text: str) -> dict:
+def get_property_by_url(message_text: str):
     """
     Busca una propiedad específica por URL en el mensaje.
-    Si encuentra un link válido en la base de datos, retorna la propiedad.
+    Si encuentra un link válido en la base de datos, retorna la propiedad (registro Property).
     """
-    import re
+    from utils.urls import extract_urls
     
     # Detectar URLs en el mensaje
-    url_pattern = r'https?://[^\s]+'
-    urls = re.findall(url_pattern, message_text)
+    urls = extract_urls(message_text)
     
     if not urls:
         return {}
     
     try:
-        from services.dynamo import t_props
-        from boto3.dynamodb.conditions import Attr
-        from models.schemas import dec_to_native
+        from services.catalog import get_catalog
+        catalog = get_catalog()
         
         for url in urls:
             print(f"[DEBUG] Buscando propiedad por URL: {url}")
             
-            # Buscar por coincidencia del final del URL (más confiable que búsqueda exacta)
-            url_suffix = url.split('/')[-1]  # ej: "prop_001"
+            prop = catalog.find_by_url(url)
+            if prop:
+                print(f"[DEBUG] ✅ Propiedad encontrada por URL: {prop.get('Title', 'Sin título')}")
+                return Property.coerce(prop)
             
-            try:
-                resp = t_props.scan(
-                    FilterExpression=Attr("URL").contains(url_suffix) & Attr("Status").eq("ACTIVE"),
-                    Limit=5
-                )
-                
-                items = resp.get("Items", [])
-                print(f"[DEBUG] Items encontrados por sufijo '{url_suffix}': {len(items)}")
-                
-                # Verificar coincidencia exacta entre los resultados
-                for item in items:
-                    prop = dec_to_native(item)
-                    if prop.get("URL") == url:
-                        print(f"[DEBUG] ✅ Propiedad encontrada por URL: {prop.get('Title', 'Sin título')}")
-                        return {
-                            "PropertyId": prop.get("PropertyId"),
-                            "Title": prop.get("Title"),
-                            "Neighborhood": prop.get("Neighborhood"),
-                            "Rooms": prop.get("Rooms"),
-                            "Price": prop.get("Price"),
-                            "URL": prop.get("URL")
-                        }
-                
-                print(f"[DEBUG] ❌ No se encontró coincidencia exacta para URL: {url}")
-                    
-            except Exception as scan_error:
-                print(f"[DEBUG] ❌ Error en scan: {scan_error}")
+            print(f"[DEBUG] ❌ No se encontró propiedad para URL: {url}")
         
         return {}
         
@@ -471,45 +413,18 @@ def get_filtered_properties(lead_data: dict) -> list:
     Obtiene propiedades filtradas según los datos del lead para pasarle a la IA.
     """
     try:
-        from services.dynamo import t_props
-        from boto3.dynamodb.conditions import Attr
-        
-        # Construir filtros
-        filter_expr = Attr("Status").eq("ACTIVE")
-        
-        # Filtrar por barrio si está disponible
-        neighborhood = lead_data.get("Neighborhood")
-        if neighborhood:
-            filter_expr = filter_expr & Attr("Neighborhood").eq(neighborhood)
-        
-        # Filtrar por número de ambientes si está disponible
-        rooms = lead_data.get("Rooms")
-        if rooms:
-            filter_expr = filter_expr & Attr("Rooms").eq(rooms)
-        
-        # Filtrar por presupuesto si está disponible
-        budget = lead_data.get("Budget")
-        if budget:
-            filter_expr = filter_expr & Attr("Price").lte(budget)
-        
-        resp = t_props.scan(FilterExpression=filter_expr, Limit=20)
-        items = resp.get("Items", [])
-        
-        # Convertir a formato nativo y simplificar para la IA
-        simplified_props = []
-        for item in items:
-            from models.schemas import dec_to_native
-            prop = dec_to_native(item)
-            simplified_props.append({
-                "PropertyId": prop.get("PropertyId"),
-                "Title": prop.get("Title"),
-                "Neighborhood": prop.get("Neighborhood"),
-                "Rooms": prop.get("Rooms"),
-                "Price": prop.get("Price"),
-                "URL": prop.get("URL")
-            })
+        from services.query_planner import find_properties
+        
+        # Filtrar por barrio, ambientes y presupuesto si están disponibles
+        items = find_properties(
+            neighborhood=lead_data.get("Neighborhood"),
+            rooms=lead_data.get("Rooms"),
+            max_price=lead_data.get("Budget"),
+            limit=20,
+        )
         
-        return simplified_props
+        # Registros del catálogo, sin copiar (prompt_json() da la versión para la IA)
+        return [Property.coerce(prop) for prop in items]
     except Exception as e:
         print(f"[GET_FILTERED_PROPS][ERROR] {e}")
         return []
@@ -520,8 +435,7 @@ def get_fallback_properties(lead_data: dict) -> list:
     Solo se usa cuando no se encuentra la propiedad específica después de varios intentos.
     """
     try:
-        from services.dynamo import t_props
-        from boto3.dynamodb.conditions import Attr
+        from services.query_planner import find_properties
         
         # Criterios disponibles
         neighborhood = lead_data.get("Neighborhood")
@@ -536,46 +450,114 @@ def get_fallback_properties(lead_data: dict) -> list:
             return []
         
         # Buscar propiedades que cumplan al menos 2 de los 3 criterios
-        filter_expr = Attr("Status").eq("ACTIVE")
-        
         # Si tenemos presupuesto y ambientes, buscar por esos (sin barrio)
         if budget and rooms:
-            filter_expr = filter_expr & Attr("Price").lte(budget) & Attr("Rooms").eq(rooms)
+            items = find_properties(rooms=rooms, max_price=budget, limit=10)
         # Si tenemos barrio y ambientes, buscar por esos (sin presupuesto)
         elif neighborhood and rooms:
-            filter_expr = filter_expr & Attr("Neighborhood").eq(neighborhood) & Attr("Rooms").eq(rooms)
+            items = find_properties(neighborhood=neighborhood, rooms=rooms, limit=10)
         # Si tenemos barrio y presupuesto, buscar por esos (sin ambientes)
         elif neighborhood and budget:
-            filter_expr = filter_expr & Attr("Neighborhood").eq(neighborhood) & Attr("Price").lte(budget)
+            items = find_properties(neighborhood=neighborhood, max_price=budget, limit=10)
         else:
             return []
         
-        resp = t_props.scan(FilterExpression=filter_expr, Limit=10)
-        items = resp.get("Items", [])
-        
-        # Convertir a formato nativo y simplificar
-        simplified_props = []
-        for item in items:
-            from models.schemas import dec_to_native
-            prop = dec_to_native(item)
-            simplified_props.append({
-                "PropertyId": prop.get("PropertyId"),
-                "Title": prop.get("Title"),
-                "Neighborhood": prop.get("Neighborhood"),
-                "Rooms": prop.get("Rooms"),
-                "Price": prop.get("Price"),
-                "URL": prop.get("URL")
-            })
-        
-        return simplified_props
+        return [Property.coerce(prop) for prop in items]
     except Exception as e:
         print(f"[GET_FALLBACK_PROPS][ERROR] {e}")
         return []
 
-def generate_stage_based_response(lead_data: dict, conversation_history: list, message: str) -> str:
+def build_stage_messages(lead_data: dict, conversation_history: list) -> list:
+    """
+    Arma los mensajes para OpenAI según la etapa del lead:
+    [prompt compilado de la etapa (igual para todos los leads), historial, datos del lead].
+    El prefijo fijo adelante permite que OpenAI reutilice el prompt cacheado.
+    """
+    from services.stage_prompts import get_stage_prompt, build_lead_context
+    from services.stage_manager import stage_manager
+    
+    current_stage = lead_data.get("Stage", "PRECALIFICACION")
+    
+    # Obtener contexto específico para la etapa
+    context_data = {}
+    
+    if current_stage == "CALIFICACION":
+        # Para calificación, necesitamos info de la propiedad y datos faltantes
+        property_id = lead_data.get("PropertyId")
+        if property_id:
+            try:
+                from services.dynamo import t_props
+                from models.schemas import dec_to_native
+                resp = t_props.get_item(Key={"PropertyId": property_id})
+                if resp.get("Item"):
+                    prop = dec_to_native(resp["Item"])
+                    context_data["property_title"] = prop.get("Title", "Propiedad")
+            except Exception as e:
+                print(f"Error obteniendo propiedad: {e}")
+                context_data["property_title"] = "Propiedad confirmada"
+        
+        # Datos faltantes
+        qual_data = lead_data.get("QualificationData", {})
+        missing_data = stage_manager.get_missing_qualification_data(qual_data)
+        context_data["missing_data"] = missing_data
+        
+    elif current_stage == "POST_CALIFICACION":
+        # Para post-calificación, info de propiedad y resultado
+        property_id = lead_data.get("PropertyId")
+        if property_id:
+            try:
+                from services.dynamo import t_props
+                from models.schemas import dec_to_native
+                resp = t_props.get_item(Key={"PropertyId": property_id})
+                if resp.get("Item"):
+                    prop = dec_to_native(resp["Item"])
+                    context_data["property_title"] = prop.get("Title", "Propiedad")
+            except Exception as e:
+                context_data["property_title"] = "Propiedad confirmada"
+        
+        # Resultado de calificación
+        qual_data = lead_data.get("QualificationData", {})
+        from models.lead_stages import LeadQualificationData
+        qualification = LeadQualificationData(**qual_data)
+        context_data["qualification_result"] = "CALIFICADO" if qualification.is_qualified() else "NO_CALIFICADO"
+    
+    # Obtener prompt específico para la etapa
+    stage_prompt = get_stage_prompt(current_stage)
+    lead_context = build_lead_context(current_stage, lead_data, **context_data)
+    
+    # Construir mensajes para OpenAI con el historial que entra en el presupuesto de la etapa
+    from models.lead_stages import get_stage_token_budget, LeadStage
+    from services.tokens import fit_history, count_message_tokens
+    from config import CONTEXT_MAX_MESSAGE_TOKENS
+    try:
+        token_budget = get_stage_token_budget(LeadStage(current_stage))
+    except ValueError:
+        token_budget = 800
+    
+    # Del más nuevo al más viejo hasta llenar el presupuesto (textos largos recortados)
+    limited_history = fit_history(conversation_history, token_budget, CONTEXT_MAX_MESSAGE_TOKENS)
+    
+    messages = [{"role": "system", "content": stage_prompt.text}]
+    
+    # Agregar historial limitado
+    for msg in limited_history:
+        messages.append(msg)
+    
+    # Datos del lead al final: no rompen el prefijo cacheado
+    messages.append({"role": "system", "content": lead_context})
+    
+    print(f"📨 {len(messages)} mensajes para etapa {current_stage} "
+          f"(historial {len(limited_history)}/{len(conversation_history or [])}, ~{count_message_tokens(messages)} tokens, presupuesto {token_budget})")
+    return messages
+
+def generate_stage_based_response(lead_data: dict, conversation_history: list, message: str, turn=None) -> str:
     """
     Genera respuesta del agente basada en la etapa actual del lead.
     Usa búsqueda robusta de propiedades que SOLO usa datos reales de la BD.
+    
+    Si se pasa `turn` (services.turn_analysis.TurnAnalysis), se usan sus flags de
+    calificación y su respuesta; solo se vuelve a llamar a OpenAI si el turno
+    cambió la etapa (la respuesta precalculada era para la etapa anterior).
     """
     print(f"🔍 [DEBUG] generate_stage_based_response iniciado")
     print(f"🔍 [DEBUG] lead_data: {lead_data}")
@@ -586,9 +568,7 @@ def generate_stage_based_response(lead_data: dict, conversation_history: list, m
         return None
     
     try:
-        from services.stage_prompts import get_stage_prompt, get_stage_system_instructions
         from services.stage_manager import stage_manager
-        from services.property_search import get_property_search_service
         
         # Obtener etapa y estado actual
         current_stage = lead_data.get("Stage", "PRECALIFICACION")
@@ -601,8 +581,10 @@ def generate_stage_based_response(lead_data: dict, conversation_history: list, m
             return handle_precalification_stage(lead_data, message, conversation_history)
         
         # Procesar transición de etapa antes de generar respuesta (para otras etapas)
+        qualification_updates = (turn.qualification or {}) if turn else None
         updated_lead_data = stage_manager.process_stage_transition(
-            lead_data.get("LeadId"), lead_data, message, conversation_history
+            lead_data.get("LeadId"), lead_data, message, conversation_history,
+            qualification_updates=qualification_updates
         )
         
         # Usar datos actualizados
@@ -611,80 +593,25 @@ def generate_stage_based_response(lead_data: dict, conversation_history: list, m
         
         print(f"🎯 Etapa después de procesamiento: {current_stage} - {current_status}")
         
-        # Obtener contexto específico para la etapa
-        context_data = {}
-        
-        if current_stage == "CALIFICACION":
-            # Para calificación, necesitamos info de la propiedad y datos faltantes
-            property_id = updated_lead_data.get("PropertyId")
-            if property_id:
-                try:
-                    from services.dynamo import t_props
-                    from models.schemas import dec_to_native
-                    resp = t_props.get_item(Key={"PropertyId": property_id})
-                    if resp.get("Item"):
-                        prop = dec_to_native(resp["Item"])
-                        context_data["property_title"] = prop.get("Title", "Propiedad")
-                except Exception as e:
-                    print(f"Error obteniendo propiedad: {e}")
-                    context_data["property_title"] = "Propiedad confirmada"
-            
-            # Datos faltantes
-            qual_data = updated_lead_data.get("QualificationData", {})
-            missing_data = stage_manager.get_missing_qualification_data(qual_data)
-            context_data["missing_data"] = missing_data
-            
-        elif current_stage == "POST_CALIFICACION":
-            # Para post-calificación, info de propiedad y resultado
-            property_id = updated_lead_data.get("PropertyId")
-            if property_id:
-                try:
-                    from services.dynamo import t_props
-                    from models.schemas import dec_to_native
-                    resp = t_props.get_item(Key={"PropertyId": property_id})
-                    if resp.get("Item"):
-                        prop = dec_to_native(resp["Item"])
-                        context_data["property_title"] = prop.get("Title", "Propiedad")
-                except Exception as e:
-                    context_data["property_title"] = "Propiedad confirmada"
-            
-            # Resultado de calificación
-            qual_data = updated_lead_data.get("QualificationData", {})
-            from models.lead_stages import LeadQualificationData
-            qualification = LeadQualificationData(**qual_data)
-            context_data["qualification_result"] = "CALIFICADO" if qualification.is_qualified() else "NO_CALIFICADO"
-        
-        # Obtener prompt específico para la etapa
-        stage_prompt = get_stage_prompt(current_stage, **context_data)
-        system_instructions = get_stage_system_instructions(current_stage, updated_lead_data)
-        
-        # Construir mensajes para OpenAI con contexto limitado según etapa
-        from models.lead_stages import get_stage_context_limit, LeadStage
-        try:
-            stage_enum = LeadStage(current_stage)
-            context_limit = get_stage_context_limit(stage_enum)
-        except ValueError:
-            context_limit = 6
-        
-        # Usar solo el contexto necesario según la etapa
-        limited_history = conversation_history[-context_limit:] if conversation_history else []
+        if turn and turn.reply and turn.stage == current_stage:
+            print(f"✅ Respuesta del análisis de turno (sin llamada extra) para etapa {current_stage}")
+            return turn.reply
         
-        messages = [
-            {"role": "system", "content": stage_prompt},
-            {"role": "system", "content": system_instructions}
-        ]
+        messages = build_stage_messages(updated_lead_data, conversation_history)
         
-        # Agregar historial limitado
-        for msg in limited_history:
-            messages.append(msg)
-
-        print(f"📨 Enviando {len(messages)} mensajes a OpenAI (contexto limitado: {context_limit})")
-        
-        # Llamar a OpenAI
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=messages,
-        )
+        # Llamar a OpenAI (si no responde a tiempo o está degradado, respuesta fija de la etapa)
+        try:
+            response = routed_completion(
+                "reply",
+                current_stage,
+                messages=messages,
+            )
+        except LLMUnavailable as e:
+            from services.stage_prompts import fallback_stage_reply
+            print(f"⚠️ [LLM] {e} - usando respuesta por reglas para {current_stage}")
+            return fallback_stage_reply(current_stage, updated_lead_data)
+        from services.tokens import log_prompt_usage
+        log_prompt_usage(f"respuesta {current_stage}", messages, response)
         
         if not response.choices:
             print("❌ ERROR: Response sin choices")
@@ -713,6 +640,7 @@ def handle_precalification_stage(lead_data: dict, message: str, conversation_his
     try:
         from services.property_search import get_property_search_service
         from services.dynamo import update_lead
+        from services.keywords import scan
         
         lead_id = lead_data.get("LeadId")
         search_service = get_property_search_service()
@@ -722,28 +650,42 @@ def handle_precalification_stage(lead_data: dict, message: str, conversation_his
         # 1. PRIMERA PRIORIDAD: Buscar por URL si hay una en el mensaje
         property_from_url = search_service.search_by_url(message)
         if property_from_url:
-            print(f"🔗 Propiedad encontrada por URL: {property_from_url['Title']}")
+            print(f"🔗 Propiedad encontrada por URL: {property_from_url.display('Title')}")
             # Guardar como PropertyId y confirmar
             update_lead(lead_id, {"PropertyId": property_from_url["PropertyId"]})
-            return f"Perfecto! Vi que te interesa: {property_from_url['Title']} en {property_from_url['Neighborhood']}. Es esta la propiedad por la que consultas?"
+            return f"Perfecto! Vi que te interesa: {property_from_url.display('Title')} en {property_from_url.display('Neighborhood')}. Es esta la propiedad por la que consultas?"
         
         # 2. SEGUNDA PRIORIDAD: Si ya hay propiedades candidatas guardadas, confirmar selección
-        candidate_properties = lead_data.get("CandidateProperties", [])
+        # (CandidateProperties guarda IDs; se resuelven contra el catálogo)
+        candidate_properties = search_service.resolve_candidates(lead_data.get("CandidateProperties", []))
         if candidate_properties:
             confirmed_property = search_service.confirm_property_selection(candidate_properties, message)
             if confirmed_property:
-                print(f"✅ Propiedad confirmada: {confirmed_property['Title']}")
+                print(f"✅ Propiedad confirmada: {confirmed_property.display('Title')}")
                 # Avanzar a CALIFICACIÓN
                 from services.dynamo import update_lead_stage_and_status
                 update_lead_stage_and_status(lead_id, "CALIFICACION", "CALIFICANDO", {
                     "PropertyId": confirmed_property["PropertyId"],
                     "CandidateProperties": []  # Limpiar candidatas
                 })
-                return f"Perfecto! Confirmamos {confirmed_property['Title']}. Es para vos o para otra persona?"
+                return f"Perfecto! Confirmamos {confirmed_property.display('Title')}. Es para vos o para otra persona?"
             else:
                 # No confirmó, seguir buscando
                 print("❌ No se confirmó ninguna propiedad, continuando búsqueda")
         
+        # 2b. Título aproximado (typos, títulos parciales) sin ambigüedad en el catálogo.
+        # Solo si el mensaje no trae un link ni criterios de búsqueda (barrio, ambientes,
+        # presupuesto): "algo en Palermo de 2 ambientes" es una búsqueda, no un título
+        from utils.urls import extract_urls
+        has_criteria = bool(extract_urls(message)) or bool(search_service._extract_criteria_from_message(message))
+        property_from_title = None if has_criteria else search_service.search_by_title(message)
+        if property_from_title:
+            update_lead(lead_id, {
+                "CandidateProperties": search_service.candidate_ids([property_from_title]),
+                "PropertyId": None  # No confirmar aún
+            })
+            return f"Encontré esta propiedad: {property_from_title.display('Title')} en {property_from_title.display('Neighborhood')}. Es esta la que te interesa?"
+        
         # 3. TERCERA PRIORIDAD: Buscar por criterios
         properties, search_message = search_service.search_by_criteria(lead_data, message)
         
@@ -755,7 +697,7 @@ def handle_precalification_stage(lead_data: dict, message: str, conversation_his
             # Una sola propiedad encontrada - guardar y confirmar
             prop = properties[0]
             update_lead(lead_id, {
-                "CandidateProperties": properties,
+                "CandidateProperties": search_service.candidate_ids(properties),
                 "PropertyId": None  # No confirmar aún
             })
             return search_message  # Ya incluye la pregunta de confirmación
@@ -763,19 +705,19 @@ def handle_precalification_stage(lead_data: dict, message: str, conversation_his
         else:
             # Múltiples propiedades - guardar candidatas y pedir más detalles
             update_lead(lead_id, {
-                "CandidateProperties": properties,
+                "CandidateProperties": search_service.candidate_ids(properties),
                 "PropertyId": None
             })
             
             # Si el usuario pidió explícitamente ver opciones, mostrar lista
-            if any(word in message.lower() for word in ["mostrar", "ver", "opciones", "cuales", "que tienen"]):
+            if scan(message).has("show_options"):
                 properties_list = search_service.format_properties_list(properties, max_items=3)
                 return f"{search_message}\n\nAcá tenes las opciones:\n{properties_list}\n\nCual te interesa?"
             else:
                 return search_message
         
         # 4. FALLBACK: Conversación general de precalificación
-        if not any(word in message.lower() for word in ["propiedad", "casa", "depto", "departamento", "ph", "alquil", "compr", "venta"]):
+        if not scan(message).has("property.search"):
             # Es el primer mensaje o conversación general
             if len(conversation_history) <= 1:
                 return "Hola! Soy Gonzalo de Compromiso Inmobiliario. En que te puedo ayudar?"
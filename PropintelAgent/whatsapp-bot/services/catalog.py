@@ -0,0 +1,253 @@
+# services/catalog.py
+"""
+Catálogo de propiedades en memoria.
+Carga todas las propiedades ACTIVE una vez por contenedor Lambda (warm) y las
+sirve desde memoria, evitando un scan de la tabla Properties en cada turno.
+
+El snapshot está versionado: se recarga cuando vence el TTL o cuando se
+invalida explícitamente (alta/edición de propiedades desde el panel).
+
+Los registros del snapshot se comparten entre turnos sin copiar: son de solo
+lectura (para modificar uno, `Property.copy()`).
+"""
+
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from config import PROPERTY_CATALOG_TTL_SECONDS
+from services.scan import parallel_scan
+from services.text_index import TextIndex
+from services.fuzzy import TrigramIndex, property_text
+from utils.urls import normalize_property_url
+
+# Tope de links no encontrados recordados por snapshot
+MAX_URL_MISSES = 1024
+
+
+class CatalogColumns:
+    """
+    Vista columnar del snapshot para filtrar y rankear con NumPy.
+    Precio y ambientes no numéricos quedan como NaN; el barrio se codifica como entero.
+    """
+
+    def __init__(self, items: tuple):
+        n = len(items)
+        self.price = np.full(n, np.nan)
+        self.rooms = np.full(n, np.nan)
+        self.neighborhood = np.full(n, -1, dtype=np.int32)
+        self._codes: Dict[str, int] = {}
+
+        for i, p in enumerate(items):
+            price = p.get("Price")
+            if isinstance(price, (int, float)):
+                self.price[i] = price
+            rooms = p.get("Rooms")
+            if isinstance(rooms, (int, float)):
+                self.rooms[i] = rooms
+            neighborhood = p.get("Neighborhood")
+            if neighborhood is not None:
+                self.neighborhood[i] = self._codes.setdefault(neighborhood, len(self._codes))
+
+        # Ranking sin presupuesto: más ambientes primero, luego menor precio (orden estable)
+        rank_rooms = -np.nan_to_num(self.rooms, nan=0)
+        rank_price = np.nan_to_num(self.price, nan=10**9)
+        self.rooms_price_order = np.lexsort((np.arange(n), rank_price, rank_rooms))
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def neighborhood_code(self, neighborhood: str) -> int:
+        """Código del barrio; -2 si no existe en el catálogo (no matchea ninguna fila)"""
+        return self._codes.get(neighborhood, -2)
+
+
+class CatalogSnapshot:
+    """Vista inmutable del catálogo en un momento dado"""
+
+    def __init__(self, version: int, items: List[Dict[str, Any]], loaded_at: float):
+        self.version = version
+        self.loaded_at = loaded_at
+        self.items = tuple(items)
+        self.by_id = {p["PropertyId"]: p for p in self.items if p.get("PropertyId")}
+        # Espejo en memoria del índice UrlKey → propiedad
+        self.by_url_key = {}
+        for p in self.items:
+            url_key = p.get("UrlKey") or normalize_property_url(p.get("URL") or "")
+            if url_key:
+                self.by_url_key[url_key] = p
+
+        self._columns: Optional[CatalogColumns] = None
+
+    @property
+    def columns(self) -> CatalogColumns:
+        """Columnas NumPy, construidas la primera vez que se necesitan"""
+        if self._columns is None:
+            self._columns = CatalogColumns(self.items)
+        return self._columns
+
+    def get(self, property_id: str) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(property_id)
+
+    def age(self) -> float:
+        return time.time() - self.loaded_at
+
+
+class PropertyCatalog:
+    """Catálogo de propiedades ACTIVE con snapshot versionado, TTL e invalidación"""
+
+    def __init__(self, t_props, ttl_seconds: int = PROPERTY_CATALOG_TTL_SECONDS):
+        self.t_props = t_props
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._stale = True
+        self._lock = threading.Lock()
+        self._text_index = TextIndex()
+        self._text_index_version = 0
+        self._text_index_lock = threading.Lock()
+        self._title_index: Optional[TrigramIndex] = None
+        self._title_index_version = 0
+        # Links que no están ni en el snapshot ni en GSI_UrlKey, por versión del snapshot
+        self._url_misses: set = set()
+        self._url_misses_version = 0
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        Retorna el snapshot vigente, recargándolo si venció o fue invalidado.
+        Si la recarga falla y hay un snapshot previo, se sigue sirviendo el anterior.
+        """
+        current = self._snapshot
+        if current is not None and not self._needs_reload(current):
+            return current
+
+        with self._lock:
+            current = self._snapshot
+            if current is not None and not self._needs_reload(current):
+                return current
+            # Se limpia antes de cargar: una invalidación durante la carga fuerza otra recarga
+            self._stale = False
+            try:
+                self._snapshot = self._load()
+            except Exception as e:
+                self._stale = True
+                if current is None:
+                    raise
+                print(f"[CATALOG][ERROR] Recarga fallida, usando snapshot v{current.version}: {e}")
+            return self._snapshot
+
+    def invalidate(self):
+        """Fuerza la recarga del snapshot en el próximo acceso"""
+        self._stale = True
+        print("[CATALOG] Snapshot invalidado")
+
+    def get(self, property_id: str) -> Optional[Dict[str, Any]]:
+        return self.snapshot().get(property_id)
+
+    def find_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Resuelve un link pegado por el lead a una propiedad ACTIVE.
+        Primero usa el espejo en memoria; si no está (ej: publicada después del
+        último snapshot), hace una única lectura por clave en GSI_UrlKey. Los links
+        que tampoco están en el índice (portales, propiedades de otras inmobiliarias)
+        no se vuelven a consultar hasta que se recargue el snapshot.
+        """
+        url_key = normalize_property_url(url)
+        if not url_key:
+            return None
+        snapshot = self.snapshot()
+        prop = snapshot.by_url_key.get(url_key)
+        if prop:
+            return prop
+
+        if self._url_misses_version != snapshot.version:
+            self._url_misses = set()
+            self._url_misses_version = snapshot.version
+        if url_key in self._url_misses:
+            return None
+
+        from services.dynamo import get_property_by_url_key
+        prop = get_property_by_url_key(url_key)
+        if not prop and len(self._url_misses) < MAX_URL_MISSES:
+            self._url_misses.add(url_key)
+        return prop or None
+
+    def search_text(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca propiedades por texto libre (título, barrio, dirección) usando el
+        índice invertido, sincronizado incrementalmente con el snapshot vigente.
+        """
+        snapshot = self.snapshot()
+        with self._text_index_lock:
+            if self._text_index_version != snapshot.version:
+                touched = self._text_index.sync(snapshot.items)
+                self._text_index_version = snapshot.version
+                print(f"[CATALOG] Índice de texto sincronizado con v{snapshot.version}: {touched} cambios")
+            ranked = self._text_index.search(query, limit)
+        return [snapshot.by_id[doc_id] for doc_id, _ in ranked if doc_id in snapshot.by_id]
+
+    def match_title(self, text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Propiedad cuyo título/barrio coincide de forma aproximada (typos, títulos
+        parciales) con el texto, y su confianza. (None, confianza) si es ambiguo.
+        """
+        snapshot = self.snapshot()
+        index = self._title_index
+        if index is None or self._title_index_version != snapshot.version:
+            index = TrigramIndex((p["PropertyId"], property_text(p)) for p in snapshot.by_id.values())
+            self._title_index, self._title_index_version = index, snapshot.version
+        key, confidence = index.best(text)
+        return (snapshot.by_id.get(key) if key else None), confidence
+
+    def filter(self, neighborhood: str | None = None, rooms: int | None = None,
+               max_price: int | float | None = None, limit: int | None = None) -> List[Dict[str, Any]]:
+        """
+        Filtra el catálogo con la misma semántica que los FilterExpression previos:
+        barrio y ambientes por igualdad, presupuesto como precio máximo.
+        """
+        matched = []
+        for p in self.snapshot().items:
+            if neighborhood and p.get("Neighborhood") != neighborhood:
+                continue
+            if rooms and p.get("Rooms") != rooms:
+                continue
+            if max_price:
+                price = p.get("Price")
+                if not isinstance(price, (int, float)) or price > max_price:
+                    continue
+            matched.append(p)
+            if limit and len(matched) >= limit:
+                break
+        return matched
+
+    def _needs_reload(self, snapshot: CatalogSnapshot) -> bool:
+        return self._stale or snapshot.age() > self.ttl_seconds
+
+    def _load(self) -> CatalogSnapshot:
+        started = time.time()
+        scan_kwargs = {
+            "FilterExpression": "#S = :active",
+            "ExpressionAttributeNames": {"#S": "Status"},
+            "ExpressionAttributeValues": {":active": "ACTIVE"},
+        }
+        items = list(parallel_scan(self.t_props, **scan_kwargs))
+
+        self._version += 1
+        snapshot = CatalogSnapshot(self._version, items, time.time())
+        print(f"[CATALOG] Snapshot v{snapshot.version} cargado: {len(items)} propiedades en {time.time() - started:.2f}s")
+        return snapshot
+
+
+_catalog: Optional[PropertyCatalog] = None
+
+
+def get_catalog() -> PropertyCatalog:
+    """Retorna el catálogo del proceso (uno por contenedor Lambda)"""
+    global _catalog
+    if _catalog is None:
+        from services.dynamo import fast_props
+        from models.records import Property
+        _catalog = PropertyCatalog(fast_props.with_record(Property))
+    return _catalog
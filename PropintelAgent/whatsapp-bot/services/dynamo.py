@@ -4,8 +4,14 @@ from typing import Dict, Any, List
 
 import boto3
 import os
-from boto3.dynamodb.conditions import Key
-from config import LEADS_TABLE, MESSAGES_TABLE, PROPERTIES_TABLE, VISITS_TABLE
+from boto3.dynamodb.conditions import Key, ConditionExpressionBuilder
+from config import (
+    LEADS_TABLE, MESSAGES_TABLE, PROPERTIES_TABLE, VISITS_TABLE,
+    RECENT_MESSAGES_MAX, RECENT_MESSAGE_MAX_CHARS,
+)
+from models.deserializer import deserialize_item, serialize_value
+from models.records import Property
+from services.lead_session import current_session
 
 # Usar la región configurada en las variables de entorno
 AWS_REGION = os.getenv("AWS_REGION", "us-east-2")
@@ -15,6 +21,75 @@ t_msgs = dynamodb.Table(MESSAGES_TABLE)
 t_props = dynamodb.Table(PROPERTIES_TABLE)
 t_visits = dynamodb.Table(VISITS_TABLE)
 
+
+class FastTable:
+    """
+    Lecturas con el cliente de bajo nivel y deserialización rápida (models.deserializer).
+    Acepta los mismos argumentos que Table.query/scan (incluidas condiciones Key/Attr)
+    y devuelve los items como tipos nativos, o como registros si se pasa `record`.
+    LastEvaluatedKey queda en formato crudo y se puede reenviar como ExclusiveStartKey.
+    """
+
+    def __init__(self, client, table_name: str, record=None):
+        self.client = client
+        self.table_name = table_name
+        self.record = record
+
+    def with_record(self, record) -> "FastTable":
+        return FastTable(self.client, self.table_name, record)
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        return self._decode(self.client.query(**self._prepare(kwargs)))
+
+    def scan(self, **kwargs) -> Dict[str, Any]:
+        return self._decode(self.client.scan(**self._prepare(kwargs)))
+
+    def get_item(self, Key: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        resp = self.client.get_item(
+            TableName=self.table_name,
+            Key={k: serialize_value(v) for k, v in Key.items()},
+            **kwargs,
+        )
+        if "Item" in resp:
+            resp["Item"] = self._decode_item(resp["Item"])
+        return resp
+
+    def _prepare(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = dict(kwargs, TableName=self.table_name)
+        names = dict(kwargs.pop("ExpressionAttributeNames", {}))
+        values = dict(kwargs.pop("ExpressionAttributeValues", {}))
+
+        builder = ConditionExpressionBuilder()
+        for param, is_key_condition in (("KeyConditionExpression", True), ("FilterExpression", False)):
+            condition = kwargs.get(param)
+            if condition is not None and not isinstance(condition, str):
+                built = builder.build_expression(condition, is_key_condition=is_key_condition)
+                kwargs[param] = built.condition_expression
+                names.update(built.attribute_name_placeholders)
+                values.update(built.attribute_value_placeholders)
+
+        if names:
+            kwargs["ExpressionAttributeNames"] = names
+        if values:
+            kwargs["ExpressionAttributeValues"] = {k: serialize_value(v) for k, v in values.items()}
+        return kwargs
+
+    def _decode_item(self, raw: Dict[str, Any]):
+        if self.record is not None:
+            return self.record.from_raw(raw)
+        return deserialize_item(raw)
+
+    def _decode(self, resp: Dict[str, Any]) -> Dict[str, Any]:
+        resp["Items"] = [self._decode_item(raw) for raw in resp.get("Items", [])]
+        return resp
+
+
+dynamodb_client = boto3.client("dynamodb", region_name=AWS_REGION)
+fast_leads = FastTable(dynamodb_client, LEADS_TABLE)
+fast_msgs = FastTable(dynamodb_client, MESSAGES_TABLE)
+fast_props = FastTable(dynamodb_client, PROPERTIES_TABLE)
+fast_visits = FastTable(dynamodb_client, VISITS_TABLE)
+
 def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
@@ -26,13 +101,62 @@ def put_message(lead_id: str, text: str, direction: str = "in") -> str:
         "Direction": direction,
         "Text": text
     })
+    try:
+        append_recent_message(lead_id, ts, direction, text)
+    except Exception as e:
+        # El buffer es una copia: si falla, el contexto se arma desde Messages
+        print(f"[RECENT][ERROR] {e}")
     return ts
 
-def get_lead(lead_id: str) -> Dict[str, Any]:
-    resp = t_leads.get_item(Key={"LeadId": lead_id})
-    if "Item" in resp:
-        return resp["Item"]
-    item = {
+def _recent_entry(ts: str, direction: str, text: str) -> Dict[str, str]:
+    """Mensaje compacto del buffer RecentMessages del lead"""
+    return {"t": ts, "d": direction, "x": (text or "")[:RECENT_MESSAGE_MAX_CHARS]}
+
+def append_recent_message(lead_id: str, ts: str, direction: str, text: str):
+    """
+    Agrega el mensaje al final de RecentMessages (list_append, atómico) y recorta
+    el principio si se pasó de RECENT_MESSAGES_MAX. No toca Version: el buffer no
+    compite con los campos que escribe la sesión del turno.
+    """
+    conditional_failed = t_leads.meta.client.exceptions.ConditionalCheckFailedException
+    try:
+        resp = t_leads.update_item(
+            Key={"LeadId": lead_id},
+            UpdateExpression="SET #RM = list_append(#RM, :m)",
+            ConditionExpression="attribute_exists(#RM)",
+            ExpressionAttributeNames={"#RM": "RecentMessages"},
+            ExpressionAttributeValues={":m": [_recent_entry(ts, direction, text)]},
+            ReturnValues="UPDATED_NEW",
+        )
+    except conditional_failed:
+        # Lead nuevo: se crea con el mensaje. Lead viejo sin buffer: se siembra
+        # desde Messages la primera vez que se arma su contexto
+        try:
+            t_leads.put_item(
+                Item={**_new_lead_item(lead_id), "RecentMessages": [_recent_entry(ts, direction, text)]},
+                ConditionExpression="attribute_not_exists(LeadId)",
+            )
+        except conditional_failed:
+            pass
+        return
+
+    size = len(resp.get("Attributes", {}).get("RecentMessages", []))
+    excess = size - RECENT_MESSAGES_MAX
+    if excess > 0:
+        try:
+            # Solo si nadie agregó otro mensaje en el medio (si no, lo recorta el próximo append)
+            t_leads.update_item(
+                Key={"LeadId": lead_id},
+                UpdateExpression="REMOVE " + ", ".join(f"#RM[{i}]" for i in range(excess)),
+                ConditionExpression="size(#RM) = :n",
+                ExpressionAttributeNames={"#RM": "RecentMessages"},
+                ExpressionAttributeValues={":n": size},
+            )
+        except conditional_failed:
+            pass
+
+def _new_lead_item(lead_id: str) -> Dict[str, Any]:
+    return {
         "LeadId": lead_id,
         "Status": "NUEVO",  # Usar nuevos estados
         "Stage": "PRECALIFICACION",  # Nueva etapa por defecto
@@ -52,16 +176,34 @@ def get_lead(lead_id: str) -> Dict[str, Any]:
             "has_preapproval": None,
             "decision_maker": False
         },
+        "RecentMessages": [],
         "CreatedAt": now_iso(),
         "UpdatedAt": now_iso(),
+        "Version": 0,
     }
+
+def get_lead(lead_id: str) -> Dict[str, Any]:
+    resp = t_leads.get_item(Key={"LeadId": lead_id})
+    session = current_session(lead_id)
+    if "Item" in resp:
+        if session is not None:
+            session.bind(resp["Item"])
+        return resp["Item"]
+    item = _new_lead_item(lead_id)
     t_leads.put_item(Item=item)
+    if session is not None:
+        session.bind(item)
     return item
 
 def update_lead(lead_id: str, fields: Dict[str, Any]):
-    expr_names = {}
-    expr_values = {":u": now_iso()}
-    sets = ["UpdatedAt = :u"]
+    # Dentro de un turno (services.lead_session) se anota y se escribe todo junto al final
+    session = current_session(lead_id)
+    if session is not None:
+        session.set_fields(fields)
+        return
+    expr_names = {"#Ver": "Version"}
+    expr_values = {":u": now_iso(), ":zero": 0, ":one": 1}
+    sets = ["UpdatedAt = :u", "#Ver = if_not_exists(#Ver, :zero) + :one"]
     i = 0
     for k, v in fields.items():
         i += 1
@@ -77,22 +219,27 @@ def update_lead(lead_id: str, fields: Dict[str, Any]):
         ExpressionAttributeValues=expr_values,
     )
 
-def query_messages(lead_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+def query_messages(lead_id: str, limit: int = 20, since: str = None) -> List[Dict[str, Any]]:
+    """Últimos `limit` mensajes del lead (más nuevos primero), opcionalmente solo los posteriores a `since`"""
+    key_condition = Key("LeadId").eq(lead_id)
+    if since:
+        key_condition = key_condition & Key("Timestamp").gt(since)
     resp = t_msgs.query(
-        KeyConditionExpression=Key("LeadId").eq(lead_id),
+        KeyConditionExpression=key_condition,
         ScanIndexForward=False,
         Limit=limit,
     )
     return resp.get("Items", [])
 
-def get_conversation_history(lead_id: str, limit: int = 20) -> List[Dict[str, str]]:
+def get_conversation_history(lead_id: str, limit: int = 20, since: str = None) -> List[Dict[str, str]]:
     """
     Obtiene el historial de conversación formateado para OpenAI.
+    Con `since` solo trae los mensajes posteriores a ese Timestamp.
     
     Returns:
         Lista de mensajes en formato [{"role": "user"/"assistant", "content": "..."}]
     """
-    messages = query_messages(lead_id, limit)
+    messages = query_messages(lead_id, limit, since=since)
     
     # Ordenar por timestamp (más antiguos primero)
     messages.sort(key=lambda x: x.get("Timestamp", "0"))
@@ -111,54 +258,47 @@ def get_conversation_history(lead_id: str, limit: int = 20) -> List[Dict[str, st
 def get_property_by_context(lead_data: dict, message_text: str) -> Dict[str, Any]:
     """
     Intenta identificar la propiedad específica por la que consulta el lead.
-    Busca por palabras clave en el mensaje o datos del lead.
+    Rankea el catálogo en memoria (título, barrio, dirección) contra el mensaje
+    y el barrio del lead, y devuelve la mejor coincidencia.
     """
-    # Palabras clave que podrían indicar una propiedad específica
-    search_terms = []
-    
-    # Extraer del texto del mensaje
-    if message_text:
-        words = message_text.lower().split()
-        # Buscar direcciones, barrios, o referencias específicas
-        for word in words:
-            if len(word) > 3:  # Evitar palabras muy cortas
-                search_terms.append(word)
+    query = message_text or ""
     
     # Usar neighborhood del lead si existe
     neighborhood = lead_data.get("Neighborhood")
     if neighborhood:
-        search_terms.append(neighborhood.lower())
+        query = f"{query} {neighborhood}"
     
-    if not search_terms:
+    if not query.strip():
         return {}
     
     try:
-        # Buscar propiedades que coincidan con los términos
-        from boto3.dynamodb.conditions import Attr
-        
-        filter_expression = None
-        for term in search_terms[:3]:  # Máximo 3 términos para no complicar la query
-            condition = (
-                Attr("Title").contains(term) | 
-                Attr("Neighborhood").contains(term)
-            )
-            if filter_expression is None:
-                filter_expression = condition
-            else:
-                filter_expression = filter_expression | condition
-        
-        resp = t_props.scan(
-            FilterExpression=filter_expression & Attr("Status").eq("ACTIVE"),
-            Limit=1  # Solo la primera coincidencia
-        )
+        from services.catalog import get_catalog
         
-        items = resp.get("Items", [])
-        return items[0] if items else {}
+        matches = get_catalog().search_text(query, limit=1)
+        return matches[0] if matches else {}
         
     except Exception as e:
         print(f"[GET_PROPERTY][ERROR] {e}")
         return {}
 
+def get_property_by_url_key(url_key: str) -> Dict[str, Any]:
+    """
+    Busca una propiedad ACTIVE por su URL normalizada (ver utils.urls).
+    Requiere GSI_UrlKey (UrlKey) en la tabla Properties.
+    """
+    try:
+        resp = fast_props.with_record(Property).query(
+            IndexName="GSI_UrlKey",
+            KeyConditionExpression=Key("UrlKey").eq(url_key),
+        )
+        for item in resp.get("Items", []):
+            if item.get("Status") == "ACTIVE":
+                return item
+        return {}
+    except Exception as e:
+        print(f"[GET_PROPERTY_BY_URL_KEY][ERROR] {e}")
+        return {}
+
 def create_visit(lead_id: str, property_id: str, visit_iso: str, notes: str = None):
     print(f"🔄 Intentando crear visita...")
     print(f"   LeadId: {lead_id}")
@@ -205,31 +345,110 @@ def update_lead_stage_and_status(lead_id: str, stage: str, status: str, addition
     update_lead(lead_id, fields)
     print(f"📝 Lead {lead_id} actualizado: Stage={stage}, Status={status}")
 
-def update_qualification_data(lead_id: str, qualification_updates: Dict[str, Any]):
+def update_qualification_data(lead_id: str, qualification_updates: Dict[str, Any]) -> Dict[str, Any] | None:
     """
-    Actualiza los datos de calificación del lead
+    Actualiza los datos de calificación del lead sin leerlo antes: cada dato va
+    como SET QualificationData.#k = :v, así no se pisa lo que otro proceso haya
+    escrito en otros datos del mapa. Retorna el lead actualizado (ALL_NEW), o
+    None si quedó anotado en la sesión del turno (services.lead_session) o si el
+    lead no existe (no se crea).
     """
-    # Obtener datos actuales
-    lead = get_lead(lead_id)
-    current_qual_data = lead.get("QualificationData", {})
-    
-    # Mergear con nuevos datos
-    current_qual_data.update(qualification_updates)
-    
-    # Actualizar en la base de datos
-    update_lead(lead_id, {"QualificationData": current_qual_data})
+    session = current_session(lead_id)
+    if session is not None:
+        session.set_qualification(qualification_updates)
+        print(f"📝 Datos de calificación anotados para {lead_id}: {qualification_updates}")
+        return None
+    if not qualification_updates:
+        return None
+
+    names = {"#QD": "QualificationData", "#Ver": "Version"}
+    values = {":u": now_iso(), ":zero": 0, ":one": 1}
+    sets = ["UpdatedAt = :u", "#Ver = if_not_exists(#Ver, :zero) + :one"]
+    nested = []
+    for i, (key, value) in enumerate(qualification_updates.items(), 1):
+        names[f"#Q{i}"] = key
+        values[f":q{i}"] = value
+        nested.append(f"#QD.#Q{i} = :q{i}")
+
+    conditional_failed = t_leads.meta.client.exceptions.ConditionalCheckFailedException
+    for _ in range(2):
+        try:
+            # Caso normal: el mapa existe y se setean solo los datos que cambian
+            resp = t_leads.update_item(
+                Key={"LeadId": lead_id},
+                UpdateExpression="SET " + ", ".join(sets + nested),
+                ConditionExpression="attribute_exists(#QD)",
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW",
+            )
+            break
+        except conditional_failed:
+            pass
+        try:
+            # Lead sin mapa (ítem viejo): crear el mapa con estos datos. Solo si el
+            # lead existe: esto no da de alta leads a medias
+            resp = t_leads.update_item(
+                Key={"LeadId": lead_id},
+                UpdateExpression="SET " + ", ".join(sets + ["#QD = :qd"]),
+                ConditionExpression="attribute_exists(LeadId) AND attribute_not_exists(#QD)",
+                ExpressionAttributeNames={"#QD": "QualificationData", "#Ver": "Version"},
+                ExpressionAttributeValues={":u": values[":u"], ":zero": 0, ":one": 1, ":qd": dict(qualification_updates)},
+                ReturnValues="ALL_NEW",
+                ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            )
+            break
+        except conditional_failed as e:
+            if not e.response.get("Item"):
+                print(f"❌ [QUALIFICATION] Lead {lead_id} no existe, no se guardan {qualification_updates}")
+                return None
+            # Otro proceso creó el mapa entre los dos intentos: volver al SET anidado
+            continue
+    else:
+        raise RuntimeError(f"No se pudo actualizar QualificationData de {lead_id}")
+
     print(f"📝 Datos de calificación actualizados para {lead_id}: {qualification_updates}")
+    return resp.get("Attributes")
 
-def get_stage_appropriate_context(lead_id: str, stage: str) -> List[Dict[str, str]]:
+def get_stage_appropriate_context(lead_id: str, stage: str, since: str = None, lead: Dict[str, Any] = None) -> List[Dict[str, str]]:
     """
-    Obtiene el contexto apropiado según la etapa del lead
+    Obtiene el historial reciente del lead. El recorte por etapa se hace una sola
+    vez, por presupuesto de tokens, al armar el prompt (build_stage_messages):
+    acá solo se limita cuántos mensajes se leen.
+    `since` es el SummarizedUntil del lead: lo anterior ya está en ConversationSummary.
+    Si se pasa el `lead` ya leído y tiene RecentMessages, no se consulta Messages.
     """
-    from models.lead_stages import LeadStage, get_stage_context_limit
+    from config import CONTEXT_FETCH_LIMIT
     
-    try:
-        stage_enum = LeadStage(stage)
-        limit = get_stage_context_limit(stage_enum)
-    except ValueError:
-        limit = 6  # Default
+    recent = lead.get("RecentMessages") if lead is not None else None
+    if isinstance(recent, list):
+        messages = [m for m in recent if not since or m.get("t", "") > since][-CONTEXT_FETCH_LIMIT:]
+        return [
+            {"role": "user" if m.get("d", "in") == "in" else "assistant", "content": m.get("x", "")}
+            for m in messages if (m.get("x") or "").strip()
+        ]
     
-    return get_conversation_history(lead_id, limit=limit)
+    history = get_conversation_history(lead_id, limit=CONTEXT_FETCH_LIMIT, since=since)
+    if lead is not None:
+        _seed_recent_messages(lead_id)
+    return history
+
+def _seed_recent_messages(lead_id: str):
+    """Crea RecentMessages de un lead viejo desde la tabla Messages (una sola vez)"""
+    try:
+        raw = query_messages(lead_id, RECENT_MESSAGES_MAX)
+        raw.sort(key=lambda x: x.get("Timestamp", "0"))
+        t_leads.update_item(
+            Key={"LeadId": lead_id},
+            UpdateExpression="SET #RM = :seed",
+            ConditionExpression="attribute_not_exists(#RM)",
+            ExpressionAttributeNames={"#RM": "RecentMessages"},
+            ExpressionAttributeValues={":seed": [
+                _recent_entry(m.get("Timestamp", ""), m.get("Direction", "in"), m.get("Text", "")) for m in raw
+            ]},
+        )
+        print(f"🗂️ [RECENT] Buffer de mensajes creado para {lead_id} ({len(raw)} mensajes)")
+    except t_leads.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+    except Exception as e:
+        print(f"[RECENT][ERROR] {e}")
@@ -0,0 +1,180 @@
+# services/fuzzy.py
+"""
+Matching aproximado de respuestas del lead contra títulos de propiedades.
+Usa similitud de trigramas por palabra (tolera typos y títulos parciales) y
+ponderación por rareza del término, y devuelve la mejor opción con un nivel de confianza.
+También interpreta elecciones ordinales ("la segunda", "la 3", "la última").
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+from services.text_index import fold, tokenize
+
+MIN_TOKEN_SIMILARITY = 0.55   # Dice mínimo entre palabras para considerarlas iguales
+MIN_CONFIDENCE = 0.34         # La mejor opción debe superar a la segunda por ~1.5x
+MIN_TITLE_COVERAGE = 0.4      # Parte del título (por peso) que el texto tiene que nombrar
+
+# Palabras de título que no identifican una propiedad: "quiero otro departamento"
+# no elige el "Departamento 3 ambientes en Palermo" aunque comparta palabras
+GENERIC_TOKENS = frozenset({
+    "departamento", "departamentos", "depto", "deptos", "casa", "casas", "propiedad", "propiedades",
+    "ambiente", "ambientes", "amb", "monoambiente", "dormitorio", "dormitorios", "habitacion", "habitaciones",
+    "venta", "alquiler", "piso", "unidad", "duplex", "luminoso", "luminosa", "balcon", "cochera",
+})
+
+ORDINALS = {
+    "primera": 0, "primero": 0, "1": 0, "uno": 0,
+    "segunda": 1, "segundo": 1, "2": 1, "dos": 1,
+    "tercera": 2, "tercero": 2, "3": 2, "tres": 2,
+    "cuarta": 3, "cuarto": 3, "4": 3,
+    "quinta": 4, "quinto": 4, "5": 4,
+    "ultima": -1, "ultimo": -1,
+}
+_ORDINAL_WORDS = "|".join(sorted(ORDINALS, key=len, reverse=True))
+_ORDINAL_PATTERN = re.compile(rf"^(?:(?:la|el|opcion|numero|nro)\s+)*({_ORDINAL_WORDS})$")
+_MONTHS = "enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre"
+# "el 2" es una opción, "el 2 de marzo" o "el 2/3" es una fecha
+_ORDINAL_PHRASE_PATTERN = re.compile(
+    rf"\b(?:la|el|opcion|numero|nro)\s+({_ORDINAL_WORDS})\b(?!\s*[/.:-]\s*\d)(?!\s+de\s+(?:{_MONTHS})\b)"
+)
+
+def trigrams(token: str) -> frozenset:
+    padded = f"  {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def dice(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+def parse_ordinal(text: str) -> Optional[int]:
+    """
+    Índice elegido en una respuesta ordinal ("2", "la segunda", "opción 3", "la última").
+    Retorna -1 para "la última" y None si la respuesta no es una elección ordinal.
+    """
+    folded = fold(text or "").strip(" .!?")
+    if not folded:
+        return None
+    match = _ORDINAL_PATTERN.match(folded)
+    if match:
+        return ORDINALS[match.group(1)]
+    match = _ORDINAL_PHRASE_PATTERN.search(folded)
+    if match:
+        return ORDINALS[match.group(1)]
+    return None
+
+def pick_ordinal(options: List[Any], text: str) -> Optional[Any]:
+    """Elemento de `options` elegido por ordinal, o None"""
+    idx = parse_ordinal(text)
+    if idx is None or not options:
+        return None
+    if idx == -1:
+        return options[-1]
+    return options[idx] if idx < len(options) else None
+
+
+class TrigramIndex:
+    """Índice de trigramas sobre textos cortos (títulos + barrio) identificados por clave"""
+
+    def __init__(self, docs: Iterable[Tuple[str, str]]):
+        self.doc_tokens: Dict[str, set] = {}
+        self.token_docs: Dict[str, set] = {}
+        self.token_trigrams: Dict[str, frozenset] = {}
+        self.trigram_tokens: Dict[str, set] = {}
+
+        for key, text in docs:
+            tokens = {t for t in tokenize(text) if len(t) >= 3}
+            self.doc_tokens[key] = tokens
+            for token in tokens:
+                self.token_docs.setdefault(token, set()).add(key)
+                if token not in self.token_trigrams:
+                    grams = trigrams(token)
+                    self.token_trigrams[token] = grams
+                    for gram in grams:
+                        self.trigram_tokens.setdefault(gram, set()).add(token)
+
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+
+    def _weight(self, token: str) -> float:
+        return math.log(1 + len(self.doc_tokens) / len(self.token_docs[token]))
+
+    def _matched_tokens(self, text: str) -> Dict[str, float]:
+        """Palabras indexadas reconocidas en el texto y su similitud"""
+        best_sim: Dict[str, float] = {}
+        for query_token in {t for t in tokenize(text) if len(t) >= 3}:
+            query_grams = trigrams(query_token)
+            candidates = set()
+            for gram in query_grams:
+                candidates |= self.trigram_tokens.get(gram, set())
+            for token in candidates:
+                sim = dice(query_grams, self.token_trigrams[token])
+                if sim >= MIN_TOKEN_SIMILARITY and sim > best_sim.get(token, 0.0):
+                    best_sim[token] = sim
+        return best_sim
+
+    def _rank(self, matched: Dict[str, float], limit: int) -> List[Tuple[str, float]]:
+        scores: Dict[str, float] = {}
+        for token, sim in matched.items():
+            weight = self._weight(token)
+            for key in self.token_docs[token]:
+                scores[key] = scores.get(key, 0.0) + weight * sim
+        return heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+    def rank(self, text: str, limit: int = 3) -> List[Tuple[str, float]]:
+        """[(clave, score)] ordenado; el score suma la rareza de cada palabra del título reconocida"""
+        return self._rank(self._matched_tokens(text), limit)
+
+    def coverage(self, key: str, matched: Dict[str, float]) -> float:
+        """
+        Parte del título (ponderada por rareza) que nombra el texto, sin contar
+        palabras genéricas. Es la similitud absoluta: no depende de las otras opciones.
+        """
+        tokens = self.doc_tokens.get(key) or set()
+        total = sum(self._weight(t) for t in tokens)
+        hit = sum(self._weight(t) * matched[t] for t in tokens if t in matched and t not in GENERIC_TOKENS)
+        return hit / total if total else 0.0
+
+    def best(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Mejor clave y confianza (0-1). Tiene que nombrar al menos MIN_TITLE_COVERAGE
+        de su título y superar a la segunda opción por MIN_CONFIDENCE de margen
+        (con una sola opción el margen siempre es 1, por eso hace falta el piso absoluto).
+        Retorna (None, confianza) si no alcanza.
+        """
+        matched = self._matched_tokens(text)
+        ranked = self._rank(matched, limit=2)
+        if not ranked:
+            return None, 0.0
+        top_key, top = ranked[0]
+        coverage = self.coverage(top_key, matched)
+        if coverage < MIN_TITLE_COVERAGE:
+            return None, coverage
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        margin = (top - second) / top
+        if margin < MIN_CONFIDENCE:
+            return None, margin
+        return top_key, min(margin, coverage)
+
+
+def property_text(prop: Dict[str, Any]) -> str:
+    return f"{prop.get('Title', '')} {prop.get('Neighborhood', '')}"
+
+def match_property(properties: List[Dict[str, Any]], text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    """
+    Elige entre propiedades candidatas según la respuesta del lead:
+    primero por ordinal ("la segunda"), después por similitud de título/barrio.
+    Retorna (propiedad, confianza) o (None, confianza).
+    """
+    chosen = pick_ordinal(properties, text)
+    if chosen is not None:
+        return chosen, 1.0
+
+    index = TrigramIndex((str(i), property_text(p)) for i, p in enumerate(properties))
+    key, confidence = index.best(text)
+    if key is None:
+        return None, confidence
+    return properties[int(key)], confidence
@@ -0,0 +1,193 @@
+# services/keywords.py
+"""
+Motor único de palabras clave para los detectores por reglas.
+
+Todas las listas de palabras (calificación, confirmaciones, intención, barrios,
+fechas...) están declaradas en KEYWORDS y se compilan al importar en un solo
+autómata Aho-Corasick. `scan(texto)` recorre el mensaje una vez (sin acentos y
+en minúsculas) y devuelve todas las coincidencias con su categoría y posición;
+los detectores consultan ese resultado en lugar de repetir `in` por cada lista.
+
+Las coincidencias respetan límites de palabra: "ya" no matchea dentro de "playa"
+ni "no" dentro de "bueno". Una entrada terminada en "*" es una raíz y solo exige
+el límite a la izquierda ("alquil*" → alquiler, alquilar, alquilo).
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from services.text_index import fold
+
+# Categoría → palabras/frases. Un dict asocia un valor a cada frase (ej. nombre canónico del barrio)
+KEYWORDS: Dict[str, Union[List[str], Dict[str, Any]]] = {
+    # Calificación (StageManager.analyze_message_for_qualification_data)
+    "qual.buyer": ["para mi", "para mia", "es mio", "mio", "mia", "soy yo", "es para mi"],
+    "qual.motive": ["mudanza", "mudarme", "vivir", "casa nueva",
+                    "inversion", "invertir", "inversor", "renta", "alquiler"],
+    "qual.financing": ["ahorro*", "efectivo", "tengo", "credito", "banco", "preaprobado", "hipotecario"],
+    "qual.sell": ["vender", "vendo", "tengo que vender", "necesito vender"],
+    "qual.timeline": ["pronto", "rapido", "urgente", "ya", "este mes", "proximo mes"],
+    "qual.ready": ["puedo avanzar", "si me gusta", "estoy listo", "podemos coordinar", "quiero comprar",
+                   "quiero alquilar", "me interesa", "vamos", "dale"],
+
+    # Confirmación de una propiedad propuesta
+    "confirm.yes": ["si", "correcto", "exacto", "esa es", "perfecto", "dale", "ok", "confirmo"],
+    "confirm.no": ["no", "no es", "otra", "otro", "otras", "otros", "diferente", "equivocada"],
+
+    # Intención de operación (slot_rules.INTENT_RULES); "rent*" y "vend*" son ambiguas
+    "intent.alquiler": ["alquil*", "arrend*"],
+    "intent.alquiler_weak": ["rent*"],
+    "intent.venta": ["compr*", "venta", "ventas"],
+    "intent.venta_weak": ["vend*"],
+
+    # Pedido de visita
+    "visit": ["visit*", "ver", "verla", "verlo", "conocer*", "mostrar*", "coordin*", "agend*"],
+
+    # Barrios conocidos → nombre canónico
+    "barrio": {
+        "nuñez": "Núñez", "palermo": "Palermo", "belgrano": "Belgrano",
+        "recoleta": "Recoleta", "san telmo": "San Telmo", "puerto madero": "Puerto Madero",
+        "villa crespo": "Villa Crespo", "caballito": "Caballito", "flores": "Flores",
+        "barracas": "Barracas", "boca": "La Boca", "tigre": "Tigre",
+        "vicente lopez": "Vicente López", "olivos": "Olivos", "martinez": "Martínez",
+    },
+
+    # Referencias a día u horario (StageManager.should_advance_stage)
+    "schedule": ["mañana", "hoy", "lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo",
+                 "hs", "am", "pm"],
+
+    # Menciones de una propiedad (precalificación)
+    "property": ["propiedad*", "casa", "casas", "depto*", "departamento*", "ph", "visita"],
+    "property.search": ["propiedad*", "casa", "casas", "depto*", "departamento*", "ph", "alquil*", "compr*", "venta"],
+    "show_options": ["mostrar*", "ver", "opciones", "cuales", "que tienen"],
+}
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Texto sobre el que se busca: sin acentos, minúsculas y espacios simples (las posiciones son sobre este texto)"""
+    return _SPACES.sub(" ", fold(text or ""))
+
+
+@dataclass(frozen=True)
+class Hit:
+    category: str
+    keyword: str
+    start: int
+    end: int
+    value: Any = None
+
+
+class KeywordAutomaton:
+    """Aho-Corasick sobre texto normalizado, con límites de palabra por entrada"""
+
+    def __init__(self, registry: Dict[str, Union[List[str], Dict[str, Any]]]):
+        # Nodo = dict de transiciones; por nodo: enlace de falla y salidas (categoría, keyword, largo, raíz, valor)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int, bool, Any]]] = [[]]
+        self.size = 0
+        for category, entries in registry.items():
+            items = entries.items() if isinstance(entries, dict) else ((entry, None) for entry in entries)
+            for entry, value in items:
+                self._add(category, entry, value)
+        self._build()
+
+    def _add(self, category: str, entry: str, value: Any):
+        prefix = entry.endswith("*")
+        keyword = normalize(entry.rstrip("*")).strip()
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((category, keyword, len(keyword), prefix, value))
+        self.size += 1
+
+    def _build(self):
+        # BFS: el enlace de falla de cada nodo es el sufijo propio más largo que también está en el trie
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Hit]:
+        """Todas las coincidencias en una pasada, ordenadas por posición"""
+        normalized = normalize(text)
+        hits = []
+        node = 0
+        length = len(normalized)
+        for i, char in enumerate(normalized):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for category, keyword, size, prefix, value in self._out[node]:
+                start = i - size + 1
+                if start > 0 and normalized[start - 1].isalpha():
+                    continue
+                if not prefix and i + 1 < length and normalized[i + 1].isalpha():
+                    continue
+                hits.append(Hit(category, keyword, start, i + 1, value))
+        hits.sort(key=lambda hit: (hit.start, -hit.end))
+        return hits
+
+
+class KeywordMatches:
+    """Resultado de scan(): coincidencias agrupadas por categoría"""
+
+    def __init__(self, hits: List[Hit]):
+        self.hits = hits
+        self._by_category: Dict[str, List[Hit]] = {}
+        for hit in hits:
+            self._by_category.setdefault(hit.category, []).append(hit)
+
+    def has(self, *categories: str) -> bool:
+        return any(category in self._by_category for category in categories)
+
+    def get(self, category: str) -> List[Hit]:
+        return self._by_category.get(category, [])
+
+    def first(self, category: str) -> Optional[Hit]:
+        hits = self._by_category.get(category)
+        return hits[0] if hits else None
+
+    def values(self, category: str) -> List[Any]:
+        """Valores distintos de la categoría, en orden de aparición"""
+        seen = []
+        for hit in self._by_category.get(category, []):
+            if hit.value not in seen:
+                seen.append(hit.value)
+        return seen
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._by_category)
+
+
+_automaton = KeywordAutomaton(KEYWORDS)
+
+
+@lru_cache(maxsize=256)
+def scan(text: str) -> KeywordMatches:
+    """
+    Coincidencias del registro en el texto. El resultado se cachea: los distintos
+    detectores que miran el mismo mensaje en un turno comparten una sola pasada.
+    """
+    return KeywordMatches(_automaton.find(text or ""))
@@ -0,0 +1,255 @@
+# services/lead_session.py
+"""
+Unidad de trabajo del lead durante un turno.
+
+Mientras hay una sesión abierta para el lead, update_lead /
+update_qualification_data / update_lead_stage_and_status no escriben: anotan
+los campos modificados en la sesión. Al cerrar el turno se hace un solo
+update_item con todos los cambios:
+
+- campos de primer nivel con SET #campo = :valor
+- datos de calificación con SET QualificationData.#dato = :valor (sin leer ni
+  pisar el mapa entero, así no se pierden datos que escribió otro proceso)
+- Version = Version + 1 con la condición de que Version siga siendo la que se
+  leyó al empezar el turno. Si otro proceso escribió en el medio se relee el
+  lead: si cambió alguno de los campos que este turno también escribe, no se
+  pisa (LeadConflict y los cambios del turno se descartan); si solo tocó otros
+  campos, se reintenta con la versión nueva.
+
+El webhook escribe la sesión antes de enviar cada respuesta (lo que se le dice
+al lead ya quedó guardado) y otra vez al cerrar el turno, por si quedó algo
+anotado después. Los fallos de
+escritura se cuentan en session_stats() (GET /admin/lead-sessions/stats).
+
+La sesión vive en un ContextVar: TurnGraph copia el contexto a sus workers, así
+los pasos que corren en paralelo anotan en la misma sesión.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+FLUSH_RETRIES = 3
+
+_current: ContextVar[Optional["LeadSession"]] = ContextVar("lead_session", default=None)
+
+# Contadores del proceso (se reinician con el contenedor)
+_stats = {"flushes": 0, "buffered_writes": 0, "conflicts_merged": 0, "conflicts_aborted": 0, "failures": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def session_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+class LeadConflict(Exception):
+    """Otro proceso cambió campos que el turno también escribe: no se pisan"""
+
+    def __init__(self, lead_id: str, fields: List[str]):
+        super().__init__(f"lead {lead_id} modificado por otro proceso en {', '.join(fields)}")
+        self.lead_id = lead_id
+        self.fields = fields
+
+
+class LeadSession:
+    def __init__(self, lead_id: str):
+        self.lead_id = lead_id
+        self.version: Optional[int] = None
+        self.has_qualification_map = True
+        self.fields: Dict[str, Any] = {}
+        self.qualification: Dict[str, Any] = {}
+        self.buffered_writes = 0
+        # Valores leídos al inicio del turno (o escritos por la sesión), para detectar conflictos
+        self._base: Dict[str, Any] = {}
+        self._base_qualification: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, lead):
+        """Toma la versión, la forma y los valores del lead leído al inicio del turno"""
+        version = lead.get("Version")
+        self.version = int(version) if version is not None else None
+        qualification = lead.get("QualificationData")
+        self.has_qualification_map = isinstance(qualification, dict)
+        # Copia: el turno modifica el dict del lead a medida que avanza
+        self._base = dict(lead)
+        self._base_qualification = dict(qualification) if self.has_qualification_map else {}
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.fields or self.qualification)
+
+    def set_fields(self, fields: Dict[str, Any]):
+        with self._lock:
+            self.buffered_writes += 1
+            for key, value in fields.items():
+                if key == "QualificationData" and isinstance(value, dict):
+                    # El mapa entero reemplaza los datos sueltos anotados antes
+                    self.qualification = {}
+                self.fields[key] = value
+
+    def set_qualification(self, updates: Dict[str, Any]):
+        with self._lock:
+            self.buffered_writes += 1
+            whole_map = self.fields.get("QualificationData")
+            if isinstance(whole_map, dict):
+                whole_map.update(updates)
+            else:
+                self.qualification.update(updates)
+
+    def _update_args(self) -> Dict[str, Any]:
+        from services.dynamo import now_iso
+
+        names = {"#Ver": "Version"}
+        values = {":u": now_iso(), ":next": (self.version or 0) + 1}
+        sets = ["UpdatedAt = :u", "#Ver = :next"]
+        for i, (key, value) in enumerate(self.fields.items(), 1):
+            names[f"#F{i}"] = key
+            values[f":v{i}"] = value
+            sets.append(f"#F{i} = :v{i}")
+
+        if self.qualification:
+            if self.has_qualification_map:
+                names["#QD"] = "QualificationData"
+                for i, (key, value) in enumerate(self.qualification.items(), 1):
+                    names[f"#Q{i}"] = key
+                    values[f":q{i}"] = value
+                    sets.append(f"#QD.#Q{i} = :q{i}")
+            else:
+                # Lead sin mapa (ítem viejo): no hay ruta anidada que setear
+                names["#QD"] = "QualificationData"
+                values[":qd"] = dict(self.qualification)
+                sets.append("#QD = :qd")
+
+        if self.version is None:
+            condition = "attribute_not_exists(#Ver)"
+        else:
+            condition = "#Ver = :expected"
+            values[":expected"] = self.version
+        return {
+            "Key": {"LeadId": self.lead_id},
+            "UpdateExpression": "SET " + ", ".join(sets),
+            "ConditionExpression": condition,
+            "ExpressionAttributeNames": names,
+            "ExpressionAttributeValues": values,
+        }
+
+    def _conflicts(self, current: Dict[str, Any]) -> List[str]:
+        """Campos anotados que el otro proceso cambió respecto de lo leído (a otro valor que el nuestro)"""
+        conflicts = [
+            key for key, value in self.fields.items()
+            if current.get(key) != self._base.get(key) and current.get(key) != value
+        ]
+        current_qualification = current.get("QualificationData")
+        if not isinstance(current_qualification, dict):
+            current_qualification = {}
+        conflicts += [
+            f"QualificationData.{key}" for key, value in self.qualification.items()
+            if current_qualification.get(key) != self._base_qualification.get(key)
+            and current_qualification.get(key) != value
+        ]
+        return conflicts
+
+    def _reload(self):
+        """
+        Relee el lead después de un ConditionalCheckFailed. Lanza LeadConflict si
+        el otro proceso cambió algún campo anotado; si no, toma la versión nueva.
+        """
+        from services.dynamo import t_leads
+
+        resp = t_leads.get_item(Key={"LeadId": self.lead_id}, ConsistentRead=True)
+        current = resp.get("Item")
+        conflicts = ["LeadId"] if current is None else self._conflicts(current)
+        if conflicts:
+            raise LeadConflict(self.lead_id, conflicts)
+        # Los campos que no anotamos quedan como los dejó el otro proceso
+        base_fields, base_qualification = dict(self._base), dict(self._base_qualification)
+        self.bind(current)
+        self._base.update({k: base_fields.get(k) for k in self.fields})
+        self._base_qualification.update({k: base_qualification.get(k) for k in self.qualification})
+
+    def _discard(self):
+        self.fields = {}
+        self.qualification = {}
+        self.buffered_writes = 0
+
+    def flush(self) -> bool:
+        """
+        Escribe los cambios anotados en un solo update_item. Retorna True si escribió.
+        Lanza LeadConflict (descartando los cambios) o el error de DynamoDB si no pudo.
+        """
+        from services.dynamo import t_leads
+
+        with self._lock:
+            if not self.dirty:
+                return False
+            try:
+                for attempt in range(1, FLUSH_RETRIES + 1):
+                    try:
+                        t_leads.update_item(**self._update_args())
+                        break
+                    except t_leads.meta.client.exceptions.ConditionalCheckFailedException:
+                        print(f"⚠️ [LEAD] {self.lead_id} modificado por otro proceso (v{self.version}), "
+                              f"comparando campos ({attempt}/{FLUSH_RETRIES})")
+                        if attempt == FLUSH_RETRIES:
+                            raise
+                        self._reload()
+                        _count("conflicts_merged")
+            except LeadConflict as e:
+                print(f"❌ [LEAD] {e}: se descartan los cambios del turno")
+                _count("conflicts_aborted")
+                _count("failures")
+                self._discard()
+                raise
+            except Exception:
+                _count("failures")
+                raise
+
+            print(f"💾 [LEAD] {self.lead_id}: {self.buffered_writes} escrituras en 1 update_item "
+                  f"({len(self.fields)} campos, {len(self.qualification)} de calificación) → v{(self.version or 0) + 1}")
+            _count("flushes")
+            _count("buffered_writes", self.buffered_writes)
+            # Lo escrito pasa a ser la base para la próxima escritura del turno
+            self.version = (self.version or 0) + 1
+            self._base.update(self.fields)
+            if isinstance(self.fields.get("QualificationData"), dict):
+                self._base_qualification = dict(self.fields["QualificationData"])
+            self._base_qualification.update(self.qualification)
+            if self.qualification and not self.has_qualification_map:
+                self.has_qualification_map = True
+            self._discard()
+            return True
+
+
+def current_session(lead_id: str) -> Optional[LeadSession]:
+    """Sesión abierta para ese lead en el contexto actual, o None"""
+    session = _current.get()
+    if session is not None and session.lead_id == lead_id:
+        return session
+    return None
+
+
+@contextmanager
+def lead_session(lead_id: str):
+    """
+    Abre la unidad de trabajo del turno y escribe lo que quede pendiente al salir
+    (también si el turno falla a mitad, igual que antes quedaban escritos los pasos
+    ya hechos). Para entonces la respuesta ya se envió: un fallo no se relanza
+    (reprocesar el mensaje duplicaría la respuesta), queda en session_stats().
+    """
+    session = LeadSession(lead_id)
+    token = _current.set(session)
+    try:
+        yield session
+    finally:
+        _current.reset(token)
+        try:
+            session.flush()
+        except Exception as e:
+            print(f"❌ [LEAD] Error guardando cambios de {lead_id} al cerrar el turno: {e}")
@@ -0,0 +1,220 @@
+# services/llm.py
+"""
+Capa resiliente para las llamadas a OpenAI.
+
+- Deadline por propósito: una extracción no puede tardar lo mismo que una respuesta
+  (LLM_TIMEOUT_EXTRACTION / LLM_TIMEOUT_REPLY / LLM_TIMEOUT_SUMMARY), sin reintentos
+  del SDK que estiren la espera.
+- Hedging opcional (LLM_HEDGE_ENABLED): si la llamada supera el p95 observado para
+  ese propósito, se lanza una segunda idéntica y se usa la que termine primero.
+- Circuit breaker: tras LLM_BREAKER_FAILURES fallas seguidas del proveedor, durante
+  LLM_BREAKER_COOLDOWN_SECONDS las llamadas fallan al instante con LLMUnavailable y
+  el turno usa los fallbacks por reglas (extract_slots, calificación por palabras
+  clave, parser de fechas, respuestas fijas por etapa).
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional
+
+from config import (
+    LLM_TIMEOUT_EXTRACTION, LLM_TIMEOUT_REPLY, LLM_TIMEOUT_SUMMARY,
+    LLM_HEDGE_ENABLED, LLM_HEDGE_MIN_SAMPLES, LLM_BREAKER_FAILURES,
+    LLM_BREAKER_COOLDOWN_SECONDS, LLM_MAX_CONCURRENCY,
+)
+
+PURPOSE_TIMEOUTS = {
+    "extraction": LLM_TIMEOUT_EXTRACTION,
+    "reply": LLM_TIMEOUT_REPLY,
+    "summary": LLM_TIMEOUT_SUMMARY,
+}
+
+
+class LLMUnavailable(Exception):
+    """OpenAI no respondió a tiempo, falló o el circuito está abierto"""
+
+
+class CircuitBreaker:
+    """closed → (N fallas seguidas) → open → (cooldown) → half_open → 1 prueba → closed/open"""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                # Una sola llamada de prueba mientras el proveedor se recupera
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print("🟢 [LLM] Circuito cerrado: OpenAI respondió de nuevo")
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    print(f"🔴 [LLM] Circuito abierto por {self.cooldown_seconds:.0f}s tras {self.failures} fallas")
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+class LatencyWindow:
+    """Últimas latencias exitosas (segundos) por propósito, para el umbral de hedging"""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def add(self, purpose: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(purpose, deque(maxlen=self.size)).append(seconds)
+
+    def purposes(self):
+        with self._lock:
+            return list(self._samples)
+
+    def percentile(self, purpose: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(purpose, ()))
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def _is_provider_failure(error: Exception) -> bool:
+    """Timeouts, errores de conexión, 429 y 5xx cuentan para el circuito; un 400 es culpa nuestra"""
+    status = getattr(error, "status_code", None)
+    return status is None or status in (408, 409, 429) or status >= 500
+
+
+class ResilientLLM:
+    def __init__(self, client, hedge_enabled: bool = LLM_HEDGE_ENABLED):
+        self.client = client
+        self.hedge_enabled = hedge_enabled
+        self.breaker = CircuitBreaker()
+        self.latencies = LatencyWindow()
+        self.counters = {"calls": 0, "timeouts": 0, "errors": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0}
+        self._executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm")
+
+    def _create(self, timeout: float, kwargs: Dict[str, Any]):
+        return self.client.with_options(timeout=timeout, max_retries=0).chat.completions.create(**kwargs)
+
+    def complete(self, purpose: str, deadline: Optional[float] = None, **kwargs):
+        """
+        chat.completions.create con deadline, hedging y circuit breaker.
+        `purpose` agrupa las latencias para el hedging; `deadline` reemplaza el de
+        PURPOSE_TIMEOUTS (las rutas de services.model_routing traen el suyo).
+        Lanza LLMUnavailable si no hay respuesta utilizable.
+        """
+        if self.client is None:
+            raise LLMUnavailable("Cliente OpenAI no configurado")
+        if not self.breaker.allow():
+            self.counters["rejected"] += 1
+            raise LLMUnavailable("Circuito abierto: OpenAI degradado")
+
+        self.counters["calls"] += 1
+        deadline = deadline or PURPOSE_TIMEOUTS.get(purpose, LLM_TIMEOUT_REPLY)
+        start = time.monotonic()
+        primary = self._executor.submit(self._create, deadline, kwargs)
+        futures = [primary]
+
+        hedge_after = self.latencies.percentile(purpose, 95) if self.hedge_enabled else None
+        if hedge_after is not None and hedge_after < deadline:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                self.counters["hedges"] += 1
+                print(f"⏩ [LLM] {purpose}: sin respuesta en p95 ({hedge_after:.2f}s), lanzando hedge")
+                futures.append(self._executor.submit(self._create, deadline - hedge_after, kwargs))
+
+        last_error: Optional[Exception] = None
+        while futures:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                futures.remove(future)
+                error = future.exception()
+                if error is None:
+                    self.latencies.add(purpose, time.monotonic() - start)
+                    self.breaker.record_success()
+                    if future is not primary:
+                        self.counters["hedge_wins"] += 1
+                    return future.result()
+                last_error = error
+
+        if last_error is not None and not futures:
+            self.counters["errors"] += 1
+            if _is_provider_failure(last_error):
+                self.breaker.record_failure()
+            else:
+                # OpenAI respondió (ej. 400 por el request): el proveedor está sano
+                self.breaker.record_success()
+            raise LLMUnavailable(f"{purpose}: {last_error}") from last_error
+
+        self.counters["timeouts"] += 1
+        self.breaker.record_failure()
+        raise LLMUnavailable(f"{purpose}: sin respuesta en {deadline:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "breaker": self.breaker.state,
+            "p95_seconds": {p: self.latencies.percentile(p, 95) for p in self.latencies.purposes()},
+        }
+
+
+_llm: Optional[ResilientLLM] = None
+_llm_lock = threading.Lock()
+
+
+def get_llm() -> ResilientLLM:
+    """Capa del proceso sobre services.ai.client"""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from services.ai import client
+                _llm = ResilientLLM(client)
+    return _llm
+
+
+def chat_completion(purpose: str, **kwargs):
+    """Atajo: get_llm().complete(purpose, **kwargs)"""
+    return get_llm().complete(purpose, **kwargs)
+
+
+def llm_available() -> bool:
+    """False si no hay cliente o el circuito está abierto (el turno va directo a las reglas)"""
+    llm = get_llm()
+    return llm.client is not None and llm.breaker.state != "open"
@@ -0,0 +1,150 @@
+# services/llm_cache.py
+"""
+Caché de resultados de OpenAI para extracciones que dependen solo del texto del mensaje.
+
+Respuestas cortas como "si", "dale" o "2 ambientes en Palermo" se repiten entre
+leads; en vez de pagar una completion por cada una, el resultado se guarda por
+texto normalizado (minúsculas, sin acentos ni puntuación) + modelo +
+versión del prompt (hash del prompt: si se edita, las entradas viejas no se usan).
+
+Dos niveles:
+- LRU en memoria del contenedor (sin latencia)
+- Tabla DynamoDB opcional (LLM_CACHE_TABLE) compartida entre contenedores, con TTL
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+
+from config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TABLE, LLM_CACHE_TTL_SECONDS
+from services.text_index import fold
+
+_SEPARATORS = re.compile(r"[^\w$]+")
+
+
+def normalize_text(text: str) -> str:
+    """'  Dale!! ' → 'dale'; 'Para mí, para mudarme.' → 'para mi para mudarme'"""
+    return _SEPARATORS.sub(" ", fold(text or "")).strip()
+
+
+def prompt_version(prompt: str) -> str:
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:10]
+
+
+def cache_key(namespace: str, text: str, model: str, version: str) -> str:
+    raw = f"{namespace}|{model}|{version}|{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """LRU en memoria + tier DynamoDB opcional, con contadores de hits/misses por tier"""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, table=None,
+                 ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "dynamo_hits": 0, "misses": 0, "errors": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._entries[key]
+
+        value = self._get_remote(key)
+        if value is not None:
+            self._remember(key, value)
+            self.counters["dynamo_hits"] += 1
+            return value
+
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, value: Any):
+        self._remember(key, value)
+        self._put_remote(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counters["memory_hits"] + self.counters["dynamo_hits"]
+        total = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "dynamo_tier": self.table is not None,
+        }
+
+    def _remember(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_remote(self, key: str) -> Optional[Any]:
+        if self.table is None:
+            return None
+        try:
+            item = self.table.get_item(Key={"CacheKey": key}).get("Item")
+            # El TTL de DynamoDB borra con demora: chequear vencimiento igual
+            if not item or int(item.get("ExpiresAt", 0)) < time.time():
+                return None
+            return json.loads(item["Value"])
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"[LLM_CACHE][ERROR] Lectura DynamoDB: {e}")
+            return None
+
+    def _put_remote(self, key: str, value: Any):
+        if self.table is None:
+            return
+        try:
+            self.table.put_item(Item={
+                "CacheKey": key,
+                "Value": json.dumps(value, ensure_ascii=False),
+                "ExpiresAt": int(time.time()) + self.ttl_seconds,
+            })
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"[LLM_CACHE][ERROR] Escritura DynamoDB: {e}")
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    """Caché del proceso (una por contenedor Lambda)"""
+    global _cache
+    if _cache is None:
+        table = None
+        if LLM_CACHE_TABLE:
+            from services.dynamo import dynamodb
+            table = dynamodb.Table(LLM_CACHE_TABLE)
+        _cache = LLMCache(table=table)
+    return _cache
+
+
+def cached_completion(namespace: str, prompt: str, model: str, text: str,
+                      compute: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """
+    Retorna el resultado cacheado para (namespace, texto, modelo, prompt) o lo calcula
+    con `compute`. Los None (errores de OpenAI) no se cachean.
+    """
+    cache = get_llm_cache()
+    key = cache_key(namespace, text, model, prompt_version(prompt))
+    value = cache.get(key)
+    if value is not None:
+        print(f"[LLM_CACHE] Hit {namespace}: '{normalize_text(text)[:40]}'")
+        return value
+    value = compute()
+    if value is not None:
+        cache.put(key, value)
+    return value
@@ -1,44 +1,61 @@
 from typing import Dict, Any, List
-from models.schemas import dec_to_native
+
+import numpy as np
 
 
 def props_ids(props: List[Dict[str, Any]]) -> list[str]:
     return [p.get("PropertyId") for p in props if p.get("PropertyId")]
 
 
-def _prop_ok(p: Dict[str, Any], lead: Dict[str, Any]) -> bool:
-    p = dec_to_native(p)
+def _top_k_indices(key: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posiciones de los k menores valores de `key`, desempatando por posición para
+    respetar el orden estable del catálogo. Usa partition en vez de ordenar todo.
+    """
+    if len(key) > k:
+        threshold = np.partition(key, k - 1)[k - 1]
+        candidates = np.flatnonzero(key <= threshold)
+    else:
+        candidates = np.arange(len(key))
+    order = np.lexsort((candidates, key[candidates]))
+    return candidates[order][:k]
+
+def find_matches(lead: Dict[str, Any], t_props=None, limit: int = 3) -> List[Dict[str, Any]]:
+    """
+    Top de propiedades para el lead, filtrando y rankeando sobre las columnas NumPy
+    del catálogo en memoria (t_props se mantiene por compatibilidad).
+    Solo se materializan los dicts de las filas devueltas.
+    """
+    if limit <= 0:
+        return []
+
+    from services.catalog import get_catalog
+    snapshot = get_catalog().snapshot()
+    cols = snapshot.columns
+
     neighborhood = lead.get("Neighborhood")
     rooms = lead.get("Rooms")
     budget = lead.get("Budget")
 
-    if neighborhood and p.get("Neighborhood") != neighborhood:
-        return False
-    if isinstance(rooms, int) and isinstance(p.get("Rooms"), (int, float)) and p["Rooms"] < rooms:
-        return False
-    if isinstance(budget, (int, float)) and isinstance(p.get("Price"), (int, float)) and p["Price"] > budget:
-        return False
-    return True
-
-def find_matches(lead: Dict[str, Any], t_props, limit: int = 3) -> List[Dict[str, Any]]:
-    # Scan simple (barato al inicio). Luego: GSI_Neighborhood si hace falta.
-    scan_kwargs = {
-        "FilterExpression": "#S = :active",
-        "ExpressionAttributeNames": {"#S": "Status"},
-        "ExpressionAttributeValues": {":active": "ACTIVE"},
-    }
-    resp = t_props.scan(**scan_kwargs)
-    items = resp.get("Items", [])
-    matched = [dec_to_native(p) for p in items if _prop_ok(p, lead)]
+    # Las comparaciones con NaN dan False: los datos faltantes no descartan la propiedad
+    mask = np.ones(len(cols), dtype=bool)
+    if neighborhood:
+        mask &= cols.neighborhood == cols.neighborhood_code(neighborhood)
+    if isinstance(rooms, int):
+        mask &= ~(cols.rooms < rooms)
+    if isinstance(budget, (int, float)):
+        mask &= ~(cols.price > budget)
 
-    budget = lead.get("Budget")
     if isinstance(budget, (int, float)):
-        matched.sort(key=lambda x: abs(x.get("Price", 10**9) - budget))
+        idx = np.flatnonzero(mask)
+        distance = np.abs(np.nan_to_num(cols.price[idx], nan=10**9) - budget)
+        selected = idx[_top_k_indices(distance, limit)]
     else:
-        matched.sort(key=lambda x: (-x.get("Rooms", 0), x.get("Price", 10**9)))
+        # El orden (-Rooms, Price) no depende del lead: viene precalculado por snapshot
+        order = cols.rooms_price_order
+        selected = order[mask[order]][:limit]
 
-    result = matched[:limit]
-    return result 
+    return [snapshot.items[i] for i in selected]
 
 def format_props_sms(props: List[Dict[str, Any]]) -> str:
     """
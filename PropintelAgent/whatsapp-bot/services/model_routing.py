@@ -0,0 +1,207 @@
+# services/model_routing.py
+"""
+Ruteo de modelos por tarea y etapa.
+
+Cada llamada a OpenAI declara su tarea (slots, qualification, visit_date,
+turn_extraction, turn, reply, summary) y la etapa del lead; la tabla ROUTES
+define modelo, tope de tokens de respuesta, temperatura y deadline de esa
+combinación. Las extracciones JSON chicas van al modelo más barato
+(OPENAI_EXTRACTION_MODEL) y las respuestas de etapas cortas (FINALIZADO) tienen
+tope bajo. MODEL_ROUTES permite ajustar rutas sin deploy.
+
+Por ruta se acumulan histogramas de latencia y tokens (GET /llm/routes en el
+panel) para ajustar costo y latencia de cada una por separado.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, replace, asdict
+from typing import Dict, Any, List, Optional
+
+from config import (
+    OPENAI_MODEL, OPENAI_EXTRACTION_MODEL, MODEL_ROUTES, SUMMARY_MAX_TOKENS,
+    LLM_TIMEOUT_EXTRACTION, LLM_TIMEOUT_REPLY, LLM_TIMEOUT_SUMMARY,
+)
+
+
+@dataclass(frozen=True)
+class Route:
+    key: str
+    model: str
+    max_tokens: int
+    temperature: float
+    deadline: float
+
+
+def _extraction(key: str, max_tokens: int) -> Route:
+    return Route(key, OPENAI_EXTRACTION_MODEL, max_tokens, 0.0, LLM_TIMEOUT_EXTRACTION)
+
+
+def _reply(key: str, max_tokens: int, deadline: float = LLM_TIMEOUT_REPLY) -> Route:
+    return Route(key, OPENAI_MODEL, max_tokens, 0.6, deadline)
+
+
+# "tarea" aplica a todas las etapas; "tarea:ETAPA" la pisa para esa etapa
+ROUTES: Dict[str, Route] = {
+    "slots": _extraction("slots", 150),
+    "qualification": _extraction("qualification", 150),
+    "visit_date": _extraction("visit_date", 60),
+    "turn_extraction": _extraction("turn_extraction", 250),
+    "turn": _reply("turn", 500),
+    "turn:FINALIZADO": _reply("turn:FINALIZADO", 250, deadline=8),
+    "reply": _reply("reply", 300),
+    "reply:POST_CALIFICACION": _reply("reply:POST_CALIFICACION", 200),
+    "reply:FINALIZADO": _reply("reply:FINALIZADO", 120, deadline=8),
+    "summary": Route("summary", OPENAI_MODEL, SUMMARY_MAX_TOKENS, 0.2, LLM_TIMEOUT_SUMMARY),
+}
+
+
+def _apply_overrides(routes: Dict[str, Route], raw: Optional[str]) -> Dict[str, Route]:
+    """Aplica MODEL_ROUTES (JSON) sobre la tabla; una clave nueva hereda de su tarea"""
+    if not raw:
+        return routes
+    try:
+        overrides = json.loads(raw)
+        result = dict(routes)
+        for key, fields in overrides.items():
+            base = result.get(key) or result[key.split(":")[0]]
+            result[key] = replace(base, key=key, **{k: v for k, v in fields.items() if k != "key"})
+        print(f"🧭 [ROUTES] Rutas ajustadas por MODEL_ROUTES: {', '.join(overrides)}")
+        return result
+    except Exception as e:
+        print(f"[ROUTES][ERROR] MODEL_ROUTES inválido, se usa la tabla por defecto: {e}")
+        return routes
+
+
+_routes = _apply_overrides(ROUTES, MODEL_ROUTES)
+
+
+def get_route(task: str, stage: Optional[str] = None) -> Route:
+    """Ruta de la tarea para la etapa (o la de la tarea si la etapa no tiene una propia)"""
+    if stage and f"{task}:{stage}" in _routes:
+        return _routes[f"{task}:{stage}"]
+    return _routes[task]
+
+
+class Histogram:
+    """Conteos por bucket (límite superior inclusivo) + suma, para estimar percentiles"""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Límite superior del bucket que contiene el percentil"""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 4, 8, 16]
+TOKEN_BUCKETS = [32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+
+class RouteMetrics:
+    """Histogramas de latencia (segundos) y tokens de prompt/respuesta por ruta"""
+
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> Dict[str, Any]:
+        entry = self._routes.get(key)
+        if entry is None:
+            entry = self._routes[key] = {
+                "errors": 0,
+                "latency": Histogram(LATENCY_BUCKETS),
+                "prompt_tokens": Histogram(TOKEN_BUCKETS),
+                "completion_tokens": Histogram(TOKEN_BUCKETS),
+            }
+        return entry
+
+    def record(self, key: str, seconds: float, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            entry = self._entry(key)
+            entry["latency"].observe(seconds)
+            entry["prompt_tokens"].observe(prompt_tokens)
+            entry["completion_tokens"].observe(completion_tokens)
+
+    def record_error(self, key: str):
+        with self._lock:
+            self._entry(key)["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                key: {name: value.to_dict() if isinstance(value, Histogram) else value
+                      for name, value in entry.items()}
+                for key, entry in self._routes.items()
+            }
+
+
+_metrics = RouteMetrics()
+
+
+def get_route_metrics() -> RouteMetrics:
+    return _metrics
+
+
+def routed_completion(task: str, stage: Optional[str] = None, **kwargs):
+    """
+    chat_completion con el modelo, tope de tokens, temperatura y deadline de la ruta.
+    Los kwargs (messages, response_format...) pisan los de la ruta si se repiten.
+    Lanza LLMUnavailable como chat_completion.
+    """
+    from services.llm import get_llm, LLMUnavailable
+    from services.tokens import count_message_tokens, count_tokens
+
+    route = get_route(task, stage)
+    params = {"model": route.model, "max_tokens": route.max_tokens, "temperature": route.temperature, **kwargs}
+    start = time.monotonic()
+    try:
+        resp = get_llm().complete(route.key, deadline=route.deadline, **params)
+    except LLMUnavailable:
+        _metrics.record_error(route.key)
+        raise
+
+    usage = getattr(resp, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or count_message_tokens(params.get("messages") or [])
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if completion_tokens is None:
+        choices = getattr(resp, "choices", None) or []
+        completion_tokens = count_tokens(choices[0].message.content if choices else "")
+    _metrics.record(route.key, time.monotonic() - start, prompt_tokens, completion_tokens)
+    return resp
+
+
+def routes_report() -> Dict[str, Any]:
+    """Tabla de rutas vigente + métricas por ruta (para el panel)"""
+    return {
+        "routes": {key: asdict(route) for key, route in _routes.items()},
+        "metrics": _metrics.stats(),
+    }
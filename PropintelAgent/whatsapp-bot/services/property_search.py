@@ -5,8 +5,9 @@ NUNCA inventa o alucina propiedades.
 """
 
 from typing import Dict, Any, List, Optional, Tuple
-from boto3.dynamodb.conditions import Attr, Key
-from models.schemas import dec_to_native
+from services.fuzzy import match_property
+from services.keywords import scan
+from models.records import Property
 
 
 class PropertySearchService:
@@ -15,40 +16,30 @@ class PropertySearchService:
     def __init__(self, t_props):
         self.t_props = t_props
     
-    def search_by_url(self, message_text: str) -> Optional[Dict[str, Any]]:
+    def search_by_url(self, message_text: str) -> Optional[Property]:
         """
         Busca una propiedad específica por URL en el mensaje.
         Retorna la propiedad si existe, None si no encuentra nada.
         """
-        import re
+        from utils.urls import extract_urls
         
         # Detectar URLs en el mensaje
-        url_pattern = r'https?://[^\s]+'
-        urls = re.findall(url_pattern, message_text)
+        urls = extract_urls(message_text)
         
         if not urls:
             return None
         
         try:
+            from services.catalog import get_catalog
+            catalog = get_catalog()
+            
             for url in urls:
                 print(f"[SEARCH] Buscando propiedad por URL: {url}")
                 
-                # Buscar por coincidencia del final del URL
-                url_suffix = url.split('/')[-1]
-                
-                resp = self.t_props.scan(
-                    FilterExpression=Attr("URL").contains(url_suffix) & Attr("Status").eq("ACTIVE"),
-                    Limit=5
-                )
-                
-                items = resp.get("Items", [])
-                
-                # Verificar coincidencia exacta
-                for item in items:
-                    prop = dec_to_native(item)
-                    if prop.get("URL") == url:
-                        print(f"[SEARCH] ✅ Propiedad encontrada por URL: {prop.get('Title')}")
-                        return self._format_property(prop)
+                prop = catalog.find_by_url(url)
+                if prop:
+                    print(f"[SEARCH] ✅ Propiedad encontrada por URL: {prop.get('Title')}")
+                    return self._format_property(prop)
                 
                 print(f"[SEARCH] ❌ No se encontró propiedad para URL: {url}")
             
@@ -86,11 +77,11 @@ class PropertySearchService:
             elif len(properties) == 1:
                 # Una sola propiedad encontrada - confirmar
                 prop = properties[0]
-                return properties, f"Encontré esta propiedad: {prop['Title']} en {prop['Neighborhood']}. Es esta la que te interesa?"
+                return properties, f"Encontré esta propiedad: {prop.display('Title')} en {prop.display('Neighborhood')}. Es esta la que te interesa?"
             
             else:
                 # Múltiples propiedades - pedir más detalles
-                neighborhoods = list(set(p.get('Neighborhood', 'N/A') for p in properties))
+                neighborhoods = list(set(p.display('Neighborhood') for p in properties))
                 if len(neighborhoods) == 1:
                     # Todas en el mismo barrio, pedir más detalles
                     return properties, f"Tengo {len(properties)} propiedades en {neighborhoods[0]}. Me podes dar más detalles? Cuantos ambientes necesitas o cual es tu presupuesto?"
@@ -102,39 +93,43 @@ class PropertySearchService:
             print(f"[SEARCH][CRITERIA][ERROR] {e}")
             return [], "Tuve un problema técnico buscando propiedades. Podes darme más detalles de lo que buscas?"
     
-    def confirm_property_selection(self, properties: List[Dict[str, Any]], user_response: str) -> Optional[Dict[str, Any]]:
+    def confirm_property_selection(self, properties: List[Property], user_response: str) -> Optional[Property]:
         """
         Confirma la selección de una propiedad específica basada en la respuesta del usuario.
         """
         if not properties or not user_response:
             return None
         
-        user_response_lower = user_response.lower()
-        
-        # Si solo hay una propiedad y respuesta positiva
+        # Una sola propiedad: se confirma con un "sí" explícito, un ordinal ("la primera")
+        # o nombrando su título; "quiero otro departamento" o "cuánto sale?" no la confirman
         if len(properties) == 1:
-            positive_keywords = ["si", "sí", "si!", "correcto", "exacto", "esa es", "perfecto", "dale", "ok", "confirmo"]
-            if any(keyword in user_response_lower for keyword in positive_keywords):
-                return properties[0]
-            
-            negative_keywords = ["no", "no es", "otra", "diferente", "equivocada"]
-            if any(keyword in user_response_lower for keyword in negative_keywords):
+            matches = scan(user_response)
+            if matches.has("confirm.no"):
                 return None
+            if matches.has("confirm.yes"):
+                return properties[0]
         
-        # Si hay múltiples propiedades, buscar coincidencias específicas
-        if len(properties) > 1:
-            for prop in properties:
-                title_words = prop.get('Title', '').lower().split()
-                neighborhood = prop.get('Neighborhood', '').lower()
-                
-                # Buscar coincidencias en título o barrio
-                if any(word in user_response_lower for word in title_words if len(word) > 3):
-                    return prop
-                
-                if neighborhood in user_response_lower:
-                    return prop
-        
-        return None
+        # Elección ordinal ("la segunda") o coincidencia de título/barrio por encima del piso absoluto
+        prop, confidence = match_property(properties, user_response)
+        if prop:
+            print(f"[SEARCH] Selección reconocida: {prop.get('Title')} (confianza {confidence:.2f})")
+        return prop
+    
+    def search_by_title(self, message_text: str) -> Optional[Property]:
+        """
+        Busca en el catálogo una propiedad cuyo título coincida de forma aproximada
+        con el mensaje. Solo retorna si la coincidencia no es ambigua.
+        """
+        try:
+            from services.catalog import get_catalog
+            prop, confidence = get_catalog().match_title(message_text)
+            if prop:
+                print(f"[SEARCH] ✅ Propiedad encontrada por título: {prop.get('Title')} (confianza {confidence:.2f})")
+                return self._format_property(prop)
+            return None
+        except Exception as e:
+            print(f"[SEARCH][TITLE][ERROR] {e}")
+            return None
     
     def _extract_search_criteria(self, lead_data: Dict[str, Any], message_text: str) -> Dict[str, Any]:
         """Extrae criterios de búsqueda del lead y mensaje"""
@@ -165,19 +160,10 @@ class PropertySearchService:
         criteria = {}
         message_lower = message_text.lower()
         
-        # Barrios conocidos
-        barrios = {
-            "nuñez": "Núñez", "palermo": "Palermo", "belgrano": "Belgrano",
-            "recoleta": "Recoleta", "san telmo": "San Telmo", "puerto madero": "Puerto Madero",
-            "villa crespo": "Villa Crespo", "caballito": "Caballito", "flores": "Flores",
-            "barracas": "Barracas", "boca": "La Boca", "tigre": "Tigre",
-            "vicente lopez": "Vicente López", "olivos": "Olivos", "martinez": "Martínez"
-        }
-        
-        for barrio_key, barrio_nombre in barrios.items():
-            if barrio_key in message_lower:
-                criteria["neighborhood"] = barrio_nombre
-                break
+        # Barrios conocidos (registro de services.keywords, sin acentos)
+        barrio = scan(message_text).first("barrio")
+        if barrio:
+            criteria["neighborhood"] = barrio.value
         
         # Número de ambientes
         import re
@@ -221,47 +207,59 @@ class PropertySearchService:
         
         return criteria
     
-    def _find_properties_by_criteria(self, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _find_properties_by_criteria(self, criteria: Dict[str, Any]) -> List[Property]:
         """Busca propiedades que coincidan con los criterios"""
         try:
-            filter_expr = Attr("Status").eq("ACTIVE")
-            
-            # Aplicar filtros disponibles
-            if criteria.get("neighborhood"):
-                filter_expr = filter_expr & Attr("Neighborhood").eq(criteria["neighborhood"])
-            
-            if criteria.get("rooms"):
-                filter_expr = filter_expr & Attr("Rooms").eq(criteria["rooms"])
-            
-            if criteria.get("budget"):
-                filter_expr = filter_expr & Attr("Price").lte(criteria["budget"])
-            
-            # Buscar en la BD
-            resp = self.t_props.scan(FilterExpression=filter_expr, Limit=20)
-            items = resp.get("Items", [])
+            from services.query_planner import find_properties
             
-            # Convertir y formatear
-            properties = []
-            for item in items:
-                prop = dec_to_native(item)
-                properties.append(self._format_property(prop))
+            # Aplicar filtros disponibles (catálogo en memoria o query sobre GSI)
+            items = find_properties(
+                neighborhood=criteria.get("neighborhood"),
+                rooms=criteria.get("rooms"),
+                max_price=criteria.get("budget"),
+                limit=20,
+            )
             
-            return properties
+            # Formatear
+            return [self._format_property(prop) for prop in items]
         
         except Exception as e:
             print(f"[SEARCH][FIND][ERROR] {e}")
             return []
     
-    def _format_property(self, prop: Dict[str, Any]) -> Dict[str, Any]:
-        """Formatea una propiedad para uso consistente"""
-        return {
-            "PropertyId": prop.get("PropertyId"),
-            "Title": prop.get("Title", "Propiedad sin título"),
-            "Neighborhood": prop.get("Neighborhood", "Zona no especificada"),
-            "Rooms": prop.get("Rooms"),
-            "Price": prop.get("Price"),
-            "URL": prop.get("URL", "")
-        }
+    def _format_property(self, prop) -> Property:
+        """
+        Propiedad como registro. Las del catálogo ya lo son y se comparten sin copiar:
+        son de solo lectura (el mismo objeto lo ven todos los turnos del contenedor);
+        quien necesite modificar una usa `.copy()`. Los textos por defecto (sin
+        título, sin zona) se resuelven con `display`, sin tocar el registro.
+        """
+        return Property.coerce(prop)
+    
+    def candidate_ids(self, properties: List[Property]) -> List[str]:
+        """IDs a guardar en CandidateProperties (el lead no guarda copias de las propiedades)"""
+        return [p.get("PropertyId") for p in properties if p.get("PropertyId")]
+    
+    def resolve_candidates(self, candidates: List[Any]) -> List[Property]:
+        """
+        Propiedades de CandidateProperties resueltas contra el catálogo.
+        Acepta IDs o, en leads guardados antes, las propiedades completas.
+        """
+        if not candidates:
+            return []
+        
+        from services.catalog import get_catalog
+        catalog = get_catalog()
+        
+        resolved = []
+        for candidate in candidates:
+            property_id = candidate if isinstance(candidate, str) else candidate.get("PropertyId")
+            prop = catalog.get(property_id) if property_id else None
+            if prop is None and not isinstance(candidate, str):
+                prop = candidate
+            if prop is not None:
+                resolved.append(self._format_property(prop))
+        return resolved
     
     def _get_missing_criteria(self, criteria: Dict[str, Any]) -> str:
         """Genera sugerencia de criterios faltantes"""
@@ -286,7 +284,7 @@ class PropertySearchService:
         
         return ""
     
-    def format_properties_list(self, properties: List[Dict[str, Any]], max_items: int = 3) -> str:
+    def format_properties_list(self, properties: List[Property], max_items: int = 3) -> str:
         """
         Formatea una lista de propiedades para mostrar al usuario.
         Solo se usa cuando el usuario pide explícitamente ver opciones.
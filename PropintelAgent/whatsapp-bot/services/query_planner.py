@@ -0,0 +1,146 @@
+# services/query_planner.py
+"""
+Planificador de búsquedas de propiedades sobre DynamoDB.
+
+Índices de la tabla Properties (scripts/setup-aws.sh del panel):
+- GSI_StatusNeighborhood: PK StatusNeighborhood ("ACTIVE#Palermo"), SK PriceKey
+- GSI_StatusPrice:        PK Status,                            SK PriceKey
+
+Si se conoce el barrio o un precio máximo se usa `query` sobre el GSI que
+corresponda (el costo depende del tamaño del resultado, no de la tabla);
+solo sin esos datos se cae al scan paralelo. Ambientes siempre va como filtro.
+
+PriceKey es Price o PRICE_UNKNOWN si la propiedad no tiene precio: así las
+propiedades sin precio siguen en los índices (al final del orden por precio) y
+quedan afuera solo de las búsquedas con precio máximo, igual que en el catálogo.
+StatusNeighborhood y PriceKey se escriben con cada alta/edición del panel; las
+propiedades previas se completan con backfill_property_indexes.py.
+
+Los índices solo se usan con PROPERTY_SEARCH_BACKEND=dynamo (una vez creados
+y completados); si no, se mantiene el scan filtrado.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from boto3.dynamodb.conditions import Key, Attr
+
+from config import PROPERTY_SEARCH_BACKEND
+from services.scan import paginate, parallel_scan
+
+GSI_STATUS_NEIGHBORHOOD = "GSI_StatusNeighborhood"
+GSI_STATUS_PRICE = "GSI_StatusPrice"
+
+# Sort key de las propiedades sin precio: existen en el índice y van al final
+PRICE_UNKNOWN = 10**12
+
+
+@dataclass
+class QueryPlan:
+    """Operación elegida para una búsqueda y sus argumentos"""
+    operation: str  # "query" | "scan"
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def index_name(self) -> Optional[str]:
+        return self.kwargs.get("IndexName")
+
+    def describe(self) -> str:
+        if self.operation == "query":
+            return f"query {self.index_name}"
+        return "parallel scan"
+
+
+def index_attributes(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Atributos derivados que alimentan los GSI (se escriben junto con la propiedad)"""
+    attrs = {}
+    if item.get("Status") and item.get("Neighborhood"):
+        attrs["StatusNeighborhood"] = f"{item['Status']}#{item['Neighborhood']}"
+    price = item.get("Price")
+    if isinstance(price, (int, float, Decimal)) and not isinstance(price, bool):
+        attrs["PriceKey"] = price
+    else:
+        attrs["PriceKey"] = PRICE_UNKNOWN
+    return attrs
+
+
+def plan_property_search(neighborhood: str | None = None, rooms: int | None = None,
+                         max_price: int | float | None = None, status: str = "ACTIVE") -> QueryPlan:
+    """Elige query sobre GSI o scan según los criterios conocidos"""
+    filter_expr = Attr("Rooms").eq(rooms) if rooms else None
+
+    if neighborhood or max_price:
+        if neighborhood:
+            key_expr = Key("StatusNeighborhood").eq(f"{status}#{neighborhood}")
+            index_name = GSI_STATUS_NEIGHBORHOOD
+        else:
+            key_expr = Key("Status").eq(status)
+            index_name = GSI_STATUS_PRICE
+        if max_price:
+            key_expr = key_expr & Key("PriceKey").lte(max_price)
+
+        kwargs = {"IndexName": index_name, "KeyConditionExpression": key_expr}
+        if filter_expr is not None:
+            kwargs["FilterExpression"] = filter_expr
+        return QueryPlan("query", kwargs)
+
+    scan_filter = Attr("Status").eq(status)
+    if filter_expr is not None:
+        scan_filter = scan_filter & filter_expr
+    return QueryPlan("scan", {"FilterExpression": scan_filter})
+
+
+def plan_property_listing(neighborhood: str | None = None, status: str = "ACTIVE",
+                          use_indexes: bool | None = None) -> QueryPlan:
+    """
+    Listado paginado del panel. Con los índices, una query sin filtro (por barrio
+    o por estado, ordenada por precio), así cada página lee solo los items que
+    devuelve; sin ellos, el scan filtrado por estado y barrio de antes.
+    """
+    if use_indexes is None:
+        use_indexes = PROPERTY_SEARCH_BACKEND == "dynamo"
+    if not use_indexes:
+        scan_filter = Attr("Status").eq(status)
+        if neighborhood:
+            scan_filter = scan_filter & Attr("Neighborhood").eq(neighborhood)
+        return QueryPlan("scan", {"FilterExpression": scan_filter})
+
+    if neighborhood:
+        key_expr = Key("StatusNeighborhood").eq(f"{status}#{neighborhood}")
+        index_name = GSI_STATUS_NEIGHBORHOOD
+    else:
+        key_expr = Key("Status").eq(status)
+        index_name = GSI_STATUS_PRICE
+    return QueryPlan("query", {"IndexName": index_name, "KeyConditionExpression": key_expr})
+
+
+def execute_plan(plan: QueryPlan, t_props=None, limit: int | None = None) -> List[Dict[str, Any]]:
+    """
+    Ejecuta el plan siguiendo la paginación hasta juntar `limit` items.
+    `t_props` debe deserializar (FastTable); por defecto services.dynamo.fast_props.
+    """
+    if t_props is None:
+        from services.dynamo import fast_props as t_props
+
+    if plan.operation == "query":
+        items = paginate(t_props.query, max_items=limit, **plan.kwargs)
+    else:
+        items = parallel_scan(t_props, max_items=limit, **plan.kwargs)
+    return list(items)
+
+
+def find_properties(neighborhood: str | None = None, rooms: int | None = None,
+                    max_price: int | float | None = None, limit: int | None = None) -> List[Dict[str, Any]]:
+    """
+    Búsqueda de propiedades ACTIVE por barrio, ambientes y precio máximo.
+    Con PROPERTY_SEARCH_BACKEND=catalog se resuelve en memoria; con "dynamo"
+    se planifica contra los GSI.
+    """
+    if PROPERTY_SEARCH_BACKEND == "catalog":
+        from services.catalog import get_catalog
+        return get_catalog().filter(neighborhood=neighborhood, rooms=rooms, max_price=max_price, limit=limit)
+
+    plan = plan_property_search(neighborhood=neighborhood, rooms=rooms, max_price=max_price)
+    print(f"[PLANNER] {plan.describe()} (barrio={neighborhood}, ambientes={rooms}, precio_max={max_price})")
+    return execute_plan(plan, limit=limit)
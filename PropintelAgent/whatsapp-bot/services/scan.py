@@ -0,0 +1,131 @@
+# services/scan.py
+"""
+Helpers de lectura paginada para DynamoDB.
+Siguen LastEvaluatedKey (un scan/query devuelve como máximo 1 MB por página),
+pueden repartir un scan en N segmentos paralelos y cortan temprano cuando se
+agota el presupuesto de items o de tiempo.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from config import SCAN_SEGMENTS
+
+_DONE = object()
+
+
+def paginate(operation: Callable[..., Dict[str, Any]], max_items: Optional[int] = None,
+             max_seconds: Optional[float] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Ejecuta table.scan / table.query página por página y va entregando los items.
+
+    Args:
+        operation: t_props.scan, t_msgs.query, etc.
+        max_items: corta al alcanzar esta cantidad de items
+        max_seconds: corta al superar este tiempo (se chequea entre páginas)
+        **kwargs: argumentos de la operación (FilterExpression, Segment, ...)
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    yielded = 0
+    while True:
+        resp = operation(**kwargs)
+        for item in resp.get("Items", []):
+            yield item
+            yielded += 1
+            if max_items and yielded >= max_items:
+                return
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key or (deadline and time.monotonic() > deadline):
+            return
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+def fetch_page(operation: Callable[..., Dict[str, Any]], limit: int,
+               start_key: Optional[Dict[str, Any]] = None,
+               **kwargs) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Una página de a lo sumo `limit` items para paginar con cursor.
+    Pide Limit=faltantes, así DynamoDB nunca lee más allá del último item
+    devuelto y el LastEvaluatedKey retornado continúa exactamente desde ahí.
+    Solo repite la llamada si un FilterExpression descartó items.
+
+    Returns:
+        (items, last_key) — last_key es None cuando no quedan más items
+    """
+    items: List[Dict[str, Any]] = []
+    last_key = start_key
+    while True:
+        call_kwargs = dict(kwargs, Limit=limit - len(items))
+        if last_key:
+            call_kwargs["ExclusiveStartKey"] = last_key
+        resp = operation(**call_kwargs)
+        items.extend(resp.get("Items", []))
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key or len(items) >= limit:
+            return items, last_key
+
+
+def parallel_scan(table, segments: int = SCAN_SEGMENTS, max_items: Optional[int] = None,
+                  max_seconds: Optional[float] = None, **scan_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Scan completo repartido en `segments` workers (Segment/TotalSegments).
+    Los items se entregan a medida que llegan las páginas de cada segmento,
+    sin orden garantizado entre segmentos.
+    """
+    if segments <= 1:
+        yield from paginate(table.scan, max_items=max_items, max_seconds=max_seconds, **scan_kwargs)
+        return
+
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    # Cola acotada: los workers no leen muy por delante de lo que se consume
+    pages: "queue.Queue" = queue.Queue(maxsize=segments)
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def worker(segment: int):
+        kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=segments)
+        try:
+            while not stop.is_set():
+                resp = table.scan(**kwargs)
+                put(resp.get("Items", []))
+                last_key = resp.get("LastEvaluatedKey")
+                if not last_key or (deadline and time.monotonic() > deadline):
+                    break
+                kwargs["ExclusiveStartKey"] = last_key
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        for segment in range(segments):
+            executor.submit(worker, segment)
+
+        pending = segments
+        yielded = 0
+        try:
+            while pending:
+                page = pages.get()
+                if page is _DONE:
+                    pending -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+                for item in page:
+                    yield item
+                    yielded += 1
+                    if max_items and yielded >= max_items:
+                        return
+        finally:
+            # Early exit (presupuesto, error o generador cerrado): frenar al resto de los segmentos
+            stop.set()
@@ -0,0 +1,156 @@
+# services/slot_rules.py
+"""
+Extracción de datos del mensaje por reglas, con una confianza por dato.
+
+Las reglas resuelven la mayoría de los mensajes ("2 ambientes en Palermo",
+"hasta 150k"); el refinamiento con OpenAI solo vale la pena cuando un dato
+requerido falta pero el mensaje da señales de contenerlo, o cuando la regla
+que lo encontró es ambigua (p. ej. "1.5 m" puede ser plata o metros).
+`refinement_reason` decide eso y deja registrado el motivo.
+"""
+
+import re
+from typing import Dict, Any, Optional, Tuple
+
+from config import SLOT_CONFIDENCE_THRESHOLD
+from services.keywords import scan, KeywordMatches
+
+# Datos que el flujo de precalificación necesita del lead
+REQUIRED_SLOTS = ["intent", "rooms", "budget", "neighborhood"]
+
+INTENT_RULES = [
+    # (categoría de services.keywords, intent, confianza)
+    ("intent.alquiler", "alquiler", 0.95),
+    ("intent.alquiler_weak", "alquiler", 0.6),  # "rent*" también es "rentable"
+    ("intent.venta", "venta", 0.9),
+    ("intent.venta_weak", "venta", 0.6),  # "vend*": "me vendieron", "vendedor"...
+]
+
+ROOM_RULES = [
+    (r"(\d+)\s*amb", 0.95),
+    (r"(\d+)\s*habitac", 0.8),  # habitaciones ≠ ambientes
+    (r"(\d+)\s*dormitor", 0.8),
+    (r"(\d+)\s*cuarto", 0.75),
+    (r"monoambiente", 0.95),
+    (r"mono", 0.5),  # "monotributo", "monoblock"...
+]
+
+BUDGET_RULES = [
+    (r"(\d+)k", 1000, 0.9),  # 150k
+    (r"(\d+\.?\d*)\s*m", 1000000, 0.4),  # 1.5M (o "50 m2", "3 mil")
+    (r"\$\s*(\d{1,3}(?:[.,]\d{3})*)", 1, 0.9),  # $150,000
+    (r"(\d{1,3}(?:[.,]\d{3})*)\s*peso", 1, 0.85),  # 150,000 pesos
+    (r"presupuesto.*?(\d{1,3}(?:[.,]\d{3})*)", 1, 0.8),  # presupuesto 150000
+]
+
+# Señales de que el mensaje habla de un dato aunque las reglas no lo hayan encontrado
+# (se buscan sobre el texto original: "en Saavedra" cuenta, "en qué horario" no)
+SLOT_HINTS = {
+    "intent": re.compile(r"(?i:busc|quier|necesit|invert|mudar|depto|departamento|casa|\bph\b|inmueble)"),
+    "rooms": re.compile(r"\d|(?i:\b(un[oa]?|dos|tres|cuatro|cinco)\b|ambiente|habitaci|dormi|cuarto|pieza)"),
+    "budget": re.compile(r"\d|(?i:\bmil\b|mill[oó]n|palo|usd|d[oó]lar|u\$s|presupuesto|precio|pagar|cuota)"),
+    "neighborhood": re.compile(r"(?i:\b(zona|barrio|cerca)\b)|\b[Ee]n\s+[A-ZÁÉÍÓÚÑ]\w+"),
+}
+
+
+def _match_intent(matches: KeywordMatches) -> Tuple[Optional[str], float]:
+    found = {}
+    for category, intent, confidence in INTENT_RULES:
+        if matches.has(category):
+            found[intent] = max(found.get(intent, 0.0), confidence)
+    if not found:
+        return None, 0.0
+    intent = max(found, key=found.get)
+    # "vendo mi depto para alquilar otro": las dos intenciones en el mismo mensaje
+    if len(found) > 1:
+        return intent, 0.5
+    return intent, found[intent]
+
+
+def _match_rooms(text_lower: str) -> Tuple[Optional[int], float]:
+    for pattern, confidence in ROOM_RULES:
+        match = re.search(pattern, text_lower)
+        if match:
+            if pattern in ["monoambiente", "mono"]:
+                return 1, confidence
+            try:
+                return int(match.group(1)), confidence
+            except (IndexError, ValueError):
+                pass
+    return None, 0.0
+
+
+def _match_budget(text_lower: str) -> Tuple[Optional[int], float]:
+    for pattern, multiplier, confidence in BUDGET_RULES:
+        match = re.search(pattern, text_lower)
+        if match:
+            try:
+                amount_str = match.group(1).replace(",", "").replace(".", "")
+                if multiplier == 1000000:
+                    # 1.5M: el punto es decimal, no separador de miles
+                    return int(float(match.group(1)) * multiplier), confidence
+                return int(float(amount_str) * multiplier), confidence
+            except ValueError:
+                pass
+    return None, 0.0
+
+
+def _match_neighborhood(matches: KeywordMatches) -> Tuple[Optional[str], float]:
+    # El registro busca sin acentos: "Núñez", "nuñez" y "nunez" son el mismo barrio
+    barrios = matches.values("barrio")
+    if not barrios:
+        return None, 0.0
+    # Más de un barrio ("vivo en Flores, busco en Palermo"): no se sabe cuál quiere
+    return barrios[0], 0.9 if len(barrios) == 1 else 0.5
+
+
+def extract_slots_by_rules(text: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Retorna (slots, confianza por slot). Un slot no encontrado tiene confianza 0.
+    """
+    text_lower = text.lower()
+    matches = scan(text)
+    result = {
+        "intent": None,
+        "rooms": None,
+        "budget": None,
+        "neighborhood": None,
+        "visit_intent": False,
+        "missing": []
+    }
+    confidence = {}
+
+    result["intent"], confidence["intent"] = _match_intent(matches)
+    result["rooms"], confidence["rooms"] = _match_rooms(text_lower)
+    result["budget"], confidence["budget"] = _match_budget(text_lower)
+    result["neighborhood"], confidence["neighborhood"] = _match_neighborhood(matches)
+
+    result["visit_intent"] = matches.has("visit")
+    confidence["visit_intent"] = 0.7 if result["visit_intent"] else 0.0
+
+    result["missing"] = [key for key in REQUIRED_SLOTS if result[key] is None]
+    return result, confidence
+
+
+def refinement_reason(text: str, slots: Dict[str, Any], confidence: Dict[str, float],
+                      known: Optional[Dict[str, Any]] = None,
+                      threshold: float = SLOT_CONFIDENCE_THRESHOLD) -> Tuple[bool, str]:
+    """
+    Decide si hace falta refinar con OpenAI. `known` son los datos que el lead ya
+    tiene (no se consideran faltantes). Retorna (llamar, motivo):
+    - "ambiguous:<slot>"        una regla encontró el dato con baja confianza
+    - "missing_with_hint:<slot>" falta un dato requerido y el mensaje parece mencionarlo
+    - "rules_complete"          las reglas encontraron todo con confianza
+    - "no_hints"                faltan datos pero el mensaje no habla de ellos ("hola", "dale")
+    """
+    known = known or {}
+    for key in REQUIRED_SLOTS:
+        if slots.get(key) is not None and confidence.get(key, 0.0) < threshold:
+            return True, f"ambiguous:{key}"
+    missing = [key for key in REQUIRED_SLOTS if slots.get(key) is None and not known.get(key)]
+    for key in missing:
+        if SLOT_HINTS[key].search(text):
+            return True, f"missing_with_hint:{key}"
+    if not missing:
+        return False, "rules_complete"
+    return False, "no_hints"
@@ -10,6 +10,7 @@ from models.lead_stages import (
     get_next_stage, should_transition_to_qualification
 )
 from services.dynamo import update_lead_stage_and_status, update_qualification_data
+from services.keywords import scan
 
 class StageManager:
     """Maneja las transiciones de etapas del lead"""
@@ -30,34 +31,27 @@ class StageManager:
         except Exception as _:
             pass
 
-        # Fallback basado en reglas simples
-        message_lower = message.lower()
+        # Fallback basado en reglas simples (una pasada del registro de services.keywords)
+        matches = scan(message)
         updates: Dict[str, Any] = {}
 
-        buyer_keywords = ["para mi", "para mí", "es mío", "para mia", "mio", "mía", "soy yo", "es para mi"]
-        if any(keyword in message_lower for keyword in buyer_keywords):
+        if matches.has("qual.buyer"):
             updates["buyer_confirmed"] = True
             updates["decision_maker"] = True
 
-        mudanza_keywords = ["mudanza", "mudarme", "vivir", "casa nueva"]
-        inversion_keywords = ["inversión", "invertir", "inversion", "inversor", "renta", "alquiler"]
-        if any(keyword in message_lower for keyword in mudanza_keywords) or any(keyword in message_lower for keyword in inversion_keywords):
+        if matches.has("qual.motive"):
             updates["motive_confirmed"] = True
 
-        financing_keywords = ["ahorro", "efectivo", "tengo", "crédito", "banco", "preaprobado", "hipotecario"]
-        if any(keyword in message_lower for keyword in financing_keywords):
+        if matches.has("qual.financing"):
             updates["financing_confirmed"] = True
 
-        sell_keywords = ["vender", "vendo", "tengo que vender", "necesito vender"]
-        if any(keyword in message_lower for keyword in sell_keywords):
+        if matches.has("qual.sell"):
             updates["needs_to_sell"] = True
 
-        timeline_keywords = ["pronto", "rápido", "urgente", "ya", "este mes", "próximo mes"]
-        if any(keyword in message_lower for keyword in timeline_keywords):
+        if matches.has("qual.timeline"):
             updates["timeline_confirmed"] = True
 
-        ready_keywords = ["puedo avanzar", "si me gusta", "estoy listo", "podemos coordinar", "quiero comprar", "quiero alquilar", "me interesa", "vamos", "dale"]
-        if any(keyword in message_lower for keyword in ready_keywords):
+        if matches.has("qual.ready"):
             updates["ready_to_close"] = True
 
         return updates
@@ -66,16 +60,14 @@ class StageManager:
         """
         Verifica si el usuario está confirmando o rechazando una propiedad
         """
-        message_lower = message.lower()
+        matches = scan(message)
         
         # Confirmación positiva
-        positive_keywords = ["si", "sí", "si!", "correcto", "exacto", "esa es", "perfecto", "dale", "ok"]
-        if any(keyword in message_lower for keyword in positive_keywords):
+        if matches.has("confirm.yes"):
             return True
         
         # Confirmación negativa
-        negative_keywords = ["no", "no es", "otra", "diferente", "equivocada"]
-        if any(keyword in message_lower for keyword in negative_keywords):
+        if matches.has("confirm.no"):
             return False
         
         return None
@@ -155,8 +147,7 @@ class StageManager:
         # POST-CALIFICACIÓN → FINALIZADO
         elif current_stage == "POST_CALIFICACION":
             # Si se detecta fecha/hora para visita SOLO permitir si ya está calificado (status actual ya AGENDANDO_VISITA)
-            if any(word in message.lower() for word in ["mañana", "hoy", "lunes", "martes", "miércoles", 
-                                                       "jueves", "viernes", "sábado", "domingo", "hs", "am", "pm"]):
+            if scan(message).has("schedule"):
                 if current_status == "AGENDANDO_VISITA":
                     print("📅 Fecha detectada y lead calificado - continuar con agendamiento")
                     return False, current_stage, "AGENDANDO_VISITA"
@@ -168,24 +159,30 @@ class StageManager:
         return False, current_stage, current_status
     
     def process_stage_transition(self, lead_id: str, lead_data: Dict[str, Any], 
-                               message: str, conversation_history: list) -> Dict[str, Any]:
+                               message: str, conversation_history: list,
+                               qualification_updates: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Procesa una posible transición de etapa y actualiza el lead
         
+        Args:
+            qualification_updates: flags ya extraídos (ej: por el análisis de turno);
+                si es None se analizan acá
+        
         Returns:
             Updated lead data
         """
         # Analizar mensaje para datos de calificación
-        qualification_updates = self.analyze_message_for_qualification_data(message, conversation_history)
+        if qualification_updates is None:
+            qualification_updates = self.analyze_message_for_qualification_data(message, conversation_history)
         
         # Obtener datos de calificación actuales
         current_qual_data = lead_data.get("QualificationData", {})
         
         # Actualizar datos de calificación si hay cambios
         if qualification_updates:
-            update_qualification_data(lead_id, qualification_updates)
-            # Actualizar datos locales
-            current_qual_data.update(qualification_updates)
+            stored = update_qualification_data(lead_id, qualification_updates)
+            # Actualizar datos locales (con el mapa guardado si la escritura lo devolvió)
+            current_qual_data.update((stored or {}).get("QualificationData") or qualification_updates)
             lead_data["QualificationData"] = current_qual_data
         
         # Verificar si debe avanzar de etapa
@@ -205,8 +202,8 @@ class StageManager:
             # Si avanzó a CALIFICACION, marcar property_confirmed automáticamente
             if new_stage == "CALIFICACION" and lead_data.get("PropertyId"):
                 qualification_updates = {"property_confirmed": True}
-                update_qualification_data(lead_id, qualification_updates)
-                current_qual_data.update(qualification_updates)
+                stored = update_qualification_data(lead_id, qualification_updates)
+                current_qual_data.update((stored or {}).get("QualificationData") or qualification_updates)
                 lead_data["QualificationData"] = current_qual_data
                 print("✅ Marcado property_confirmed=True al avanzar a CALIFICACION")
             
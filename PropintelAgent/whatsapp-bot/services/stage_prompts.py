@@ -2,8 +2,18 @@
 """
 Prompts específicos para cada etapa del proceso de conversión del lead.
 Cada prompt es más conciso y enfocado en el objetivo de su etapa.
+
+Los prompts se compilan una sola vez al importar el módulo y no llevan datos
+del lead: el texto del sistema es idéntico byte a byte para todos los leads de
+una etapa, así OpenAI reutiliza el prefijo cacheado del prompt. Los datos del
+lead (teléfono, presupuesto, propiedad, calificación) van en un mensaje final
+que arma build_lead_context.
 """
 
+from dataclasses import dataclass
+
+from services.tokens import count_tokens
+
 # Prompt base común a todas las etapas
 BASE_AGENT_PROMPT = """
 Sos Gonzalo, agente inmobiliario de Compromiso Inmobiliario en Argentina.
@@ -55,7 +65,7 @@ CALIFICACION_PROMPT = BASE_AGENT_PROMPT + """
 ETAPA ACTUAL: CALIFICACIÓN
 OBJETIVO: Hacer preguntas específicas para determinar si califica para una visita.
 
-PROPIEDAD YA CONFIRMADA: {property_title}
+PROPIEDAD YA CONFIRMADA: la indicada en DATOS DEL LEAD
 
 PREGUNTAS DE CALIFICACIÓN (hacer solo las que faltan):
 1. COMPRADOR: "Es para vos o para otra persona?" → Debe ser para quien decide
@@ -64,7 +74,7 @@ PREGUNTAS DE CALIFICACIÓN (hacer solo las que faltan):
 4. TIMELINE: "En que plazo pensas mudarte/comprar?" → Urgencia real
 5. LISTO PARA CERRAR: "Si la propiedad te gusta, estas en condiciones de avanzar?"
 
-DATOS FALTANTES: {missing_data}
+DATOS FALTANTES: los indicados en DATOS DEL LEAD
 
 INSTRUCCIONES:
 - Haz UNA pregunta por vez
@@ -90,9 +100,9 @@ NO CALIFICA SI:
 POST_CALIFICACION_PROMPT = BASE_AGENT_PROMPT + """
 
 ETAPA ACTUAL: POST-CALIFICACIÓN
-RESULTADO DE CALIFICACIÓN: {qualification_result}
+RESULTADO DE CALIFICACIÓN: el indicado en DATOS DEL LEAD
 
-PROPIEDAD CONFIRMADA: {property_title}
+PROPIEDAD CONFIRMADA: la indicada en DATOS DEL LEAD
 
 OBJETIVO PRINCIPAL: Agendar visita si calificó, pero también responder dudas sobre la propiedad.
 
@@ -128,90 +138,135 @@ RESPUESTAS SIMPLES:
 MANTENTE DISPONIBLE pero no inicies nuevos procesos de calificación.
 """
 
-def get_stage_prompt(stage: str, **context) -> str:
+# Foco de cada etapa (va en el prompt compilado, después del prompt de la etapa)
+STAGE_FOCUS = {
+    "PRECALIFICACION": """
+FOCO: Conversación natural y contextual.
+- Si es el PRIMER mensaje: presentate y pregunta "En que te puedo ayudar?"
+- Si YA conversaron: continúa naturalmente sin presentarte de nuevo
+- Si mencionan propiedad/barrio/tipo/opciones/visita: hablá del tema con una sola pregunta por vez
+- Si NO mencionan nada específico: responde su pregunta directamente
+EVITAR: Preguntas de calificación, agendamiento, presentaciones repetidas. No listar propiedades salvo que te lo pidan explícitamente.
+""",
+    "CALIFICACION": """
+FOCO: Completar datos de calificación (ver DATOS DE CALIFICACIÓN en DATOS DEL LEAD).
+""",
+    "POST_CALIFICACION": """
+FOCO: Agendar visita o informar descalificación.
+CONTEXTO MÍNIMO: Solo últimos 3 mensajes.
+""",
+    "FINALIZADO": "",
+}
+
+STAGE_PROMPTS = {
+    "PRECALIFICACION": PRECALIFICACION_PROMPT,
+    "CALIFICACION": CALIFICACION_PROMPT,
+    "POST_CALIFICACION": POST_CALIFICACION_PROMPT,
+    "FINALIZADO": FINALIZADO_PROMPT,
+}
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """Prompt de sistema de una etapa, fijo para todos los leads"""
+    stage: str
+    text: str
+    tokens: int
+
+
+def _compile(stage: str) -> CompiledPrompt:
+    text = STAGE_PROMPTS[stage] + STAGE_FOCUS[stage]
+    return CompiledPrompt(stage=stage, text=text, tokens=count_tokens(text))
+
+
+COMPILED_PROMPTS = {stage: _compile(stage) for stage in STAGE_PROMPTS}
+
+
+def get_stage_prompt(stage: str) -> CompiledPrompt:
+    """
+    Retorna el prompt compilado para la etapa actual del lead
+    (fallback al de precalificación para etapas desconocidas)
     """
-    Retorna el prompt apropiado para la etapa actual del lead
+    return COMPILED_PROMPTS.get(stage, COMPILED_PROMPTS["PRECALIFICACION"])
+
+
+# Respuestas por reglas cuando OpenAI no está disponible (mismas frases que los prompts)
+QUALIFICATION_QUESTIONS = {
+    "propiedad_confirmada": "Me confirmas cual es la propiedad que te interesa?",
+    "comprador_confirmado": "Es para vos o para otra persona?",
+    "motivo": "Es para mudanza o inversión?",
+    "financiacion": "Como pensas financiarlo? Ahorro, crédito o mixto?",
+    "listo_para_cerrar": "Si la propiedad te gusta, estas en condiciones de avanzar?",
+}
+
+FALLBACK_REPLIES = {
+    "CALIFICACION": "Perfecto, ya tengo lo que necesito. En breve te escribo para seguir.",
+    "POST_CALIFICACION": "Perfecto! Que día y horario te conviene para la visita?",
+    "POST_CALIFICACION_NO_CALIFICADO": "Por el momento no podemos coordinar una visita, pero te sigo ayudando con consultas sobre propiedades.",
+    "FINALIZADO": "Ya tenés la visita agendada. Te confirmamos por WhatsApp.",
+}
+
+
+def fallback_stage_reply(stage: str, lead_data: dict) -> str:
+    """Siguiente pregunta de la etapa sin usar OpenAI"""
+    from models.lead_stages import LeadQualificationData
+    from services.stage_manager import stage_manager
+    
+    qual_data = lead_data.get("QualificationData", {}) or {}
+    if stage == "CALIFICACION":
+        for missing in stage_manager.get_missing_qualification_data(qual_data):
+            if missing in QUALIFICATION_QUESTIONS:
+                return QUALIFICATION_QUESTIONS[missing]
+        return FALLBACK_REPLIES["CALIFICACION"]
+    if stage == "POST_CALIFICACION":
+        if LeadQualificationData(**qual_data).is_qualified():
+            return FALLBACK_REPLIES["POST_CALIFICACION"]
+        return FALLBACK_REPLIES["POST_CALIFICACION_NO_CALIFICADO"]
+    return FALLBACK_REPLIES["FINALIZADO"]
+
+
+def build_lead_context(stage: str, lead_data: dict, **context) -> str:
+    """
+    Mensaje final con los datos del lead y de su etapa
     
     Args:
         stage: Etapa actual (PRECALIFICACION, CALIFICACION, POST_CALIFICACION, FINALIZADO)
-        **context: Contexto específico como property_title, missing_data, etc.
-    
-    Returns:
-        Prompt formateado para la etapa
+        lead_data: Item del lead
+        **context: Contexto específico como property_title, missing_data, qualification_result
     """
+    budget = lead_data.get('Budget')
+    lines = [
+        "DATOS DEL LEAD:",
+        f"- Teléfono: {lead_data.get('LeadId', 'No disponible')}",
+        f"- Barrio: {lead_data.get('Neighborhood', 'No especificado')}",
+        f"- Ambientes: {lead_data.get('Rooms', 'No especificado')}",
+        f"- Presupuesto: {f'${budget:,}' if budget else 'No especificado'}",
+        f"- Intención: {lead_data.get('Intent', 'No especificado')}",
+        "",
+        f"ETAPA ACTUAL: {stage}",
+    ]
     
-    if stage == "PRECALIFICACION":
-        return PRECALIFICACION_PROMPT
+    summary = lead_data.get("ConversationSummary")
+    if summary:
+        lines += ["", "RESUMEN DE LA CONVERSACIÓN ANTERIOR:", summary, ""]
     
-    elif stage == "CALIFICACION":
-        property_title = context.get("property_title", "Propiedad no identificada")
+    if stage == "CALIFICACION":
         missing_data = context.get("missing_data", [])
-        missing_str = ", ".join(missing_data) if missing_data else "Ninguno"
-        
-        return CALIFICACION_PROMPT.format(
-            property_title=property_title,
-            missing_data=missing_str
-        )
-    
+        qual_data = lead_data.get("QualificationData", {}) or {}
+        lines += [
+            f"PROPIEDAD YA CONFIRMADA: {context.get('property_title', 'Propiedad no identificada')}",
+            f"DATOS FALTANTES: {', '.join(missing_data) if missing_data else 'Ninguno'}",
+            "DATOS DE CALIFICACIÓN:",
+            f"- Propiedad confirmada: {qual_data.get('property_confirmed', False)}",
+            f"- Comprador confirmado: {qual_data.get('buyer_confirmed', False)}",
+            f"- Motivo confirmado: {qual_data.get('motive_confirmed', False)}",
+            f"- Financiación confirmada: {qual_data.get('financing_confirmed', False)}",
+            f"- Listo para cerrar: {qual_data.get('ready_to_close', False)}",
+        ]
     elif stage == "POST_CALIFICACION":
-        property_title = context.get("property_title", "Propiedad confirmada")
-        qualification_result = context.get("qualification_result", "CALIFICADO")
-        
-        return POST_CALIFICACION_PROMPT.format(
-            property_title=property_title,
-            qualification_result=qualification_result
-        )
-    
-    elif stage == "FINALIZADO":
-        return FINALIZADO_PROMPT
-    
-    else:
-        # Fallback al prompt de precalificación
-        return PRECALIFICACION_PROMPT
-
-def get_stage_system_instructions(stage: str, lead_data: dict) -> str:
-    """
-    Retorna instrucciones específicas del sistema para la etapa actual
-    """
+        lines += [
+            f"RESULTADO DE CALIFICACIÓN: {context.get('qualification_result', 'CALIFICADO')}",
+            f"PROPIEDAD CONFIRMADA: {context.get('property_title', 'Propiedad confirmada')}",
+        ]
     
-    base_instructions = f"""
-DATOS DEL LEAD:
-- Teléfono: {lead_data.get('LeadId', 'No disponible')}
-- Barrio: {lead_data.get('Neighborhood', 'No especificado')}
-- Ambientes: {lead_data.get('Rooms', 'No especificado')}
-- Presupuesto: {f"${lead_data.get('Budget'):,}" if lead_data.get('Budget') else 'No especificado'}
-- Intención: {lead_data.get('Intent', 'No especificado')}
-
-ETAPA ACTUAL: {stage}
-"""
-
-    if stage == "PRECALIFICACION":
-        return base_instructions + """
-FOCO: Conversación natural y contextual.
-- Si es el PRIMER mensaje: presentate y pregunta "En que te puedo ayudar?"
-- Si YA conversaron: continúa naturalmente sin presentarte de nuevo
-- Si mencionan propiedad/barrio/tipo/opciones/visita: hablá del tema con una sola pregunta por vez
-- Si NO mencionan nada específico: responde su pregunta directamente
-EVITAR: Preguntas de calificación, agendamiento, presentaciones repetidas. No listar propiedades salvo que te lo pidan explícitamente.
-"""
-
-    elif stage == "CALIFICACION":
-        qual_data = lead_data.get("QualificationData", {})
-        return base_instructions + f"""
-FOCO: Completar datos de calificación.
-DATOS DE CALIFICACIÓN:
-- Propiedad confirmada: {qual_data.get('property_confirmed', False)}
-- Comprador confirmado: {qual_data.get('buyer_confirmed', False)}
-- Motivo confirmado: {qual_data.get('motive_confirmed', False)}
-- Financiación confirmada: {qual_data.get('financing_confirmed', False)}
-- Listo para cerrar: {qual_data.get('ready_to_close', False)}
-"""
-
-    elif stage == "POST_CALIFICACION":
-        return base_instructions + """
-FOCO: Agendar visita o informar descalificación.
-CONTEXTO MÍNIMO: Solo últimos 3 mensajes.
-"""
-
-    else:
-        return base_instructions
\ No newline at end of file
+    return "\n".join(lines)
@@ -0,0 +1,147 @@
+# services/summary.py
+"""
+Resumen incremental de la conversación, guardado en el lead.
+
+El lead guarda ConversationSummary (hechos de la charla hasta SummarizedUntil) y
+el historial que se lee para el prompt son solo los mensajes posteriores a esa
+marca. Cuando ese historial crece (cada SUMMARY_EVERY_N_TURNS turnos o al pasar
+el presupuesto de tokens de la etapa), los mensajes viejos se incorporan al
+resumen y se corre la marca: el prompt queda de tamaño acotado sin importar lo
+larga que sea la conversación, y los datos del principio no se pierden.
+
+La actualización es una llamada a la IA (hasta LLM_TIMEOUT_SUMMARY), así que no
+corre dentro del turno: el turno solo decide si hace falta (summary_reason, sin
+IA) y la lanza fuera de la respuesta con schedule_summary_update.
+"""
+
+import json
+import threading
+from typing import Dict, Any, List, Optional
+
+from config import (
+    CONTEXT_FETCH_LIMIT, CONTEXT_MAX_MESSAGE_TOKENS,
+    SUMMARY_EVERY_N_TURNS, SUMMARY_KEEP_RECENT, SUMMARY_MAX_TOKENS, SUMMARY_ASYNC_FUNCTION,
+)
+from services.tokens import count_tokens, truncate_to_tokens, TOKENS_PER_MESSAGE
+
+SUMMARY_PROMPT = """Mantenés el resumen de una conversación de WhatsApp entre un agente inmobiliario y un cliente.
+Te paso el resumen anterior (puede estar vacío) y los mensajes nuevos. Devolvé el resumen actualizado:
+- Solo hechos concretos: qué busca (operación, zona, ambientes, presupuesto), propiedad que le interesa,
+  datos de calificación (para quién es, motivo, financiación, plazos), fechas propuestas, objeciones y preferencias.
+- Conservá los datos del resumen anterior salvo que el cliente los haya cambiado.
+- Español, frases cortas, máximo 120 palabras. Sin saludos ni opiniones.
+Devolvé SOLO el texto del resumen."""
+
+
+def summary_reason(lead_data: Dict[str, Any], history: List[Dict[str, str]]) -> Optional[str]:
+    """Motivo para actualizar el resumen ("turnos" / "presupuesto") o None si no hace falta"""
+    from models.lead_stages import get_stage_token_budget, LeadStage
+
+    if len(history or []) <= SUMMARY_KEEP_RECENT:
+        return None
+    if sum(1 for m in history if m.get("role") == "user") >= SUMMARY_EVERY_N_TURNS:
+        return "turnos"
+    try:
+        budget = get_stage_token_budget(LeadStage(lead_data.get("Stage", "PRECALIFICACION")))
+    except ValueError:
+        budget = 800
+    if sum(TOKENS_PER_MESSAGE + count_tokens(m.get("content")) for m in history) > budget:
+        return "presupuesto"
+    return None
+
+
+def update_summary(lead_id: str, lead_data: Dict[str, Any]) -> Optional[str]:
+    """
+    Incorpora al resumen los mensajes sin resumir (salvo los últimos SUMMARY_KEEP_RECENT)
+    y guarda ConversationSummary + SummarizedUntil en el lead. Retorna el resumen nuevo.
+    """
+    from services.dynamo import query_messages, update_lead
+    from services.llm import llm_available
+    from services.model_routing import routed_completion
+
+    if not llm_available():
+        return None
+
+    raw = query_messages(lead_id, CONTEXT_FETCH_LIMIT, since=lead_data.get("SummarizedUntil"))
+    raw.sort(key=lambda x: x.get("Timestamp", "0"))
+    to_fold = raw[:-SUMMARY_KEEP_RECENT] if SUMMARY_KEEP_RECENT else raw
+    if not to_fold:
+        return None
+
+    transcript = "\n".join(
+        f"{'Cliente' if m.get('Direction', 'in') == 'in' else 'Agente'}: "
+        f"{truncate_to_tokens(m.get('Text', ''), CONTEXT_MAX_MESSAGE_TOKENS)}"
+        for m in to_fold if (m.get("Text") or "").strip()
+    )
+    previous = lead_data.get("ConversationSummary") or "(vacío)"
+    messages = [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"RESUMEN ANTERIOR:\n{previous}\n\nMENSAJES NUEVOS:\n{transcript}"},
+    ]
+    resp = routed_completion("summary", lead_data.get("Stage"), messages=messages)
+    summary = (resp.choices[0].message.content or "").strip() if resp.choices else ""
+    if not summary:
+        return None
+
+    fields = {
+        "ConversationSummary": truncate_to_tokens(summary, SUMMARY_MAX_TOKENS),
+        "SummarizedUntil": to_fold[-1]["Timestamp"],
+    }
+    update_lead(lead_id, fields)
+    for key, value in fields.items():
+        lead_data[key] = value
+    return fields["ConversationSummary"]
+
+
+_lambda_client = None
+
+
+def _get_lambda_client():
+    global _lambda_client
+    if _lambda_client is None:
+        import boto3
+        _lambda_client = boto3.client("lambda")
+    return _lambda_client
+
+
+def schedule_summary_update(lead_id: str, lead_data: Dict[str, Any], history: List[Dict[str, str]]):
+    """
+    Si el resumen necesita actualizarse, lo lanza sin esperar el resultado. En Lambda
+    invoca la misma función en forma asíncrona ({"action": "update_summary"}), porque
+    el proceso se congela al devolver la respuesta; localmente usa un hilo. Si no se
+    puede lanzar, queda para un turno siguiente: summary_reason lo vuelve a pedir.
+    """
+    reason = summary_reason(lead_data, history)
+    if not reason:
+        return
+    if not SUMMARY_ASYNC_FUNCTION:
+        threading.Thread(target=run_summary_update, args=(lead_id, reason), daemon=True).start()
+        return
+    try:
+        _get_lambda_client().invoke(
+            FunctionName=SUMMARY_ASYNC_FUNCTION,
+            InvocationType="Event",
+            Payload=json.dumps({"action": "update_summary", "lead_id": lead_id, "reason": reason}).encode(),
+        )
+        print(f"🧾 [SUMMARY] Actualización lanzada ({reason})")
+    except Exception as e:
+        print(f"[SUMMARY][ERROR] No se pudo lanzar la actualización: {e}")
+
+
+def run_summary_update(lead_id: str, reason: str = ""):
+    """
+    Actualiza el resumen fuera del turno (invocación asíncrona o hilo). Relee el lead
+    y escribe sin sesión: si un turno del mismo lead está abierto, su escritura ve la
+    versión nueva y reintenta sin pisar el resumen.
+    """
+    from services.dynamo import get_lead
+
+    try:
+        lead_data = get_lead(lead_id)
+        if not lead_data:
+            return
+        summary = update_summary(lead_id, lead_data)
+        if summary:
+            print(f"🧾 [SUMMARY] Resumen actualizado ({reason}): {count_tokens(summary)} tokens")
+    except Exception as e:
+        print(f"[SUMMARY][ERROR] {e}")
@@ -0,0 +1,122 @@
+# services/text_index.py
+"""
+Índice invertido de tokens sobre las propiedades del catálogo.
+Normaliza acentos ("Núñez" → "nunez"), guarda postings por token y rankea
+con BM25 para resolver referencias como "el depto de la calle Gorriti en Palermo".
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from typing import Dict, Any, List, Iterable, Tuple
+
+# Campos indexados y su peso en la frecuencia de términos
+INDEXED_FIELDS = {"Title": 1.0, "Neighborhood": 1.0, "Address": 1.5, "Street": 1.5}
+
+STOPWORDS = {
+    "el", "la", "los", "las", "lo", "un", "una", "unos", "unas", "de", "del", "al", "a",
+    "en", "y", "o", "por", "para", "con", "sin", "que", "me", "mi", "te", "se", "es",
+    "esa", "ese", "esta", "este", "hola", "calle", "av", "avenida",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos"""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(fold(text)) if t not in STOPWORDS]
+
+
+class TextIndex:
+    """Índice invertido con ranking BM25, actualizable documento por documento"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self._fingerprints: Dict[str, Tuple] = {}
+        self._doc_tokens: Dict[str, List[str]] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, item: Dict[str, Any]):
+        """Indexa (o reindexa) un documento"""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        frequencies: Dict[str, float] = {}
+        for field, weight in INDEXED_FIELDS.items():
+            value = item.get(field)
+            if not value:
+                continue
+            for token in tokenize(value):
+                frequencies[token] = frequencies.get(token, 0.0) + weight
+
+        length = sum(frequencies.values())
+        for token, tf in frequencies.items():
+            self.postings.setdefault(token, {})[doc_id] = tf
+        self.doc_lengths[doc_id] = length
+        self._doc_tokens[doc_id] = list(frequencies)
+        self._fingerprints[doc_id] = self._fingerprint(item)
+        self._total_length += length
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.doc_lengths:
+            return
+        for token in self._doc_tokens.pop(doc_id, []):
+            docs = self.postings.get(token, {})
+            docs.pop(doc_id, None)
+            if not docs:
+                self.postings.pop(token, None)
+        self._total_length -= self.doc_lengths.pop(doc_id)
+        self._fingerprints.pop(doc_id, None)
+
+    def sync(self, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Sincroniza el índice con un nuevo snapshot del catálogo: solo reindexa
+        las propiedades nuevas o con campos indexados modificados y borra las que ya no están.
+        Retorna la cantidad de documentos tocados.
+        """
+        seen = set()
+        touched = 0
+        for item in items:
+            doc_id = item.get("PropertyId")
+            if not doc_id:
+                continue
+            seen.add(doc_id)
+            if self._fingerprints.get(doc_id) != self._fingerprint(item):
+                self.add(doc_id, item)
+                touched += 1
+        for doc_id in [d for d in self.doc_lengths if d not in seen]:
+            self.remove(doc_id)
+            touched += 1
+        return touched
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Retorna [(doc_id, score)] ordenado por relevancia BM25"""
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = (self._total_length / n_docs) or 1.0
+
+        scores: Dict[str, float] = {}
+        for token in set(tokenize(query)):
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+    def _fingerprint(self, item: Dict[str, Any]) -> Tuple:
+        return tuple(item.get(field) for field in INDEXED_FIELDS)
@@ -0,0 +1,105 @@
+# services/tokens.py
+"""
+Conteo local de tokens y armado del historial por presupuesto de tokens.
+
+No depende de tiktoken: separa el texto en piezas como el pre-tokenizador de
+los modelos de OpenAI (palabras con su espacio, números de a 3 dígitos,
+puntuación) y estima cada pieza. Las palabras más frecuentes de las charlas
+(tabla de abajo) cuentan como un token; el resto ~1 token cada 3 caracteres,
+más uno por carácter no ASCII (acentos, emojis), que suelen partirse en bytes.
+La estimación queda apenas por encima del conteo real, que es lo que importa
+para no pasarse del presupuesto.
+"""
+
+import math
+import re
+from typing import Dict, Any, List, Optional
+
+# Overhead por mensaje del formato chat (rol + separadores) y del inicio de la respuesta
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+_PIECES = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\w\s]+|\s+")
+
+# Palabras que son un solo token (con o sin espacio adelante)
+COMMON_WORDS = frozenset("""
+a al algo alquiler alquilar ambiente ambientes antes año años aca acá ahi ahí bien barrio bueno busco buenas buen
+casa como cómo con consulta contacto cual cuál cuando cuándo cuanto cuánto dale de del depto desde dia día dias días
+donde dónde dos el ella ellos en entonces es esa ese eso esta está estan están este esto estoy fecha gracias hay
+hasta hola hora horas hoy la las le les lo los lunes mañana martes mas más me mi mis mucho muy nada no nos o otra otro
+para pero perfecto por precio propiedad puede puedo que qué quiero se sea ser si sí sin sobre son su sus también tan
+te tengo tiene todo todos tu tú un una uno unos viernes visita y ya yo
+the and you for with this that are is it of to in on
+""".split())
+
+
+def _piece_tokens(piece: str) -> int:
+    word = piece.strip()
+    if not word:
+        # Espacios y saltos de línea: se agrupan de a varios
+        return 1 if len(piece) <= 4 else math.ceil(len(piece) / 4)
+    if word.lower() in COMMON_WORDS:
+        return 1
+    non_ascii = sum(1 for c in word if ord(c) > 127)
+    return max(1, math.ceil(len(word) / 3)) + non_ascii
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Tokens estimados de un texto"""
+    if not text:
+        return 0
+    return sum(_piece_tokens(piece) for piece in _PIECES.findall(text))
+
+
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Tokens estimados de un prompt en formato chat"""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m.get("content")) for m in messages) + TOKENS_PER_REPLY
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta el texto para que entre en max_tokens (conserva el principio y marca el corte)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max(1, max_tokens - 1)  # el "…" también cuenta
+    used = 0
+    kept = []
+    for piece in _PIECES.findall(text):
+        cost = _piece_tokens(piece)
+        if used + cost > budget:
+            break
+        kept.append(piece)
+        used += cost
+    return "".join(kept).rstrip() + "…"
+
+
+def fit_history(history: List[Dict[str, str]], budget: int, max_message_tokens: int) -> List[Dict[str, str]]:
+    """
+    Historial que entra en `budget` tokens, llenando desde el mensaje más nuevo.
+    Los mensajes largos (textos pegados) se recortan a `max_message_tokens`;
+    el más reciente siempre entra, recortado a lo que quede del presupuesto.
+    """
+    selected = []
+    remaining = budget
+    for msg in reversed(history or []):
+        content = truncate_to_tokens(msg.get("content", ""), max_message_tokens)
+        cost = TOKENS_PER_MESSAGE + count_tokens(content)
+        if cost > remaining:
+            if selected:
+                break
+            content = truncate_to_tokens(content, max(1, remaining - TOKENS_PER_MESSAGE))
+            cost = remaining
+        selected.append({**msg, "content": content})
+        remaining -= cost
+    selected.reverse()
+    return selected
+
+
+def log_prompt_usage(label: str, messages: List[Dict[str, Any]], response=None):
+    """Imprime los tokens de prompt estimados y, si la respuesta trae usage, los reales"""
+    estimated = count_message_tokens(messages)
+    usage = getattr(response, "usage", None)
+    actual = getattr(usage, "prompt_tokens", None)
+    if actual:
+        print(f"🔢 [TOKENS] {label}: prompt {actual} tokens (estimado {estimated}), respuesta {getattr(usage, 'completion_tokens', '?')}")
+    else:
+        print(f"🔢 [TOKENS] {label}: prompt ~{estimated} tokens (estimado)")
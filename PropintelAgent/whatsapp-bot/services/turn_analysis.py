@@ -0,0 +1,224 @@
+# services/turn_analysis.py
+"""
+Análisis de turno: una sola llamada estructurada a OpenAI por mensaje del lead.
+
+Reemplaza la cadena extract_slots → analyze_qualification_ai → respuesta de la
+etapa (tres idas y vueltas en serie) por una completion con JSON Schema que
+devuelve, según la etapa, los datos del mensaje, los flags de calificación,
+la fecha de visita y la respuesta al lead.
+
+Se activa con TURN_ANALYSIS_MODE=single; con "multi" se usa el flujo anterior.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from utils.dates import ARGENTINA_TZ, WEEKDAYS
+
+SLOT_KEYS = ["intent", "rooms", "budget", "neighborhood", "visit_intent"]
+QUALIFICATION_KEYS = [
+    "buyer_confirmed", "motive_confirmed", "financing_confirmed", "timeline_confirmed",
+    "ready_to_close", "needs_to_sell", "has_preapproval", "decision_maker",
+]
+
+SLOTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": ["string", "null"], "enum": ["alquiler", "venta", "consulta", None]},
+        "rooms": {"type": ["integer", "null"]},
+        "budget": {"type": ["integer", "null"]},
+        "neighborhood": {"type": ["string", "null"]},
+        "visit_intent": {"type": "boolean"},
+    },
+    "required": SLOT_KEYS,
+    "additionalProperties": False,
+}
+
+# null = el mensaje no dice nada sobre ese punto (no pisa lo que ya se sabía)
+QUALIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {key: {"type": ["boolean", "null"]} for key in QUALIFICATION_KEYS},
+    "required": QUALIFICATION_KEYS,
+    "additionalProperties": False,
+}
+
+# Campos que devuelve el análisis en cada etapa
+STAGE_FIELDS = {
+    "PRECALIFICACION": ["slots"],  # la respuesta la arma handle_precalification_stage
+    "CALIFICACION": ["slots", "qualification", "reply"],
+    "POST_CALIFICACION": ["slots", "qualification", "visit_iso", "reply"],
+    "FINALIZADO": ["slots", "reply"],
+}
+
+FIELD_SCHEMAS = {
+    "slots": SLOTS_SCHEMA,
+    "qualification": QUALIFICATION_SCHEMA,
+    "visit_iso": {"type": ["string", "null"]},
+    "reply": {"type": "string"},
+}
+
+FIELD_INSTRUCTIONS = {
+    "slots": "- slots: intent (alquiler/venta/consulta), rooms y budget como enteros (150k=150000, 1.5M=1500000), "
+             "neighborhood y visit_intent (true si quiere ver/visitar). null si el mensaje no lo dice.",
+    "qualification": "- qualification: flags de calificación que surgen del ÚLTIMO mensaje del cliente "
+                     "(true/false). null si el mensaje no dice nada sobre ese punto.",
+    "visit_iso": "- visit_iso: fecha y hora de visita que propone el cliente en ISO8601 con zona -03:00 "
+                 "(solo día → 10:00; solo hora → próximo día hábil). null si no propone una fecha clara.",
+    "reply": "- reply: tu respuesta al cliente, siguiendo TODAS las reglas de la etapa.",
+}
+
+
+@dataclass
+class TurnAnalysis:
+    """Resultado del análisis de un turno para la etapa `stage`"""
+    stage: str
+    slots: Dict[str, Any] = field(default_factory=dict)
+    qualification: Optional[Dict[str, Any]] = None
+    visit_iso: Optional[str] = None
+    reply: Optional[str] = None
+
+    def slot_updates(self, known: Optional[Dict[str, Any]] = None,
+                     confidence: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Campos del lead (Intent, Rooms, Budget, Neighborhood) detectados por la IA
+        que las reglas no encontraron en `known` o encontraron con baja confianza
+        (mismo criterio que extract_slots).
+        """
+        from config import SLOT_CONFIDENCE_THRESHOLD
+        known = known or {}
+        confidence = confidence or {}
+        updates = {}
+        for key in ["intent", "rooms", "budget", "neighborhood"]:
+            if not self.slots.get(key):
+                continue
+            if not known.get(key) or confidence.get(key, 1.0) < SLOT_CONFIDENCE_THRESHOLD:
+                if self.slots[key] != known.get(key):
+                    updates[key.capitalize()] = self.slots[key]
+        return updates
+
+
+def stage_schema(stage: str) -> Dict[str, Any]:
+    """JSON Schema de la respuesta para la etapa"""
+    fields = STAGE_FIELDS.get(stage, STAGE_FIELDS["FINALIZADO"])
+    return {
+        "type": "object",
+        "properties": {name: FIELD_SCHEMAS[name] for name in fields},
+        "required": list(fields),
+        "additionalProperties": False,
+    }
+
+
+def stage_has_reply(stage: str) -> bool:
+    """Si el análisis de turno de la etapa trae la respuesta (si no, solo extrae datos)"""
+    return "reply" in STAGE_FIELDS.get(stage, STAGE_FIELDS["FINALIZADO"])
+
+
+def _instructions(stage: str) -> str:
+    """Formato de salida de la etapa (fijo: va en el prefijo cacheable del prompt)"""
+    fields = STAGE_FIELDS.get(stage, STAGE_FIELDS["FINALIZADO"])
+    return "\n".join([
+        "FORMATO DE SALIDA: respondé SOLO con un JSON con estos campos:",
+        *[FIELD_INSTRUCTIONS[name] for name in fields],
+    ])
+
+
+def _current_time(now: datetime) -> str:
+    return f"Fecha y hora actual en Argentina: {WEEKDAYS[now.weekday()]} {now.strftime('%Y-%m-%d %H:%M')} (-03:00)."
+
+
+def build_turn_messages(lead_data: dict, conversation_history: list, message: str,
+                        now: Optional[datetime] = None) -> List[Dict[str, str]]:
+    """Mensajes para la llamada única del turno según la etapa del lead"""
+    from services.ai import build_stage_messages, SLOTS_EXTRACTION_PROMPT
+
+    stage = lead_data.get("Stage", "PRECALIFICACION")
+    now = now or datetime.now(ARGENTINA_TZ)
+
+    fields = STAGE_FIELDS.get(stage, STAGE_FIELDS["FINALIZADO"])
+    if "reply" not in fields:
+        # Solo datos del mensaje: alcanza con el prompt corto de extracción
+        return [
+            {"role": "system", "content": SLOTS_EXTRACTION_PROMPT},
+            {"role": "system", "content": _instructions(stage)},
+            {"role": "user", "content": f"Texto: {message}"},
+        ]
+
+    messages = build_stage_messages(lead_data, conversation_history)
+    # Instrucciones de formato (fijas) pegadas al prompt de la etapa, antes del historial;
+    # la hora actual cambia en cada turno, así que va al final con los datos del lead
+    messages.insert(1, {"role": "system", "content": _instructions(stage)})
+    if "visit_iso" in fields:
+        messages[-1] = {"role": "system", "content": messages[-1]["content"] + "\n" + _current_time(now)}
+    return messages
+
+
+def parse_turn(stage: str, content) -> TurnAnalysis:
+    """Convierte el JSON devuelto por OpenAI (texto o dict) en TurnAnalysis (tolera campos faltantes)"""
+    data = json.loads(content or "{}") if isinstance(content, str) else content
+    if not isinstance(data, dict):
+        data = {}
+
+    slots = data.get("slots") if isinstance(data.get("slots"), dict) else {}
+    qualification = None
+    if "qualification" in STAGE_FIELDS.get(stage, []):
+        raw = data.get("qualification") if isinstance(data.get("qualification"), dict) else {}
+        qualification = {k: v for k, v in raw.items() if k in QUALIFICATION_KEYS and isinstance(v, bool)}
+
+    visit_iso = data.get("visit_iso")
+    reply = data.get("reply")
+    return TurnAnalysis(
+        stage=stage,
+        slots={k: slots.get(k) for k in SLOT_KEYS},
+        qualification=qualification,
+        visit_iso=visit_iso if isinstance(visit_iso, str) and visit_iso.strip() else None,
+        reply=reply.strip() if isinstance(reply, str) and reply.strip() else None,
+    )
+
+
+def analyze_turn(lead_data: dict, conversation_history: list, message: str) -> Optional[TurnAnalysis]:
+    """
+    Una llamada a OpenAI con structured outputs para el turno completo.
+    Retorna None si OpenAI no está disponible o falla (se usa el flujo multi-llamada).
+    """
+    from services.llm import llm_available
+    from services.model_routing import routed_completion, get_route
+    from services.tokens import log_prompt_usage
+
+    if not llm_available():
+        return None
+
+    stage = lead_data.get("Stage", "PRECALIFICACION")
+    try:
+        messages = build_turn_messages(lead_data, conversation_history, message)
+        schema = stage_schema(stage)
+        # Con respuesta va al modelo de conversación; solo datos, al de extracción
+        task = "turn" if stage_has_reply(stage) else "turn_extraction"
+
+        def _complete():
+            resp = routed_completion(
+                task,
+                stage,
+                messages=messages,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": {"name": f"turn_{stage.lower()}", "strict": True, "schema": schema},
+                },
+            )
+            log_prompt_usage(f"turno {stage}", messages, resp)
+            return json.loads(resp.choices[0].message.content or "{}")
+
+        if stage_has_reply(stage):
+            data = _complete()
+        else:
+            # Sin respuesta ni historial el resultado depende solo del mensaje: cacheable
+            from services.llm_cache import cached_completion
+            prompt = "\n".join(m["content"] for m in messages if m["role"] == "system") + json.dumps(schema)
+            data = cached_completion("turn_slots", prompt, get_route(task, stage).model, message, _complete)
+        turn = parse_turn(stage, data)
+        print(f"🧠 [TURN] Análisis de turno ({stage}): slots={turn.slots} calificación={turn.qualification} visita={turn.visit_iso}")
+        return turn
+    except Exception as e:
+        print(f"[TURN][ERROR] {e}")
+        return None
@@ -0,0 +1,102 @@
+# services/turn_tasks.py
+"""
+Ejecución de los pasos de un turno según sus dependencias.
+
+Cada paso declara de qué otros pasos depende; los que no dependen entre sí
+(leer el lead, buscar la propiedad por URL, traer el historial) corren en
+paralelo en un pool acotado, así la latencia del turno es la de la cadena de
+dependencias más larga y no la suma de todos los pasos.
+
+Con TURN_EXECUTION_MODE=sequential los mismos pasos corren uno tras otro en
+el orden declarado (útil para depurar).
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, Iterable, Optional
+
+from config import TURN_EXECUTION_MODE, TURN_FANOUT_WORKERS
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_turn_executor() -> ThreadPoolExecutor:
+    """Pool del proceso (se reutiliza entre invocaciones del mismo contenedor)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=TURN_FANOUT_WORKERS, thread_name_prefix="turn")
+    return _executor
+
+
+class TurnGraph:
+    """
+    Pasos de un turno con sus dependencias. Cada función recibe como kwargs
+    los resultados de los pasos de los que depende:
+
+        graph = TurnGraph()
+        graph.add("lead", get_lead, lead_id)
+        graph.add("context", lambda lead: get_context(lead_id, lead["Stage"]), after=["lead"])
+        results = graph.run()
+    """
+
+    def __init__(self, parallel: Optional[bool] = None):
+        self.parallel = TURN_EXECUTION_MODE == "parallel" if parallel is None else parallel
+        self._steps: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, fn: Callable, *args, after: Iterable[str] = (), **kwargs) -> "TurnGraph":
+        deps = list(after)
+        for dep in deps:
+            if dep not in self._steps:
+                raise ValueError(f"El paso '{name}' depende de '{dep}', que no está declarado antes")
+        self._steps[name] = (fn, args, kwargs, deps)
+        return self
+
+    def _call(self, name: str, results: Dict[str, Any]):
+        fn, args, kwargs, deps = self._steps[name]
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs, **{dep: results[dep] for dep in deps})
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+
+    def run(self) -> Dict[str, Any]:
+        """Ejecuta todos los pasos; si uno falla se propaga su excepción"""
+        start = time.perf_counter()
+        results: Dict[str, Any] = {}
+        if not self.parallel:
+            for name in self._steps:
+                results[name] = self._call(name, results)
+        else:
+            self._run_parallel(results)
+        self.timings["total"] = (time.perf_counter() - start) * 1000
+        steps = ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.timings.items())
+        print(f"⚡ [TURN] Pasos ({'paralelo' if self.parallel else 'secuencial'}): {steps}")
+        return results
+
+    def _run_parallel(self, results: Dict[str, Any]):
+        # El hilo que llama coordina: lanza cada paso cuando terminaron sus dependencias
+        # (los workers nunca esperan a otros workers, así el pool acotado no se traba)
+        executor = get_turn_executor()
+        pending = dict(self._steps)
+        running = {}
+        while pending or running:
+            for name in [n for n, step in pending.items() if all(d in results for d in step[3])]:
+                del pending[name]
+                # Cada paso corre con una copia del contexto (ej. la sesión del lead del turno)
+                running[executor.submit(contextvars.copy_context().run, self._call, name, dict(results))] = name
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    # Los pasos ya lanzados terminan solos; no se lanza ninguno más
+                    for other in running:
+                        other.cancel()
+                    raise
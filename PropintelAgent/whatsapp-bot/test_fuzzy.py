@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de la elección de propiedades (services.fuzzy).
+Verifica ordinales, el piso absoluto de similitud de título y que con una sola
+propiedad propuesta no se confirme nada sin un "sí", un ordinal o el título.
+No requiere OpenAI ni DynamoDB.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.fuzzy import parse_ordinal, match_property
+
+PALERMO = {"PropertyId": "p1", "Title": "Departamento 3 ambientes en Palermo Soho", "Neighborhood": "Palermo"}
+BELGRANO = {"PropertyId": "p2", "Title": "Casa con jardín en Belgrano R", "Neighborhood": "Belgrano"}
+
+# (texto, índice ordinal esperado)
+ORDINAL_CASES = [
+    ("2", 1),
+    ("la segunda", 1),
+    ("opción 3", 2),
+    ("la última", -1),
+    ("me quedo con el 2", 1),
+    ("el 2 de marzo", None),
+    ("el 2/3", None),
+    ("el 15 de abril a las 10", None),
+    ("hola", None),
+]
+
+# (candidatas, texto, PropertyId esperado o None)
+MATCH_CASES = [
+    ([PALERMO], "quiero otro departamento", None),
+    ([PALERMO], "tenés algo parecido en Palermo?", None),
+    ([PALERMO], "cuanto sale el departamento?", None),
+    ([PALERMO], "el de palermo soho", "p1"),
+    ([PALERMO, BELGRANO], "la segunda", "p2"),
+    ([PALERMO, BELGRANO], "el de palermo soho", "p1"),
+    ([PALERMO, BELGRANO], "el 2 de marzo", None),
+]
+
+
+def main():
+    print("🧪 Testing elección de propiedades...")
+    print("=" * 60)
+
+    failures = 0
+    for text, expected in ORDINAL_CASES:
+        got = parse_ordinal(text)
+        ok = got == expected
+        failures += 0 if ok else 1
+        print(f"   ordinal {text:<30} → {got!s:<5} {'✅' if ok else f'❌ esperado {expected}'}")
+
+    for candidates, text, expected in MATCH_CASES:
+        prop, confidence = match_property(candidates, text)
+        got = prop["PropertyId"] if prop else None
+        ok = got == expected
+        failures += 0 if ok else 1
+        print(f"   {len(candidates)} opción(es) {text:<30} → {got!s:<5} ({confidence:.2f}) "
+              f"{'✅' if ok else f'❌ esperado {expected}'}")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} casos fallaron")
+        return 1
+    print(f"✅ {len(ORDINAL_CASES) + len(MATCH_CASES)} casos correctos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
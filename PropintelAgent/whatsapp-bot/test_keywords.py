@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Script de prueba del motor de palabras clave (services.keywords).
+Verifica categorías, límites de palabra y acentos, y compara el tiempo de una
+pasada del autómata contra los bucles `in` por lista que reemplaza.
+No requiere OpenAI ni DynamoDB.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.keywords import KEYWORDS, KeywordAutomaton, scan, normalize
+
+# (texto, categorías que deben aparecer, categorías que NO deben aparecer)
+CASES = [
+    ("Me voy a la playa el finde", [], ["qual.timeline"]),
+    ("lo necesito ya", ["qual.timeline"], []),
+    ("bueno, gracias", [], ["confirm.no"]),
+    ("no, es otra", ["confirm.no"], ["confirm.yes"]),
+    ("Sí, esa es", ["confirm.yes"], []),
+    ("casi seguro que no", ["confirm.no"], ["confirm.yes"]),
+    ("es para mí", ["qual.buyer"], []),
+    ("busco en Núñez o nunez", ["barrio"], []),
+    ("quiero alquilar un depto", ["intent.alquiler", "qual.ready", "property.search"], ["intent.venta"]),
+    ("una ventana al frente", [], ["intent.venta", "property.search"]),
+    ("es bastante rentable", ["intent.alquiler_weak"], ["intent.alquiler"]),
+    ("tengo crédito preaprobado", ["qual.financing"], []),
+    ("el miércoles 15hs", ["schedule"], []),
+    ("2 ambientes", [], ["schedule"]),
+    ("me gustaría verla", ["visit"], []),
+    ("la vereda está rota", [], ["visit"]),
+    ("quiero vivir en La Boca", ["barrio", "qual.motive"], []),
+    ("una bocacalle", [], ["barrio"]),
+]
+
+# Listas equivalentes a las que había antes de compilar el registro (para comparar tiempos)
+LEGACY_LISTS = [
+    [k.rstrip("*") for k in (entries if isinstance(entries, list) else list(entries))]
+    for entries in KEYWORDS.values()
+]
+
+MESSAGES = [text for text, _, _ in CASES] + [
+    "Hola! vi un depto en zonaprop de 3 ambientes en Palermo, sigue disponible?",
+    "Es para mi, me quiero mudar este mes y tengo el credito hipotecario preaprobado",
+    "Dale, podemos coordinar para el jueves a las 18hs",
+]
+
+
+def main():
+    print("🧪 Testing motor de palabras clave...")
+    print("=" * 60)
+
+    failures = 0
+    for text, expected, forbidden in CASES:
+        matches = scan(text)
+        missing = [c for c in expected if not matches.has(c)]
+        extra = [c for c in forbidden if matches.has(c)]
+        ok = not missing and not extra
+        failures += 0 if ok else 1
+        status = "✅" if ok else f"❌ faltan {missing} sobran {extra}"
+        print(f"   {text:<34} → {', '.join(matches.categories) or '-'} {status}")
+
+    hits = scan("busco en Núñez").get("barrio")
+    if not hits or hits[0].value != "Núñez" or (hits[0].start, hits[0].end) != (9, 14):
+        failures += 1
+        print(f"   ❌ posición/valor del barrio: {hits}")
+
+    automaton = KeywordAutomaton(KEYWORDS)
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in MESSAGES:
+            automaton.find(text)
+    compiled_ms = (time.perf_counter() - start) * 1000 / (rounds * len(MESSAGES))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in MESSAGES:
+            folded = normalize(text)
+            for keywords in LEGACY_LISTS:
+                any(keyword in folded for keyword in keywords)
+    legacy_ms = (time.perf_counter() - start) * 1000 / (rounds * len(MESSAGES))
+    print(f"\n⏱️  autómata {compiled_ms:.3f} ms por mensaje ({automaton.size} keywords), "
+          f"bucles `in` {legacy_ms:.3f} ms")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} casos fallaron")
+        return 1
+    print(f"✅ {len(CASES)} casos correctos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
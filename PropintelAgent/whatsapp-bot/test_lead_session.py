@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Script de prueba de la unidad de trabajo del lead (services.lead_session).
+Verifica que las escrituras del turno se junten en un solo update_item, que los
+datos de calificación vayan como rutas anidadas, y qué pasa cuando otro proceso
+escribió el lead en el medio (reintento si tocó otros campos, LeadConflict si
+tocó los mismos). Fuera de una sesión, update_qualification_data escribe sin
+leer y nunca da de alta un lead inexistente. Usa una tabla en memoria: no
+requiere DynamoDB.
+"""
+
+import sys
+import os
+import copy
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from services import dynamo
+from services.dynamo import get_lead, update_lead, update_qualification_data, update_lead_stage_and_status
+from services.lead_session import lead_session, LeadConflict, session_stats
+
+
+class ConditionalCheckFailed(Exception):
+    def __init__(self, item=None):
+        super().__init__("ConditionalCheckFailed")
+        self.response = {"Item": item} if item is not None else {}
+
+
+# Condiciones que usa update_qualification_data fuera de sesión
+CONDITIONS = {
+    "attribute_exists(#QD)": lambda item: item is not None and isinstance(item.get("QualificationData"), dict),
+    "attribute_exists(LeadId) AND attribute_not_exists(#QD)":
+        lambda item: item is not None and "QualificationData" not in item,
+}
+
+
+class FakeLeads:
+    """Tabla de leads en memoria: registra los update_item y puede simular otro escritor"""
+
+    class meta:
+        class client:
+            class exceptions:
+                ConditionalCheckFailedException = ConditionalCheckFailed
+
+    def __init__(self, item, other_writer=None):
+        self.item = item
+        self.other_writer = other_writer  # dict de campos que "otro proceso" escribe antes del primer update
+        self.updates = []
+
+    def get_item(self, Key, **kwargs):
+        return {"Item": copy.deepcopy(self.item)} if self.item is not None else {}
+
+    def put_item(self, Item, **kwargs):
+        self.item = copy.deepcopy(Item)
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+        condition = CONDITIONS.get(kwargs.get("ConditionExpression"))
+        if condition is not None:
+            return self._conditional_update(condition, kwargs)
+        if self.other_writer:
+            self.item.update(self.other_writer)
+            self.item["Version"] = self.item.get("Version", 0) + 1
+            self.other_writer = None
+            raise ConditionalCheckFailed()
+        self.item["Version"] = kwargs["ExpressionAttributeValues"][":next"]
+        return {}
+
+    def _conditional_update(self, condition, kwargs):
+        if not condition(self.item):
+            old = copy.deepcopy(self.item) if kwargs.get("ReturnValuesOnConditionCheckFailure") == "ALL_OLD" else None
+            raise ConditionalCheckFailed(old)
+        names, values = kwargs["ExpressionAttributeNames"], kwargs["ExpressionAttributeValues"]
+        if ":qd" in values:
+            self.item["QualificationData"] = dict(values[":qd"])
+        for alias, key in names.items():
+            if alias.startswith("#Q") and alias != "#QD":
+                self.item["QualificationData"][key] = values[":q" + alias[2:]]
+        return {"Attributes": copy.deepcopy(self.item)}
+
+
+def _lead(**fields):
+    item = {"LeadId": "L1", "Stage": "PRECALIFICACION", "Status": "NUEVO", "Version": 3,
+            "QualificationData": {"property_confirmed": False}}
+    item.update(fields)
+    return item
+
+
+def _run_turn(table):
+    dynamo.t_leads = table
+    with lead_session("L1"):
+        get_lead("L1")
+        update_lead("L1", {"Rooms": 2})
+        update_lead("L1", {"Neighborhood": "Palermo"})
+        update_qualification_data("L1", {"buyer_confirmed": True})
+        update_lead_stage_and_status("L1", "CALIFICACION", "CALIFICANDO")
+        pending = len(table.updates)
+    return pending
+
+
+def check(name, ok, detail=""):
+    print(f"   {name:<58} {'✅' if ok else '❌ ' + detail}")
+    return 0 if ok else 1
+
+
+def main():
+    print("🧪 Testing LeadSession...")
+    print("=" * 60)
+    original = dynamo.t_leads
+    failures = 0
+    try:
+        # 1. Buffer: nada se escribe durante el turno, un solo update_item al cerrar
+        table = FakeLeads(_lead())
+        pending = _run_turn(table)
+        args = table.updates[0] if table.updates else {}
+        expr = args.get("UpdateExpression", "")
+        values = args.get("ExpressionAttributeValues", {})
+        failures += check("sin escrituras durante el turno", pending == 0, f"{pending} update_item")
+        failures += check("un solo update_item al cerrar", len(table.updates) == 1, f"{len(table.updates)}")
+        failures += check("condición sobre la versión leída", args.get("ConditionExpression") == "#Ver = :expected"
+                          and values.get(":expected") == 3 and values.get(":next") == 4, str(values))
+        failures += check("calificación como ruta anidada", "#QD.#Q1 = :q1" in expr
+                          and args["ExpressionAttributeNames"].get("#Q1") == "buyer_confirmed", expr)
+        failures += check("el mapa de calificación no se pisa", "#QD = " not in expr, expr)
+
+        # 2. Lead sin mapa de calificación: se crea el mapa entero
+        table = FakeLeads(_lead(QualificationData=None))
+        _run_turn(table)
+        expr = table.updates[0]["UpdateExpression"] if table.updates else ""
+        failures += check("lead sin mapa: SET #QD = :qd", "#QD = :qd" in expr, expr)
+
+        # 3. Otro proceso escribió otro campo: se relee y se reintenta con la versión nueva
+        before = session_stats()
+        table = FakeLeads(_lead(), other_writer={"ConversationSummary": "resumen nuevo"})
+        _run_turn(table)
+        retry = table.updates[-1]["ExpressionAttributeValues"] if table.updates else {}
+        failures += check("conflicto en otro campo: reintenta", len(table.updates) == 2
+                          and retry.get(":expected") == 4 and retry.get(":next") == 5, str(retry))
+        failures += check("conflicto en otro campo: conserva lo del otro",
+                          table.item.get("ConversationSummary") == "resumen nuevo")
+        failures += check("conflicto en otro campo: contado",
+                          session_stats()["conflicts_merged"] == before["conflicts_merged"] + 1)
+
+        # 4. Otro proceso cambió un campo que el turno también escribe: no se pisa
+        table = FakeLeads(_lead(), other_writer={"Stage": "POST_CALIFICACION"})
+        dynamo.t_leads = table
+        raised = False
+        with lead_session("L1") as session:
+            get_lead("L1")
+            update_lead_stage_and_status("L1", "CALIFICACION", "CALIFICANDO")
+            try:
+                session.flush()
+            except LeadConflict as e:
+                raised = e.fields == ["Stage"]
+        failures += check("conflicto en el mismo campo: LeadConflict", raised)
+        failures += check("conflicto en el mismo campo: no reintenta", len(table.updates) == 1, f"{len(table.updates)}")
+        failures += check("conflicto en el mismo campo: queda lo del otro", table.item["Stage"] == "POST_CALIFICACION")
+        failures += check("conflicto en el mismo campo: contado como fallo",
+                          session_stats()["conflicts_aborted"] == before["conflicts_aborted"] + 1)
+
+        # 5. Escritura antes de responder y otra al cerrar (resumen): versiones consecutivas
+        table = FakeLeads(_lead())
+        dynamo.t_leads = table
+        with lead_session("L1") as session:
+            get_lead("L1")
+            update_lead("L1", {"Rooms": 3})
+            session.flush()
+            update_lead("L1", {"ConversationSummary": "resumen"})
+        versions = [u["ExpressionAttributeValues"][":expected"] for u in table.updates]
+        failures += check("dos escrituras en el turno: v3 y después v4", versions == [3, 4], str(versions))
+
+        # 6. Sin sesión: SET anidado sin leer, devuelve el lead (ALL_NEW)
+        table = FakeLeads(_lead())
+        dynamo.t_leads = table
+        stored = update_qualification_data("L1", {"buyer_confirmed": True})
+        qd = (stored or {}).get("QualificationData", {})
+        failures += check("sin sesión: un update_item anidado", len(table.updates) == 1
+                          and "#QD.#Q1 = :q1" in table.updates[0]["UpdateExpression"])
+        failures += check("sin sesión: conserva el resto del mapa",
+                          qd == {"property_confirmed": False, "buyer_confirmed": True}, str(qd))
+
+        # 7. Sin sesión, lead sin mapa: se crea el mapa solo si el lead existe
+        table = FakeLeads({"LeadId": "L1", "Stage": "CALIFICACION", "Version": 1})
+        dynamo.t_leads = table
+        stored = update_qualification_data("L1", {"buyer_confirmed": True})
+        fallback = table.updates[-1] if table.updates else {}
+        failures += check("sin mapa: fallback condicionado a que el lead exista",
+                          "attribute_exists(LeadId)" in fallback.get("ConditionExpression", ""))
+        failures += check("sin mapa: mapa creado", (stored or {}).get("QualificationData") == {"buyer_confirmed": True})
+
+        # 8. Sin sesión, lead inexistente: no se da de alta un lead a medias
+        table = FakeLeads(None)
+        dynamo.t_leads = table
+        stored = update_qualification_data("L404", {"buyer_confirmed": True})
+        failures += check("lead inexistente: no se crea", stored is None and table.item is None
+                          and len(table.updates) == 2, f"{len(table.updates)} update_item")
+    finally:
+        dynamo.t_leads = original
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} verificaciones fallaron")
+        return 1
+    print("✅ LeadSession OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
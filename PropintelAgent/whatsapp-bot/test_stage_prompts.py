@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Script de prueba del armado de prompts por etapa.
+Verifica que el prefijo del prompt (prompt compilado de la etapa + formato del
+análisis de turno) sea idéntico byte a byte para leads distintos, y que los
+datos del lead queden solo en el mensaje final. No usa OpenAI ni DynamoDB.
+"""
+
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.ai import build_stage_messages
+from services.stage_prompts import COMPILED_PROMPTS, get_stage_prompt
+from services.turn_analysis import build_turn_messages
+from utils.dates import ARGENTINA_TZ
+
+LEAD_A = {
+    "LeadId": "+5491111111111", "Neighborhood": "Palermo", "Rooms": 2, "Budget": 150000, "Intent": "alquiler",
+    "QualificationData": {"buyer_confirmed": True},
+}
+LEAD_B = {
+    "LeadId": "+5492222222222", "Neighborhood": "Belgrano", "Rooms": 4, "Budget": 480000, "Intent": "venta",
+    "QualificationData": {"financing_confirmed": True, "ready_to_close": True},
+}
+
+HISTORY = [
+    {"role": "user", "content": "Hola, vi un depto en zonaprop"},
+    {"role": "assistant", "content": "Hola! Soy Gonzalo. En que te puedo ayudar?"},
+]
+
+
+def prefix(messages):
+    """Mensajes de sistema antes del historial"""
+    result = []
+    for msg in messages:
+        if msg["role"] != "system":
+            break
+        result.append(msg["content"])
+    return result
+
+
+def main():
+    print("🧪 Testing prefijo estable de prompts por etapa...")
+    print("=" * 60)
+
+    failures = 0
+    for stage, compiled in COMPILED_PROMPTS.items():
+        lead_a = dict(LEAD_A, Stage=stage)
+        lead_b = dict(LEAD_B, Stage=stage)
+        checks = []
+
+        checks.append(("compilado una sola vez", get_stage_prompt(stage) is compiled))
+
+        msgs_a = build_stage_messages(lead_a, HISTORY)
+        msgs_b = build_stage_messages(lead_b, HISTORY)
+        checks.append(("prefijo idéntico entre leads", prefix(msgs_a) == prefix(msgs_b) == [compiled.text]))
+        checks.append(("datos del lead solo al final",
+                       LEAD_A["LeadId"] not in compiled.text and LEAD_A["LeadId"] in msgs_a[-1]["content"]))
+
+        now_1 = datetime(2026, 10, 16, 11, 0, tzinfo=ARGENTINA_TZ)
+        now_2 = datetime(2026, 10, 19, 17, 45, tzinfo=ARGENTINA_TZ)
+        turn_a = build_turn_messages(lead_a, HISTORY, "hola", now=now_1)
+        turn_b = build_turn_messages(lead_b, HISTORY, "hola", now=now_2)
+        checks.append(("prefijo del análisis de turno idéntico", prefix(turn_a) == prefix(turn_b)))
+
+        ok = all(passed for _, passed in checks)
+        failures += 0 if ok else 1
+        print(f"📋 {stage:<18} {compiled.tokens:5} tokens {'✅' if ok else '❌'}")
+        for name, passed in checks:
+            if not passed:
+                print(f"   ❌ {name}")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures} etapas con prefijo inestable")
+        return 1
+    print("✅ Prefijo estable en todas las etapas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Script de prueba del parser local de fechas de visita (utils.dates).
+Usa una fecha de referencia fija, así que los resultados son reproducibles
+y no requiere OpenAI ni DynamoDB.
+"""
+
+import sys
+import os
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.dates import parse_visit_text, ARGENTINA_TZ
+
+# Viernes 16/10/2026 11:00 en Argentina
+NOW = datetime(2026, 10, 16, 11, 0, tzinfo=ARGENTINA_TZ)
+
+# (texto, iso esperado, ambiguo esperado)
+CASES = [
+    ("viernes 15hs", "2026-10-23T15:00:00-03:00", False),
+    ("mañana a las 10", "2026-10-17T10:00:00-03:00", False),
+    ("pasado mañana", "2026-10-18T10:00:00-03:00", False),
+    ("Mañana 18hs", "2026-10-17T18:00:00-03:00", False),
+    ("mañana a la tarde", "2026-10-17T16:00:00-03:00", False),
+    ("lunes por la mañana", "2026-10-19T10:00:00-03:00", False),
+    ("lunes 10am", "2026-10-19T10:00:00-03:00", False),
+    ("el martes a las 6 pm", "2026-10-20T18:00:00-03:00", False),
+    ("29/08", "2027-08-29T10:00:00-03:00", False),
+    ("jueves 22/10 a las 16", "2026-10-22T16:00:00-03:00", False),
+    ("15 de enero a las 3 de la tarde", "2027-01-15T15:00:00-03:00", False),
+    ("el 20 a las 11", "2026-10-20T11:00:00-03:00", False),
+    ("10 y media de la mañana", "2026-10-19T10:30:00-03:00", False),
+    ("a las 18", "2026-10-16T18:00:00-03:00", False),
+    ("hoy viernes 17:30", "2026-10-16T17:30:00-03:00", False),
+    ("sábado al mediodía", "2026-10-17T12:00:00-03:00", False),
+    ("no puedo esta semana, te aviso", None, True),
+    ("no puedo", None, False),
+    ("lunes o martes", None, True),
+    ("hoy a las 9", None, True),
+    ("el 31/02", None, True),
+    ("jueves 23/10", None, True),
+    ("el martes que viene tipo 5", None, True),
+    ("el lunes no puedo", None, True),
+    ("cualquier día menos el martes", None, True),
+    ("todos los días salvo el jueves", None, True),
+    ("excepto mañana, cuando quieras", None, True),
+    ("no, mejor el viernes 15hs", None, True),
+    ("ni el sábado ni el domingo", None, True),
+    ("a las 18 no puedo", None, True),
+]
+
+
+def main():
+    print("🧪 Testing parser local de fechas de visita...")
+    print("=" * 60)
+
+    failures = 0
+    for text, expected_iso, expected_ambiguous in CASES:
+        got = parse_visit_text(text, NOW)
+        ok = got["iso"] == expected_iso and got["ambiguous"] == expected_ambiguous
+        failures += 0 if ok else 1
+        status = "✅" if ok else f"❌ esperado {expected_iso} (ambiguo={expected_ambiguous})"
+        print(f"   {text:<36} → {got['iso']} {'(ambiguo)' if got['ambiguous'] else ''} {status}")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        for text, _, _ in CASES:
+            parse_visit_text(text, NOW)
+    per_call = (time.perf_counter() - start) * 1000 / (100 * len(CASES))
+    print(f"\n⏱️  {per_call:.3f} ms por mensaje")
+
+    print("=" * 60)
+    if failures:
+        print(f"❌ {failures}/{len(CASES)} casos fallaron")
+        return 1
+    print(f"✅ {len(CASES)} casos correctos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
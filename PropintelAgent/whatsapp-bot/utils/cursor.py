@@ -0,0 +1,59 @@
+import base64
+import hashlib
+import hmac
+import json
+from typing import Dict, Any, Optional
+
+from config import CURSOR_SECRET
+
+# Los cursores son opacos para el panel: LastEvaluatedKey + el listado al que
+# pertenecen, firmados para que no se puedan fabricar ni reusar en otro listado.
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+class CursorSecretMissing(RuntimeError):
+    """No hay CURSOR_SECRET ni ADMIN_API_KEY para firmar o verificar cursores"""
+
+def check_cursor_secret():
+    """
+    Falla si no hay secreto para firmar cursores: con una clave vacía cualquiera
+    podría fabricar un cursor válido. Solo falla el listado que necesita un
+    cursor; la app arranca igual (en desarrollo el panel corre sin ADMIN_API_KEY).
+    """
+    if not CURSOR_SECRET:
+        raise CursorSecretMissing("CURSOR_SECRET (o ADMIN_API_KEY) no configurado: no se pueden firmar cursores de paginación")
+
+def _sign(body: str) -> str:
+    check_cursor_secret()
+    digest = hmac.new(CURSOR_SECRET.encode("utf-8"), body.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest[:16])
+
+def encode_cursor(last_key: Optional[Dict[str, Any]], scope: str) -> Optional[str]:
+    """Cursor firmado para continuar el listado `scope`; None si no hay más páginas"""
+    if not last_key:
+        return None
+    payload = json.dumps({"s": scope, "k": last_key}, separators=(",", ":"), sort_keys=True)
+    body = _b64encode(payload.encode("utf-8"))
+    return f"{body}.{_sign(body)}"
+
+def decode_cursor(cursor: Optional[str], scope: str) -> Optional[Dict[str, Any]]:
+    """
+    ExclusiveStartKey guardado en el cursor (None si no se pasó cursor).
+    Lanza ValueError si la firma no coincide o el cursor es de otro listado.
+    """
+    if not cursor:
+        return None
+    try:
+        body, signature = cursor.split(".", 1)
+        if not hmac.compare_digest(signature, _sign(body)):
+            raise ValueError("firma inválida")
+        payload = json.loads(_b64decode(body))
+    except ValueError as e:
+        raise ValueError(f"Cursor inválido: {e}")
+    if payload.get("s") != scope or not isinstance(payload.get("k"), dict):
+        raise ValueError("Cursor inválido: no corresponde a este listado")
+    return payload["k"]
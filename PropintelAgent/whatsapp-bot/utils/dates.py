@@ -0,0 +1,240 @@
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone, date
+from typing import Dict, Any, Optional, Tuple, List
+
+# Parser local de fechas/horarios en español argentino para agendar visitas.
+# Resuelve "viernes 15hs", "mañana a las 10", "29/08", "15 de enero a las 3 de la tarde"
+# contra la fecha actual en Argentina (UTC-3). Cuando el texto menciona una fecha
+# pero no se puede resolver con certeza ("lunes o martes", "el finde") marca
+# ambiguous=True y el llamador decide si consultar a OpenAI.
+
+ARGENTINA_TZ = timezone(timedelta(hours=-3))
+WEEKDAYS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+MONTHS = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
+          "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+DEFAULT_HOUR = 10  # solo día → 10:00
+PERIOD_HOURS = {"manana": 10, "mediodia": 12, "tarde": 16, "noche": 19}
+
+_WEEKDAYS_FOLDED = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+_MONTH_NUMBERS = {m: i + 1 for i, m in enumerate(MONTHS)}
+_MONTH_NUMBERS["setiembre"] = 9
+
+_WEEKDAY_RE = re.compile(r"\b(" + "|".join(_WEEKDAYS_FOLDED) + r")\b")
+_NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?\b")
+_MONTH_DATE_RE = re.compile(r"\b(\d{1,2})\s+de\s+(" + "|".join(_MONTH_NUMBERS) + r")\b")
+_DAY_ONLY_RE = re.compile(r"\b(?:el|dia)\s+(\d{1,2})\b(?!\s*(?:hs|h|:|am|pm|de la|del))")
+
+# Horarios, de más a menos específico
+_TIME_PATTERNS = [
+    # 15:30, 15.30hs, 3:30pm
+    re.compile(r"\b(\d{1,2})[:.](\d{2})\s*(hs|h|am|pm)?\b"),
+    # 3 de la tarde, 10 y media de la manana, 12 del mediodia
+    re.compile(r"\b(\d{1,2})(?:\s+y\s+(media|cuarto))?\s+(?:de la|del)\s+(manana|tarde|noche|mediodia)\b"),
+    # 10am, 6 pm
+    re.compile(r"\b(\d{1,2})\s*(am|pm|a\.m\.|p\.m\.)(?![a-z])"),
+    # 18hs, 18 h, 18 horas
+    re.compile(r"\b(\d{1,2})\s*(hs|h|horas)\b"),
+    # a las 5, a las 5 y media
+    re.compile(r"\ba\s+las\s+(\d{1,2})(?:\s+y\s+(media|cuarto))?\b"),
+]
+
+_PERIOD_RE = re.compile(r"\b(?:por|a|de|en)\s+la\s+(manana|tarde|noche)\b|\bal\s+(mediodia)\b")
+
+# Expresiones que hablan de una fecha pero que el parser no resuelve
+_VAGUE_RE = re.compile(r"\b(semana|finde|fin de semana|fin de mes|principios|mediados|"
+                       r"proximos dias|cuando|despues|antes|entre)\b")
+
+# Negaciones y exclusiones: "el lunes no puedo", "cualquier día menos el martes".
+# Con una fecha en el mensaje no se sabe si es la que propone o la que descarta
+_NEGATION_RE = re.compile(r"\b(no|ni|nunca|tampoco|menos|salvo|excepto|excepcion|imposible)\b")
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _minutes(fraction: Optional[str], explicit: Optional[str] = None) -> int:
+    if explicit is not None:
+        return int(explicit)
+    return {"media": 30, "cuarto": 15}.get(fraction or "", 0)
+
+
+def _blank(text: str, match) -> str:
+    """Borra la coincidencia (manteniendo posiciones) para no interpretarla dos veces"""
+    return text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+
+def _parse_times(text: str) -> Tuple[List[Tuple[int, int]], str]:
+    """Horarios (hora, minuto) mencionados y el texto sin ellos"""
+    found = []
+    for index, pattern in enumerate(_TIME_PATTERNS):
+        for match in pattern.finditer(text):
+            groups = match.groups()
+            hour = int(groups[0])
+            if index == 0:
+                minute, suffix = int(groups[1]), groups[2]
+                if suffix == "pm" and hour < 12:
+                    hour += 12
+                elif suffix == "am" and hour == 12:
+                    hour = 0
+            elif index == 1:
+                minute, period = _minutes(groups[1]), groups[2]
+                if period in ("tarde", "noche") and hour < 12:
+                    hour += 12
+            elif index == 2:
+                minute = 0
+                if groups[1].startswith("p") and hour < 12:
+                    hour += 12
+                elif groups[1].startswith("a") and hour == 12:
+                    hour = 0
+            else:
+                minute = _minutes(groups[1]) if index == 4 else 0
+                # "a las 5", "5hs": nadie visita un depto a las 5 AM
+                if 1 <= hour <= 7:
+                    hour += 12
+            if 0 <= hour <= 23 and 0 <= minute <= 59:
+                found.append((hour, minute))
+            text = _blank(text, match)
+    return list(dict.fromkeys(found)), text
+
+
+def _next_weekday(today: date, weekday: int) -> date:
+    """Próxima ocurrencia del día de semana (si es hoy, la de la semana que viene)"""
+    days = (weekday - today.weekday()) % 7
+    return today + timedelta(days=days or 7)
+
+
+def _year_for(today: date, month: int, day: int) -> Optional[date]:
+    """Fecha sin año: este año, o el que viene si ya pasó"""
+    try:
+        candidate = date(today.year, month, day)
+        if candidate < today:
+            candidate = date(today.year + 1, month, day)
+        return candidate
+    except ValueError:
+        return None
+
+
+def _parse_dates(text: str, today: date) -> Tuple[List[date], bool, str]:
+    """
+    Fechas explícitas o relativas, si alguna no se pudo interpretar (31/02)
+    y el texto sin las fechas reconocidas
+    """
+    dates, invalid = [], False
+
+    if re.search(r"\bpasado\s+manana\b", text):
+        dates.append(today + timedelta(days=2))
+        text = re.sub(r"\bpasado\s+manana\b", " ", text)
+    # "mañana" como día, no como franja horaria ("a la mañana", "de la mañana")
+    day_text = _PERIOD_RE.sub(" ", text)
+    if re.search(r"\bmanana\b", day_text):
+        dates.append(today + timedelta(days=1))
+    if re.search(r"\bhoy\b", text):
+        dates.append(today)
+
+    for match in list(_NUMERIC_DATE_RE.finditer(text)):
+        text = _blank(text, match)
+        day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+        try:
+            if year:
+                year = int(year) + (2000 if len(year) == 2 else 0)
+                dates.append(date(year, month, day))
+            else:
+                resolved = _year_for(today, month, day)
+                if resolved is None:
+                    invalid = True
+                else:
+                    dates.append(resolved)
+        except ValueError:
+            invalid = True
+
+    for match in list(_MONTH_DATE_RE.finditer(text)):
+        text = _blank(text, match)
+        resolved = _year_for(today, _MONTH_NUMBERS[match.group(2)], int(match.group(1)))
+        if resolved is None:
+            invalid = True
+        else:
+            dates.append(resolved)
+
+    if not dates:
+        match = _DAY_ONLY_RE.search(text)
+        if match:
+            # "el 15": este mes, o el siguiente si ya pasó
+            text = _blank(text, match)
+            day = int(match.group(1))
+            month, year = today.month, today.year
+            if day < today.day:
+                month, year = (1, year + 1) if month == 12 else (month + 1, year)
+            try:
+                dates.append(date(year, month, day))
+            except ValueError:
+                invalid = True
+
+    return list(dict.fromkeys(dates)), invalid, text
+
+
+def parse_visit_text(text: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Interpreta fecha y hora de visita sin OpenAI.
+    Retorna {"iso": "YYYY-MM-DDTHH:MM:SS-03:00" | None, "ambiguous": bool}:
+    - iso con valor: fecha resuelta con certeza
+    - iso None, ambiguous True: menciona una fecha pero no se pudo resolver, o la
+      menciona junto a una negación ("el lunes no puedo", "menos el martes")
+    - iso None, ambiguous False: el mensaje no habla de fechas ("no puedo")
+    """
+    now = (now or datetime.now(ARGENTINA_TZ)).astimezone(ARGENTINA_TZ)
+    today = now.date()
+    folded = _fold(text or "")
+
+    times, rest = _parse_times(folded)
+    dates, invalid, rest = _parse_dates(rest, today)
+    weekdays = list(dict.fromkeys(m.group(1) for m in _WEEKDAY_RE.finditer(folded)))
+
+    ambiguous = {"iso": None, "ambiguous": True}
+    if invalid or len(times) > 1 or len(weekdays) > 1 or len(dates) > 1:
+        return ambiguous
+    # Fecha mencionada junto a una negación: puede ser la que el cliente rechaza
+    if (dates or times or weekdays) and _NEGATION_RE.search(folded):
+        return ambiguous
+    # Números que no se entendieron ("el martes tipo 5"): mejor no adivinar
+    if (dates or times or weekdays) and re.search(r"\d", rest):
+        return ambiguous
+
+    if weekdays:
+        weekday = _WEEKDAYS_FOLDED.index(weekdays[0])
+        if dates:
+            # "viernes 29/08", "hoy viernes": el día de semana tiene que coincidir con la fecha
+            if dates[0].weekday() != weekday:
+                return ambiguous
+        else:
+            dates = [_next_weekday(today, weekday)]
+
+    if not times:
+        period = _PERIOD_RE.search(folded)
+        if period:
+            times = [(PERIOD_HOURS[period.group(1) or period.group(2)], 0)]
+
+    if not dates and not times:
+        if _VAGUE_RE.search(folded) or re.search(r"\d", folded):
+            return ambiguous
+        return {"iso": None, "ambiguous": False}
+
+    hour, minute = times[0] if times else (DEFAULT_HOUR, 0)
+    if dates:
+        day = dates[0]
+    else:
+        # Solo hora: hoy si todavía no pasó y es día hábil, si no el próximo día hábil
+        day = today
+        if day.weekday() >= 5 or (hour, minute) <= (now.hour, now.minute):
+            day += timedelta(days=1)
+            while day.weekday() >= 5:
+                day += timedelta(days=1)
+
+    resolved = datetime(day.year, day.month, day.day, hour, minute, tzinfo=ARGENTINA_TZ)
+    if resolved <= now:
+        # "hoy a las 9" cuando ya son las 11
+        return ambiguous
+    return {"iso": resolved.isoformat(), "ambiguous": False}
@@ -0,0 +1,55 @@
+import re
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from typing import List, Optional
+
+URL_PATTERN = re.compile(r'https?://[^\s]+')
+
+# Parámetros de tracking que no identifican la publicación
+TRACKING_PARAMS = {"fbclid", "gclid", "igshid", "ref"}
+TRACKING_PREFIXES = ("utm_",)
+
+# ID de la publicación dentro del path para los portales conocidos
+PORTAL_LISTING_PATTERNS = {
+    "zonaprop.com.ar": ("zonaprop", re.compile(r"-(\d+)\.html$")),
+    "argenprop.com": ("argenprop", re.compile(r"--(\d+)$")),
+    "mercadolibre.com.ar": ("mercadolibre", re.compile(r"MLA-?(\d+)", re.IGNORECASE)),
+}
+
+def extract_urls(text: str) -> List[str]:
+    """Retorna los links presentes en el texto, sin la puntuación final pegada"""
+    return [u.rstrip(".,;:!?)]\"'") for u in URL_PATTERN.findall(text or "")]
+
+def normalize_property_url(url: str) -> Optional[str]:
+    """
+    Normaliza un link de propiedad a una clave canónica.
+    Para portales conocidos la clave es "<portal>:<id_publicacion>"; para el resto
+    es host + path sin "www.", sin barra final y sin parámetros de tracking.
+    Retorna None si no es un link válido.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r"/+", "/", parts.path).rstrip("/")
+
+    for domain, (portal, pattern) in PORTAL_LISTING_PATTERNS.items():
+        if host == domain or host.endswith("." + domain):
+            match = pattern.search(path)
+            if match:
+                return f"{portal}:{match.group(1)}"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    key = f"{host}{path}"
+    if query:
+        key += "?" + urlencode(sorted(query))
+    return key